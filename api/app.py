@@ -5,9 +5,11 @@ from flask_cors import CORS
 import atexit
 
 sys.path.append(str(Path(__file__).parent.parent))
-from src.core.browser_manager import BrowserManager
+from src.converter.converter_pool import ConverterPool
 from api.converter_service import ConverterService
-from api.routes import api_bp, set_converter_service
+from api.job_queue import ConversionJobQueue
+from api.routes import api_bp, set_converter_service, set_job_queue, set_database
+from src.database.database import Database
 
 
 # Khởi tạo Flask app
@@ -15,28 +17,43 @@ app = Flask(__name__)
 CORS(app)  # Cho phép CORS
 
 # Biến global
-browser_manager = None
+converter_pool = None
 converter_service = None
+job_queue = None
+database = None
+
+
+def init_database():
+    """Mở database bài viết cho API tìm kiếm"""
+    global database
+    
+    database = Database()
+    set_database(database)
 
 
 def init_browser():
-    """Khởi tạo browser và converter service"""
-    global browser_manager, converter_service
+    """Khởi tạo converter pool và converter service"""
+    global converter_pool, converter_service, job_queue
     
     print("\n" + "="*60)
     print("🚀 KHỞI TẠO BROWSER CHO API SERVICE")
     print("="*60 + "\n")
     
     try:
-        # Init browser (headless=False để debug, có thể đổi thành True)
-        browser_manager = BrowserManager(headless=True)
-        browser_manager.init_driver()
+        # Init pool (headless=False để debug, có thể đổi thành True)
+        converter_pool = ConverterPool(headless=True)
+        converter_pool.start()
         
         # Init converter service
-        converter_service = ConverterService(browser_manager)
+        converter_service = ConverterService(converter_pool)
+        
+        # Init job queue (worker dùng chung pool với API đồng bộ)
+        job_queue = ConversionJobQueue(converter_service, workers=converter_pool.size)
+        job_queue.start()
         
         # Set service cho routes
         set_converter_service(converter_service)
+        set_job_queue(job_queue)
         
         print("✅ Browser và Service đã sẵn sàng!\n")
         
@@ -47,26 +64,42 @@ def init_browser():
 
 def shutdown_browser():
     """Đóng browser khi shutdown server"""
-    global browser_manager
+    global converter_pool, job_queue
     
     print("\n" + "="*60)
     print("🔒 ĐANG ĐÓNG BROWSER...")
     print("="*60 + "\n")
     
-    if browser_manager:
-        browser_manager.close()
+    if job_queue:
+        job_queue.stop()
+        job_queue = None
+    
+    if converter_pool:
+        converter_pool.close()
+        converter_pool = None
         print("✅ Browser đã đóng!")
 
 
+def shutdown_database():
+    """Đóng database khi shutdown server"""
+    global database
+    
+    if database:
+        database.close()
+        database = None
+
+
 # Register blueprint
 app.register_blueprint(api_bp)
 
 # Register shutdown handler
 atexit.register(shutdown_browser)
+atexit.register(shutdown_database)
 
 
 if __name__ == '__main__':
-    # Khởi tạo browser trước khi start server
+    # Khởi tạo database và browser trước khi start server
+    init_database()
     init_browser()
     
     print("\n" + "="*60)
@@ -75,6 +108,9 @@ if __name__ == '__main__':
     print("\n📍 Dashboard: http://localhost:5000")
     print("📍 API Health: http://localhost:5000/api/health")
     print("📍 API Convert: POST http://localhost:5000/api/convert")
+    print("📍 API Batch: POST http://localhost:5000/api/convert/batch")
+    print("📍 API Jobs: POST http://localhost:5000/api/jobs, GET /api/jobs/<id>, GET /api/jobs/stream?ids=...")
+    print("📍 API Search: GET http://localhost:5000/api/posts/search?q=...")
     print("\n⚠️  Nhấn Ctrl+C để dừng server\n")
     
     # Chạy Flask server
@@ -1,32 +1,48 @@
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 sys.path.append(str(Path(__file__).parent.parent))
-from src.converter.affiliate_link_converter import ShopeeConverter
+from src.converter.converter_pool import PoolExhaustedError
+from src.utils.url_utils import canonicalize_shopee_url
 
 
 class ConverterService:
-    """Service wrapper cho ShopeeConverter"""
-    
-    def __init__(self, browser_manager):
-        self.converter = ShopeeConverter(browser_manager)
-    
-    def convert_link(self, shopee_url):
+    """Service wrapper cho ConverterPool"""
+
+    def __init__(self, pool):
+        """
+        Args:
+            pool: ConverterPool đã start
+        """
+        self.pool = pool
+        self.cache = pool.cache
+
+    def convert_link(self, shopee_url, timeout=None):
         """
         Convert link Shopee thành affiliate
-        
+
+        Args:
+            shopee_url: Link Shopee
+            timeout: Số giây chờ mượn converter (mặc định: wait_timeout của pool)
+
         Returns:
             dict: {
                 'success': bool,
                 'affiliate_link': str (nếu thành công),
                 'original_link': str,
-                'error': str (nếu thất bại)
+                'error': str (nếu thất bại),
+                'pool_exhausted': bool (nếu không mượn được converter)
             }
         """
         try:
-            # Gọi converter
-            affiliate_link = self.converter.convert_to_affiliate(shopee_url)
-            
+            # Cache hit thì không cần mượn converter; miss thì converter không tra lại
+            affiliate_link = self.cache.get(shopee_url)
+
+            if not affiliate_link:
+                with self.pool.acquire(timeout=timeout) as converter:
+                    affiliate_link = converter.convert_to_affiliate(shopee_url, check_cache=False)
+
             if affiliate_link:
                 return {
                     'success': True,
@@ -39,10 +55,118 @@ class ConverterService:
                     'error': 'Không thể convert link. Vui lòng thử lại.',
                     'original_link': shopee_url
                 }
-        
+
+        except PoolExhaustedError as e:
+            return {
+                'success': False,
+                'error': f'Server đang bận: {str(e)}',
+                'original_link': shopee_url,
+                'pool_exhausted': True
+            }
+
         except Exception as e:
             return {
                 'success': False,
                 'error': f'Lỗi: {str(e)}',
                 'original_link': shopee_url
-            }
\ No newline at end of file
+            }
+
+    def convert_batch(self, shopee_urls):
+        """
+        Convert nhiều link, gộp các link trùng sản phẩm
+        
+        Link lấy được từ cache trả về ngay; các link còn lại được chia đều
+        cho các converter trong pool và chạy song song qua convert_multiple.
+        Link lỗi không làm hỏng cả batch.
+        
+        Args:
+            shopee_urls (list): List link Shopee
+        
+        Returns:
+            list: Kết quả theo đúng thứ tự input, mỗi phần tử có dạng như convert_link
+                  (thêm 'duplicate': True nếu link trùng với link đứng trước)
+        """
+        urls = [(url or '').strip() for url in shopee_urls]
+        
+        # Gộp link trùng theo sản phẩm, giữ thứ tự xuất hiện đầu tiên
+        unique = {}  # canonical url -> link gốc đầu tiên
+        for url in urls:
+            if url:
+                unique.setdefault(canonicalize_shopee_url(url), url)
+        
+        resolved = {}  # canonical url -> affiliate link | None
+        errors = {}    # canonical url -> thông báo lỗi
+        pending = []
+        
+        for key, url in unique.items():
+            affiliate_link = self.cache.get(url)
+            if affiliate_link:
+                resolved[key] = affiliate_link
+            else:
+                pending.append(url)
+        
+        if pending:
+            workers = min(self.pool.size, len(pending))
+            chunks = [pending[i::workers] for i in range(workers)]
+            
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [(chunk, executor.submit(self._convert_chunk, chunk)) for chunk in chunks]
+                
+                for chunk, future in futures:
+                    try:
+                        for url, affiliate_link in future.result().items():
+                            resolved[canonicalize_shopee_url(url)] = affiliate_link
+                    except PoolExhaustedError as e:
+                        for url in chunk:
+                            errors[canonicalize_shopee_url(url)] = f'Server đang bận: {str(e)}'
+                    except Exception as e:
+                        for url in chunk:
+                            errors[canonicalize_shopee_url(url)] = f'Lỗi: {str(e)}'
+        
+        results = []
+        seen = set()
+        
+        for url in urls:
+            if not url:
+                results.append({
+                    'success': False,
+                    'error': 'Link không được để trống',
+                    'original_link': url
+                })
+                continue
+            
+            key = canonicalize_shopee_url(url)
+            affiliate_link = resolved.get(key)
+            
+            if affiliate_link:
+                result = {
+                    'success': True,
+                    'affiliate_link': affiliate_link,
+                    'original_link': url
+                }
+            else:
+                result = {
+                    'success': False,
+                    'error': errors.get(key, 'Không thể convert link. Vui lòng thử lại.'),
+                    'original_link': url
+                }
+            
+            if key in seen:
+                result['duplicate'] = True
+            seen.add(key)
+            results.append(result)
+        
+        return results
+    
+    def _convert_chunk(self, shopee_urls):
+        """Mượn 1 converter và convert tuần tự 1 nhóm link (đã tra cache, đều là miss)"""
+        with self.pool.acquire() as converter:
+            return converter.convert_multiple(shopee_urls, check_cache=False)
+    
+    def cache_stats(self):
+        """Thống kê cache link affiliate (hit/miss, thời gian tiết kiệm)"""
+        return self.cache.stats()
+
+    def pool_stats(self):
+        """Thống kê converter pool"""
+        return self.pool.stats()
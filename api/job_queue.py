@@ -0,0 +1,277 @@
+import queue
+import threading
+import time
+import uuid
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+from config.settings import (
+    CONVERTER_POOL_SIZE,
+    JOB_QUEUE_MAX_DEPTH,
+    JOB_DEADLINE,
+    JOB_RESULT_TTL,
+)
+
+
+class JobQueueFullError(Exception):
+    """Hàng đợi job đã đầy"""
+
+
+# Trạng thái đã kết thúc, không thay đổi nữa
+FINISHED_STATUSES = ('done', 'failed', 'expired')
+
+# Số giây worker chờ job trước khi kiểm tra lại đã bị stop chưa
+WORKER_POLL_INTERVAL = 1
+
+
+class ConversionJobQueue:
+    """
+    Hàng đợi job convert chạy nền phía sau ConverterService
+
+    Submit trả về job id ngay, vài worker thread lấy job ra convert.
+    Client poll theo id hoặc stream kết quả khi job hoàn thành.
+    """
+
+    def __init__(self, service, workers=CONVERTER_POOL_SIZE, max_depth=JOB_QUEUE_MAX_DEPTH,
+                 deadline=JOB_DEADLINE, result_ttl=JOB_RESULT_TTL):
+        """
+        Args:
+            service: ConverterService
+            workers: Số worker thread
+            max_depth: Số job tối đa đang chờ trong hàng đợi
+            deadline: Số giây mặc định từ lúc submit đến khi job hết hạn
+            result_ttl: Số giây giữ kết quả sau khi job kết thúc
+        """
+        self.service = service
+        self.workers = workers
+        self.deadline = deadline
+        self.result_ttl = result_ttl
+
+        self._queue = queue.Queue(maxsize=max_depth)
+        self._jobs = {}
+        self._changed = threading.Condition()
+        self._threads = []
+        self._running = False
+
+    def start(self):
+        """Khởi động các worker thread"""
+        self._running = True
+
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"job-worker-{i + 1}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+        print(f"✅ Job queue đã sẵn sàng ({self.workers} worker)")
+
+    def stop(self, timeout=5):
+        """
+        Dừng các worker (job đang chạy sẽ chạy nốt)
+
+        Job còn trong hàng đợi được đánh dấu 'expired' để stream đang chờ kết thúc ngay.
+        Không chặn khi hàng đợi đầy: worker tự thoát sau tối đa WORKER_POLL_INTERVAL giây.
+
+        Args:
+            timeout: Số giây tối đa chờ mỗi worker thoát
+        """
+        self._running = False
+
+        while True:
+            try:
+                job_id = self._queue.get_nowait()
+            except queue.Empty:
+                break
+
+            with self._changed:
+                job = self._jobs.get(job_id)
+                if job is None or job['status'] in FINISHED_STATUSES:
+                    continue
+                job['result'] = {
+                    'success': False,
+                    'error': 'Job bị hủy do server dừng',
+                    'original_link': job['shopee_url']
+                }
+                self._finish(job, 'expired')
+
+        # Đánh thức worker đang chờ get(); đầy thì bỏ qua vì worker cũng tự kiểm tra _running
+        for _ in self._threads:
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                break
+
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def submit(self, shopee_url, deadline=None):
+        """
+        Đưa 1 link vào hàng đợi
+
+        Args:
+            shopee_url: Link Shopee
+            deadline: Số giây tối đa cho job này (mặc định: deadline của queue)
+
+        Returns:
+            dict: Thông tin job
+
+        Raises:
+            JobQueueFullError: Nếu hàng đợi đã đầy
+        """
+        self._purge_expired()
+
+        now = time.time()
+        job = {
+            'id': uuid.uuid4().hex,
+            'status': 'queued',
+            'shopee_url': shopee_url,
+            'created_at': now,
+            'deadline_at': now + (deadline or self.deadline),
+            'started_at': None,
+            'finished_at': None,
+            'result': None
+        }
+
+        # Cache hit thì trả kết quả luôn, không cần xếp hàng
+        affiliate_link = self.service.cache.get(shopee_url)
+        if affiliate_link:
+            job['result'] = {
+                'success': True,
+                'affiliate_link': affiliate_link,
+                'original_link': shopee_url
+            }
+            self._finish(job, 'done', register=True)
+            return dict(job)
+
+        with self._changed:
+            self._jobs[job['id']] = job
+
+        try:
+            self._queue.put_nowait(job['id'])
+        except queue.Full:
+            with self._changed:
+                del self._jobs[job['id']]
+            raise JobQueueFullError(f"Hàng đợi đã đầy ({self._queue.maxsize} job)")
+
+        return dict(job)
+
+    def get(self, job_id):
+        """Lấy thông tin job, None nếu không tồn tại hoặc đã bị xóa"""
+        self._purge_expired()
+
+        with self._changed:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def iter_finished(self, job_ids, timeout):
+        """
+        Generator trả về từng job ngay khi nó kết thúc
+
+        Args:
+            job_ids: List job id cần theo dõi
+            timeout: Số giây tối đa chờ toàn bộ job
+
+        Yields:
+            dict: Thông tin job (job không tồn tại trả về status 'not_found')
+        """
+        pending = list(dict.fromkeys(job_ids))
+        end_at = time.time() + timeout
+
+        while pending:
+            ready = []
+
+            with self._changed:
+                while True:
+                    for job_id in pending:
+                        job = self._jobs.get(job_id)
+                        if job is None:
+                            ready.append({'id': job_id, 'status': 'not_found'})
+                        elif job['status'] in FINISHED_STATUSES:
+                            ready.append(dict(job))
+
+                    remaining = end_at - time.time()
+                    if ready or remaining <= 0:
+                        break
+                    self._changed.wait(remaining)
+
+            if not ready:
+                return
+
+            for job in ready:
+                pending.remove(job['id'])
+                yield job
+
+    def stats(self):
+        """Thống kê hàng đợi"""
+        with self._changed:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job['status']] = counts.get(job['status'], 0) + 1
+
+        return {
+            'workers': self.workers,
+            'depth': self._queue.qsize(),
+            'max_depth': self._queue.maxsize,
+            'jobs': counts
+        }
+
+    def _worker(self):
+        while self._running:
+            try:
+                job_id = self._queue.get(timeout=WORKER_POLL_INTERVAL)
+            except queue.Empty:
+                continue
+            if job_id is None:
+                break
+
+            with self._changed:
+                job = self._jobs.get(job_id)
+                if job is None:
+                    continue
+
+                if time.time() > job['deadline_at']:
+                    job['result'] = {
+                        'success': False,
+                        'error': 'Job đã hết hạn trước khi được xử lý',
+                        'original_link': job['shopee_url']
+                    }
+                    self._finish(job, 'expired')
+                    continue
+
+                job['status'] = 'running'
+                job['started_at'] = time.time()
+                self._changed.notify_all()
+
+            # Chờ converter rảnh đến hết deadline của job (pool dùng chung với API đồng bộ)
+            remaining = max(0, job['deadline_at'] - time.time())
+            result = self.service.convert_link(job['shopee_url'], timeout=remaining)
+
+            with self._changed:
+                job['result'] = result
+                if result.get('pool_exhausted'):
+                    result['error'] = 'Job đã hết hạn khi chờ converter rảnh'
+                    self._finish(job, 'expired')
+                else:
+                    self._finish(job, 'done' if result['success'] else 'failed')
+
+    def _finish(self, job, status, register=False):
+        """Đánh dấu job kết thúc và báo cho các stream đang chờ"""
+        with self._changed:
+            job['status'] = status
+            job['finished_at'] = time.time()
+            if register:
+                self._jobs[job['id']] = job
+            self._changed.notify_all()
+
+    def _purge_expired(self):
+        """Xóa các job đã kết thúc quá result_ttl giây"""
+        cutoff = time.time() - self.result_ttl
+
+        with self._changed:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job['finished_at'] and job['finished_at'] < cutoff
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
@@ -1,14 +1,26 @@
-from flask import Blueprint, render_template, request, jsonify
-import threading
+from flask import Blueprint, Response, render_template, request, jsonify, stream_with_context
+import json
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+from config.settings import (
+    CONVERTER_BATCH_MAX_URLS,
+    JOB_STREAM_TIMEOUT,
+    SEARCH_PAGE_SIZE,
+    SEARCH_MAX_PAGE_SIZE,
+)
+from api.job_queue import JobQueueFullError
+from src.core.wait_engine import wait_stats
+from src.core.selector_stats import selector_stats
 
 # Tạo Blueprint
 api_bp = Blueprint('api', __name__)
 
-# Lock để tránh conflict khi nhiều request cùng lúc
-conversion_lock = threading.Lock()
-
-# Biến global để lưu converter_service (sẽ được set từ app.py)
+# Biến global để lưu converter_service, job_queue, database (sẽ được set từ app.py)
 converter_service = None
+job_queue = None
+database = None
 
 
 def set_converter_service(service):
@@ -17,6 +29,18 @@ def set_converter_service(service):
     converter_service = service
 
 
+def set_job_queue(queue):
+    """Set job queue từ app.py"""
+    global job_queue
+    job_queue = queue
+
+
+def set_database(db):
+    """Set database bài viết từ app.py"""
+    global database
+    database = db
+
+
 @api_bp.route('/')
 def index():
     """Trang chính - Dashboard"""
@@ -50,21 +74,248 @@ def convert():
             'error': 'Link không được để trống'
         }), 400
     
-    # Convert với lock để tránh conflict
-    with conversion_lock:
-        result = converter_service.convert_link(shopee_url)
+    # Mỗi request mượn 1 converter riêng từ pool
+    result = converter_service.convert_link(shopee_url)
     
     # Trả về kết quả
     if result['success']:
         return jsonify(result), 200
+    elif result.get('pool_exhausted'):
+        return jsonify(result), 503
     else:
         return jsonify(result), 400
 
 
+@api_bp.route('/api/convert/batch', methods=['POST'])
+def convert_batch():
+    """API convert nhiều link Shopee trong 1 request"""
+    
+    if not converter_service:
+        return jsonify({
+            'success': False,
+            'error': 'Service chưa sẵn sàng'
+        }), 500
+    
+    data = request.get_json()
+    
+    if not data or not isinstance(data.get('urls'), list):
+        return jsonify({
+            'success': False,
+            'error': 'Thiếu danh sách urls trong request'
+        }), 400
+    
+    urls = data['urls']
+    
+    if not urls:
+        return jsonify({
+            'success': False,
+            'error': 'Danh sách link không được để trống'
+        }), 400
+    
+    if len(urls) > CONVERTER_BATCH_MAX_URLS:
+        return jsonify({
+            'success': False,
+            'error': f'Tối đa {CONVERTER_BATCH_MAX_URLS} link mỗi request'
+        }), 400
+    
+    if not all(isinstance(url, str) for url in urls):
+        return jsonify({
+            'success': False,
+            'error': 'Mỗi phần tử trong urls phải là chuỗi'
+        }), 400
+    
+    results = converter_service.convert_batch(urls)
+    succeeded = sum(1 for result in results if result['success'])
+    
+    # Lỗi từng link nằm trong results, batch vẫn trả về 200
+    return jsonify({
+        'success': succeeded == len(results),
+        'total': len(results),
+        'succeeded': succeeded,
+        'failed': len(results) - succeeded,
+        'results': results
+    }), 200
+
+
+@api_bp.route('/api/jobs', methods=['POST'])
+def submit_jobs():
+    """API tạo job convert chạy nền, trả về job id ngay"""
+    
+    if not job_queue:
+        return jsonify({
+            'success': False,
+            'error': 'Service chưa sẵn sàng'
+        }), 500
+    
+    data = request.get_json()
+    
+    if not data or ('shopee_url' not in data and 'urls' not in data):
+        return jsonify({
+            'success': False,
+            'error': 'Thiếu shopee_url hoặc urls trong request'
+        }), 400
+    
+    urls = data['urls'] if 'urls' in data else [data['shopee_url']]
+    
+    if not isinstance(urls, list) or not urls or len(urls) > CONVERTER_BATCH_MAX_URLS:
+        return jsonify({
+            'success': False,
+            'error': f'urls phải là danh sách từ 1 đến {CONVERTER_BATCH_MAX_URLS} link'
+        }), 400
+    
+    urls = [url.strip() if isinstance(url, str) else '' for url in urls]
+    
+    if not all(urls):
+        return jsonify({
+            'success': False,
+            'error': 'Link không được để trống'
+        }), 400
+    
+    deadline = data.get('deadline')
+    if deadline is not None and (not isinstance(deadline, (int, float)) or deadline <= 0):
+        return jsonify({
+            'success': False,
+            'error': 'deadline phải là số giây > 0'
+        }), 400
+    
+    jobs = []
+    try:
+        for url in urls:
+            jobs.append(job_queue.submit(url, deadline=deadline))
+    except JobQueueFullError as e:
+        return jsonify({
+            'success': False,
+            'error': f'Server đang bận: {str(e)}',
+            'jobs': jobs
+        }), 503
+    
+    return jsonify({
+        'success': True,
+        'jobs': jobs
+    }), 202
+
+
+@api_bp.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """API lấy trạng thái/kết quả của 1 job"""
+    
+    if not job_queue:
+        return jsonify({
+            'success': False,
+            'error': 'Service chưa sẵn sàng'
+        }), 500
+    
+    job = job_queue.get(job_id)
+    
+    if not job:
+        return jsonify({
+            'success': False,
+            'error': 'Không tìm thấy job (hoặc kết quả đã hết hạn)'
+        }), 404
+    
+    return jsonify({
+        'success': True,
+        'job': job
+    }), 200
+
+
+@api_bp.route('/api/jobs/stream', methods=['GET'])
+def stream_jobs():
+    """
+    Stream kết quả các job ngay khi hoàn thành
+    
+    Query: ?ids=<id1>,<id2>,...
+    Mặc định trả về NDJSON, dùng ?format=sse hoặc header
+    Accept: text/event-stream để nhận Server-Sent Events
+    """
+    
+    if not job_queue:
+        return jsonify({
+            'success': False,
+            'error': 'Service chưa sẵn sàng'
+        }), 500
+    
+    job_ids = [job_id for job_id in request.args.get('ids', '').split(',') if job_id]
+    
+    if not job_ids:
+        return jsonify({
+            'success': False,
+            'error': 'Thiếu ids trong query'
+        }), 400
+    
+    use_sse = (request.args.get('format') == 'sse'
+               or 'text/event-stream' in request.headers.get('Accept', ''))
+    
+    def generate():
+        for job in job_queue.iter_finished(job_ids, timeout=JOB_STREAM_TIMEOUT):
+            payload = json.dumps(job, ensure_ascii=False)
+            if use_sse:
+                yield f"event: job\ndata: {payload}\n\n"
+            else:
+                yield payload + "\n"
+    
+    mimetype = 'text/event-stream' if use_sse else 'application/x-ndjson'
+    return Response(stream_with_context(generate()), mimetype=mimetype)
+
+
+@api_bp.route('/api/posts/search', methods=['GET'])
+def search_posts():
+    """
+    Tìm bài viết đã crawl theo nội dung, mới nhất trước
+    
+    Query: ?q=<từ khóa>&limit=<số bài>&cursor=<next_cursor của trang trước>
+    """
+    
+    if not database:
+        return jsonify({
+            'success': False,
+            'error': 'Database chưa sẵn sàng'
+        }), 500
+    
+    query = request.args.get('q', '').strip()
+    
+    if not query:
+        return jsonify({
+            'success': False,
+            'error': 'Thiếu q trong query'
+        }), 400
+    
+    limit = request.args.get('limit', str(SEARCH_PAGE_SIZE))
+    if not limit.isdigit() or not 1 <= int(limit) <= SEARCH_MAX_PAGE_SIZE:
+        return jsonify({
+            'success': False,
+            'error': f'limit phải từ 1 đến {SEARCH_MAX_PAGE_SIZE}'
+        }), 400
+    limit = int(limit)
+    
+    cursor = request.args.get('cursor')
+    if cursor is not None:
+        if not cursor.isdigit():
+            return jsonify({
+                'success': False,
+                'error': 'cursor không hợp lệ'
+            }), 400
+        cursor = int(cursor)
+    
+    posts, next_cursor = database.search(query, limit=limit, cursor=cursor)
+    
+    return jsonify({
+        'success': True,
+        'query': query,
+        'posts': posts,
+        'next_cursor': next_cursor
+    }), 200
+
+
 @api_bp.route('/api/health', methods=['GET'])
 def health():
     """Kiểm tra trạng thái service"""
     return jsonify({
         'status': 'ok',
-        'service_ready': converter_service is not None
+        'service_ready': converter_service is not None,
+        'cache': converter_service.cache_stats() if converter_service else None,
+        'pool': converter_service.pool_stats() if converter_service else None,
+        'jobs': job_queue.stats() if job_queue else None,
+        'waits': wait_stats.summary(),
+        'selectors': selector_stats.summary()
     }), 200
\ No newline at end of file
@@ -0,0 +1,212 @@
+import argparse
+import tempfile
+import threading
+import time
+import sys
+from collections import Counter
+from pathlib import Path
+import requests
+
+sys.path.append(str(Path(__file__).parent.parent))
+from src.core.browser_manager import BrowserManager
+from src.core.wait_engine import wait_stats
+from src.core.selector_stats import selector_stats
+from src.crawler.crawl_personal_page import ThreadsCrawler
+from src.crawler.link_resolver import RedirectResolver
+from src.core.pacing import Pacer, PACING_PROFILES
+from benchmarks.fixture_replay import (
+    FixtureServer,
+    ReplayRedirectAdapter,
+    fixture_path,
+    generate_synthetic_fixture,
+)
+
+
+class RunMetrics:
+    """Đếm round trip WebDriver và thời gian sleep của thread crawl"""
+
+    def __init__(self, sleep_scale=1.0):
+        self.sleep_scale = sleep_scale
+        self.commands = Counter()
+        self.driver_seconds = 0.0
+        self.sleep_seconds = 0.0  # time.sleep của crawler (humanisation, pause)
+        self.poll_seconds = 0.0  # time.sleep bên trong WebDriverWait
+        self._thread = threading.current_thread()
+        self._real_sleep = time.sleep
+
+    def instrument_driver(self, driver):
+        """Bọc driver.execute: mọi lệnh WebDriver (kể cả từ WebElement, ActionChains) đi qua đây"""
+        original = driver.execute
+
+        def execute(driver_command, params=None):
+            start = time.perf_counter()
+            try:
+                return original(driver_command, params)
+            finally:
+                if threading.current_thread() is self._thread:
+                    self.commands[driver_command] += 1
+                    self.driver_seconds += time.perf_counter() - start
+
+        driver.execute = execute
+
+    def patch_sleep(self):
+        """Thay time.sleep để đo (và scale) thời gian sleep của thread crawl"""
+        real_sleep = self._real_sleep
+
+        def sleep(seconds):
+            if threading.current_thread() is not self._thread:
+                return real_sleep(seconds)
+
+            caller = sys._getframe(1).f_globals.get('__name__', '')
+            is_poll = caller.startswith('selenium')
+            if not is_poll:
+                seconds *= self.sleep_scale
+
+            start = time.perf_counter()
+            real_sleep(seconds)
+            elapsed = time.perf_counter() - start
+
+            if is_poll:
+                self.poll_seconds += elapsed
+            else:
+                self.sleep_seconds += elapsed
+
+        time.sleep = sleep
+
+    def restore_sleep(self):
+        time.sleep = self._real_sleep
+
+    @property
+    def round_trips(self):
+        return sum(self.commands.values())
+
+
+def run_benchmark(fixture="synthetic", limit=20, sleep_scale=1.0, headless=True, pacing=None):
+    """
+    Chạy ThreadsCrawler với snapshot phát lại từ server local
+
+    Args:
+        fixture: Tên file trong BENCHMARK_FIXTURE_DIR (không có .html)
+        limit: Số bài cần crawl
+        sleep_scale: Hệ số nhân cho time.sleep của crawler (0 = bỏ hết sleep)
+        headless: Chạy Chrome headless
+        pacing: Tên pacing profile (None = PACING_PROFILE trong settings)
+
+    Returns:
+        dict: Kết quả benchmark
+    """
+    if not fixture_path(fixture).exists():
+        if fixture != "synthetic":
+            raise FileNotFoundError(f"Không tìm thấy fixture: {fixture_path(fixture)}")
+        generate_synthetic_fixture(fixture, posts=max(40, limit * 2))
+
+    wait_stats.reset()
+    selector_stats.reset()
+
+    # Redirect được trả lời offline, không gọi ra mạng
+    adapter = ReplayRedirectAdapter()
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    resolver = RedirectResolver(session=session)
+
+    metrics = RunMetrics(sleep_scale=sleep_scale)
+
+    with tempfile.TemporaryDirectory() as profile_dir, FixtureServer() as server:
+        browser = BrowserManager(headless=headless, profile_path=profile_dir)
+
+        try:
+            driver = browser.init_driver()
+            metrics.instrument_driver(driver)
+            pacer = Pacer(pacing, log_path=None) if pacing else Pacer(log_path=None)
+            crawler = ThreadsCrawler(browser, resolver=resolver, pacer=pacer)
+
+            metrics.patch_sleep()
+            start = time.perf_counter()
+            posts = list(crawler.iter_crawl_profile(server.profile_url(fixture), limit=limit))
+            wall = time.perf_counter() - start
+        finally:
+            metrics.restore_sleep()
+            browser.close()
+
+    work = max(0.0, wall - metrics.sleep_seconds - metrics.poll_seconds)
+    empty_posts = sum(1 for post in posts if not post['content_1'])
+
+    return {
+        'fixture': fixture,
+        'pacing': pacer.profile,
+        'posts': len(posts),
+        'empty_posts': empty_posts,
+        'wall_seconds': round(wall, 2),
+        'posts_per_second': round(len(posts) / wall, 3) if wall else 0.0,
+        'round_trips': metrics.round_trips,
+        'round_trips_per_post': round(metrics.round_trips / len(posts), 1) if posts else 0.0,
+        'driver_seconds': round(metrics.driver_seconds, 2),
+        'sleep_seconds': round(metrics.sleep_seconds, 2),
+        'poll_seconds': round(metrics.poll_seconds, 2),
+        'work_seconds': round(work, 2),
+        'redirect_requests': adapter.requests,
+        'top_commands': dict(metrics.commands.most_common(8)),
+    }
+
+
+def print_result(result):
+    print(f"\n{'='*60}")
+    print(f"📊 BENCHMARK CRAWLER: {result['fixture']} (pacing '{result['pacing']}')")
+    print(f"{'='*60}")
+    print(f"  Bài crawl được: {result['posts']} ({result['empty_posts']} bài không có nội dung)")
+    print(f"  Tổng thời gian: {result['wall_seconds']}s -> {result['posts_per_second']} bài/s")
+    print(f"  Round trip WebDriver: {result['round_trips']} ({result['round_trips_per_post']}/bài, "
+          f"{result['driver_seconds']}s)")
+    print(f"  Sleep (humanisation): {result['sleep_seconds']}s")
+    print(f"  Poll trong explicit wait: {result['poll_seconds']}s")
+    print(f"  Làm việc thật: {result['work_seconds']}s")
+    print(f"  Request redirect: {result['redirect_requests']}")
+    print(f"  Lệnh WebDriver nhiều nhất:")
+    for command, count in result['top_commands'].items():
+        print(f"    {command}: {count}")
+
+    wait_stats.print_report()
+    selector_stats.print_report()
+
+    if result['posts'] and result['empty_posts'] == result['posts']:
+        print("\n⚠️  Không bài nào có nội dung: selector TEXT_SPAN_CSS có thể đã hỏng")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ThreadsCrawler với snapshot offline")
+    parser.add_argument('fixture', nargs='?', default='synthetic')
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--sleep-scale', type=float, default=1.0,
+                        help="Hệ số nhân time.sleep của crawler (0 = bỏ sleep)")
+    parser.add_argument('--pacing', choices=list(PACING_PROFILES),
+                        help="Pacing profile (mặc định theo settings)")
+    parser.add_argument('--show', action='store_true', help="Hiện cửa sổ Chrome")
+    parser.add_argument('--min-posts-per-second', type=float,
+                        help="Fail nếu tốc độ thấp hơn ngưỡng")
+    parser.add_argument('--max-round-trips-per-post', type=float,
+                        help="Fail nếu số round trip mỗi bài vượt ngưỡng")
+    args = parser.parse_args()
+
+    result = run_benchmark(args.fixture, args.limit, args.sleep_scale, headless=not args.show,
+                           pacing=args.pacing)
+    print_result(result)
+
+    failed = []
+    if result['posts'] < args.limit:
+        failed.append(f"chỉ crawl được {result['posts']}/{args.limit} bài")
+    if args.min_posts_per_second is not None and result['posts_per_second'] < args.min_posts_per_second:
+        failed.append(f"{result['posts_per_second']} bài/s < {args.min_posts_per_second}")
+    if (args.max_round_trips_per_post is not None
+            and result['round_trips_per_post'] > args.max_round_trips_per_post):
+        failed.append(f"{result['round_trips_per_post']} round trip/bài > {args.max_round_trips_per_post}")
+
+    if failed:
+        print(f"\n❌ Benchmark fail: {'; '.join(failed)}")
+        sys.exit(1)
+
+    print("\n✅ Benchmark đạt")
+
+
+if __name__ == "__main__":
+    main()
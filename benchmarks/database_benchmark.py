@@ -0,0 +1,207 @@
+import argparse
+import random
+import tempfile
+import time
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+from src.database.database import Database
+from src.database.migrations import LATEST_VERSION
+
+
+# Migration 4 thêm index post_id cho bảng con và (is_posted, created_at)
+INDEX_MIGRATION = 4
+INDEX_MIGRATION_INDEXES = [
+    'idx_post_images_post_id',
+    'idx_post_videos_post_id',
+    'idx_shopee_links_post_id',
+    'idx_posts_unposted',
+]
+
+# Query được đo (cùng câu lệnh Database dùng) để in EXPLAIN QUERY PLAN trước/sau migration
+PLAN_QUERIES = {
+    'get_unposted_page': '''
+        SELECT id, content, original_url, is_posted, created_at FROM posts
+        WHERE is_posted = 0
+        ORDER BY created_at DESC, id DESC
+        LIMIT 100
+    ''',
+    'post_images theo post_id': '''
+        SELECT post_id, image_url FROM post_images
+        WHERE post_id IN (SELECT value FROM json_each('[1, 2, 3]'))
+        ORDER BY id
+    ''',
+    'shopee_links theo post_id': '''
+        SELECT s.post_id, s.original_link, a.affiliate_link
+        FROM shopee_links s
+        LEFT JOIN affiliate_links a ON a.id = s.link_id
+        WHERE s.post_id IN (SELECT value FROM json_each('[1, 2, 3]'))
+        ORDER BY s.id
+    ''',
+}
+
+
+# Âm tiết giả tiếng Việt: đủ đa dạng để các bài ngẫu nhiên không gần trùng nhau
+ONSETS = "b c ch d đ g gi h k kh l m n ng nh p ph qu r s t th tr v x".split()
+RHYMES = "a á à ả ã ạ ai ao an ang anh e é ê ên i ích in inh o ó ô ốc ơ ời u ú ư ưa ươ ương uy".split()
+
+
+def random_content(rng, i):
+    """Nội dung bài giả 20-60 âm tiết, kèm giá và link rút gọn"""
+    words = ' '.join(rng.choice(ONSETS) + rng.choice(RHYMES) for _ in range(rng.randint(20, 60)))
+    return f"Bài {i}: {words} giá {rng.randint(10, 999)}k s.shopee.vn/{rng.randrange(10 ** 8)}"
+
+
+def populate(db, posts, products, unposted_ratio, seed=1):
+    """Tạo posts giả (2 ảnh, 1 video, 1-2 link Shopee mỗi bài), created_at cách nhau 1 phút"""
+    rng = random.Random(seed)
+    batch_size = 5000
+
+    for start in range(0, posts, batch_size):
+        batch = []
+        for i in range(start, min(start + batch_size, posts)):
+            batch.append({
+                'content': random_content(rng, i),
+                'images': [f"https://cdn.example.com/{i}/{n}.jpg" for n in range(2)],
+                'videos': [f"https://cdn.example.com/{i}/video.mp4"],
+                'shopee_links': [
+                    f"https://shopee.vn/product-i.{rng.randrange(1000)}.{rng.randrange(products)}"
+                    for _ in range(rng.randint(1, 2))
+                ],
+                'original_url': "https://www.threads.net/@benchmark",
+            })
+        db.save_posts(batch, verbose=False, near_duplicate_threshold=None)
+
+    conn = db.conn
+    conn.execute("UPDATE posts SET created_at = datetime('2026-01-01', '+' || id || ' minutes')")
+    conn.execute('UPDATE posts SET is_posted = 1 WHERE abs(random()) % 1000 >= ?',
+                 (int(unposted_ratio * 1000),))
+    conn.commit()
+
+
+def downgrade_indexes(db):
+    """Đưa index về trạng thái trước migration 4 (dữ liệu giữ nguyên) để đo so sánh"""
+    conn = db.conn
+    for name in INDEX_MIGRATION_INDEXES:
+        conn.execute(f'DROP INDEX IF EXISTS {name}')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_content_hash ON posts(content_hash)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_is_posted ON posts(is_posted)')
+    conn.execute(f'PRAGMA user_version = {INDEX_MIGRATION - 1}')
+    conn.execute('ANALYZE')
+    conn.commit()
+
+
+def time_call(func, repeat):
+    """Thời gian trung bình (ms) của 1 lần gọi"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def measure(db, repeat, seed=2):
+    rng = random.Random(seed)
+    max_id = db.conn.execute('SELECT MAX(id) FROM posts').fetchone()[0]
+
+    def page_walk():
+        cursor = None
+        for _ in range(10):
+            _, cursor = db.get_unposted_page(100, cursor)
+            if cursor is None:
+                break
+
+    results = {
+        'get_post': time_call(lambda: db.get_post(rng.randint(1, max_id)), repeat * 10),
+        'get_posts (100 id)': time_call(
+            lambda: db.get_posts(rng.sample(range(1, max_id + 1), 100)), repeat),
+        'get_unposted_posts(100)': time_call(lambda: db.get_unposted_posts(100), repeat),
+        '10 trang get_unposted_page': time_call(page_walk, repeat),
+        'find_near_duplicate': time_call(
+            lambda: db.find_near_duplicate(random_content(rng, rng.randint(1, max_id)) + " 🔥"), repeat),
+        'search (FTS5)': time_call(lambda: db.search(f"Bài {rng.randint(1, max_id)}", limit=20), repeat),
+        'search LIKE (không index)': time_call(lambda: db.conn.execute(
+            "SELECT id FROM posts WHERE content LIKE ? ORDER BY id DESC LIMIT 20",
+            (f"%Bài {rng.randint(1, max_id)}:%",)
+        ).fetchall(), repeat),
+    }
+
+    plans = {}
+    for name, sql in PLAN_QUERIES.items():
+        rows = db.conn.execute('EXPLAIN QUERY PLAN ' + sql).fetchall()
+        plans[name] = [row[-1] for row in rows]
+
+    return results, plans
+
+
+def print_measure(title, results, plans):
+    print(f"\n📊 {title}")
+    for name, ms in results.items():
+        print(f"   {name:<28} {ms:9.2f} ms")
+    for name, steps in plans.items():
+        print(f"   🔎 {name}:")
+        for step in steps:
+            print(f"      {step}")
+
+
+def run_benchmark(posts=100000, products=5000, unposted_ratio=0.1, repeat=20, db_path=None):
+    """
+    Đo chi phí query trên database lớn trước và sau migration index (version 4)
+
+    Tạo dữ liệu, bỏ các index của migration 4 và lùi user_version để đo, rồi
+    migrate tại chỗ lên LATEST_VERSION và đo lại trên cùng dữ liệu.
+
+    Returns:
+        dict: {before, after, migrate_seconds, populate_seconds}
+    """
+    if db_path is None:
+        db_path = Path(tempfile.mkdtemp()) / "benchmark.db"
+
+    db = Database(db_path)
+    try:
+        print(f"\n📝 Tạo {posts} bài viết...")
+        start = time.perf_counter()
+        populate(db, posts, products, unposted_ratio)
+        populate_seconds = time.perf_counter() - start
+        print(f"✅ Tạo xong trong {populate_seconds:.1f}s")
+
+        downgrade_indexes(db)
+        before, before_plans = measure(db, repeat)
+        print_measure(f"Schema version {INDEX_MIGRATION - 1}", before, before_plans)
+
+        start = time.perf_counter()
+        db.init_database()
+        migrate_seconds = time.perf_counter() - start
+
+        after, after_plans = measure(db, repeat)
+        print_measure(f"Schema version {LATEST_VERSION} (migrate mất {migrate_seconds:.2f}s)",
+                      after, after_plans)
+    finally:
+        db.close()
+
+    print("\n⚡ Tăng tốc:")
+    for name in before:
+        print(f"   {name:<28} x{before[name] / max(after[name], 1e-9):.1f}")
+
+    return {
+        'before': before,
+        'after': after,
+        'migrate_seconds': migrate_seconds,
+        'populate_seconds': populate_seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark query Database với nhiều bài viết")
+    parser.add_argument('--posts', type=int, default=100000)
+    parser.add_argument('--products', type=int, default=5000, help="Số sản phẩm Shopee khác nhau")
+    parser.add_argument('--unposted-ratio', type=float, default=0.1, help="Tỉ lệ bài chưa đăng")
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--db', help="File database (mặc định tạo file tạm)")
+    args = parser.parse_args()
+
+    run_benchmark(args.posts, args.products, args.unposted_ratio, args.repeat, args.db)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+import hashlib
+import html
+import io
+import random
+import re
+import threading
+import time
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, urlparse
+from pathlib import Path
+import requests
+from requests.adapters import BaseAdapter
+
+sys.path.append(str(Path(__file__).parent.parent))
+from config.settings import (
+    BENCHMARK_FIXTURE_DIR,
+    BENCHMARK_INITIAL_POSTS,
+    BENCHMARK_BATCH_POSTS,
+    BENCHMARK_LOAD_DELAY_MS,
+    BENCHMARK_REDIRECT_LATENCY,
+)
+from src.crawler.crawl_personal_page import FEED_CONTAINER_CSS, TEXT_SPAN_CSS, MEDIA_CSS
+from src.crawler.post_stream import POST_CSS
+
+
+# Ảnh GIF 1x1 trả về cho mọi request /media/...
+PIXEL_GIF = (
+    b'GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff!\xf9\x04\x01\x00\x00\x00\x00'
+    b',\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;'
+)
+
+# Script chèn vào snapshot: giữ lại BENCHMARK_INITIAL_POSTS bài đầu, các bài còn lại
+# chỉ được thêm vào feed khi scroll gần cuối trang (giống infinite scroll của Threads).
+# Bài mới thêm có div[hidden] trong lúc "đang load".
+# Placeholder: __FEED_CSS__, __INITIAL__, __BATCH__, __DELAY__
+REPLAY_JS = """
+(function () {
+    const feed = document.querySelectorAll('__FEED_CSS__')[2];
+    if (!feed) return;
+
+    const pending = Array.from(feed.children).slice(__INITIAL__);
+    pending.forEach(el => el.remove());
+    let loading = false;
+
+    function loadMore() {
+        if (loading || !pending.length) return;
+        loading = true;
+        setTimeout(() => {
+            for (const el of pending.splice(0, __BATCH__)) {
+                const placeholder = document.createElement('div');
+                placeholder.hidden = true;
+                el.appendChild(placeholder);
+                feed.appendChild(el);
+                setTimeout(() => placeholder.remove(), __DELAY__);
+            }
+            loading = false;
+        }, __DELAY__);
+    }
+
+    window.addEventListener('scroll', () => {
+        if (window.innerHeight + window.scrollY >= document.body.scrollHeight - 800) loadMore();
+    });
+})();
+"""
+
+
+def css_to_tag(css):
+    """'div.a.b' -> ('div', 'a b')"""
+    tag, *classes = css.split('.')
+    return tag or 'div', ' '.join(classes)
+
+
+def fixture_path(name):
+    return Path(BENCHMARK_FIXTURE_DIR) / f"{name}.html"
+
+
+def build_replay_script():
+    return (REPLAY_JS
+            .replace('__FEED_CSS__', FEED_CONTAINER_CSS)
+            .replace('__INITIAL__', str(BENCHMARK_INITIAL_POSTS))
+            .replace('__BATCH__', str(BENCHMARK_BATCH_POSTS))
+            .replace('__DELAY__', str(BENCHMARK_LOAD_DELAY_MS)))
+
+
+def generate_synthetic_fixture(name="synthetic", posts=40, seed=1):
+    """
+    Tạo snapshot giả lập với đúng cấu trúc DOM/selector crawler đang dùng
+
+    Dùng khi chưa có snapshot thật; mỗi bài có nội dung, 0-3 link
+    l.threads.com -> s.shopee.vn và 0-4 ảnh/video.
+
+    Returns:
+        Path: Đường dẫn file fixture
+    """
+    rng = random.Random(seed)
+    feed_tag, feed_classes = css_to_tag(FEED_CONTAINER_CSS)
+    post_tag, post_classes = css_to_tag(POST_CSS)
+    span_tag, span_classes = css_to_tag(TEXT_SPAN_CSS)
+    media_classes = css_to_tag(MEDIA_CSS)[1]
+
+    items = []
+    for i in range(posts):
+        link_parts = []
+        for j in range(rng.randint(0, 3)):
+            short = f"https://s.shopee.vn/{i}x{j}"
+            link_parts.append(
+                f'<a href="https://l.threads.com/?u={quote(short, safe="")}">{short[8:]}</a>'
+            )
+
+        media_parts = []
+        for j in range(rng.randint(0, 4)):
+            if rng.random() < 0.2:
+                media_parts.append(f'<video class="{media_classes}" src="/media/{i}_{j}.mp4"></video>')
+            else:
+                media_parts.append(f'<img class="{media_classes}" src="/media/{i}_{j}.gif">')
+
+        content = html.escape(f"Bài viết số {i + 1}: review sản phẩm {rng.randint(1000, 9999)} 🔥")
+        items.append(
+            f'<{post_tag} class="{post_classes}">'
+            f'<{span_tag} class="{span_classes}"><span>{content}</span></{span_tag}>'
+            f'<{span_tag} class="{span_classes}"><span>Link mua:</span>{"".join(link_parts)}</{span_tag}>'
+            f'<div>{"".join(media_parts)}</div>'
+            f'<div style="height: 600px"></div>'
+            f'</{post_tag}>'
+        )
+
+    # Feed là container thứ 3 khớp FEED_CONTAINER_CSS
+    page = (
+        f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{name}</title></head><body>'
+        f'<{feed_tag} class="{feed_classes}"><{feed_tag} class="{feed_classes}">'
+        f'<{feed_tag} class="{feed_classes}">{"".join(items)}</{feed_tag}>'
+        f'</{feed_tag}></{feed_tag}>'
+        f'</body></html>'
+    )
+
+    path = fixture_path(name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(page, encoding='utf-8')
+    print(f"✅ Đã tạo fixture {path} ({posts} bài)")
+    return path
+
+
+def record_profile_snapshot(profile_url, name=None, scrolls=30):
+    """
+    Ghi snapshot trang cá nhân Threads thật (dùng browser profile đã đăng nhập)
+
+    Scroll để load thêm bài rồi lưu DOM đã render, bỏ hết <script>.
+
+    Returns:
+        Path: Đường dẫn file fixture
+    """
+    from src.core.browser_manager import BrowserManager
+
+    name = name or urlparse(profile_url).path.strip('/').lstrip('@') or "profile"
+    browser = BrowserManager(headless=False)
+
+    try:
+        driver = browser.init_driver()
+        driver.get(profile_url)
+        time.sleep(5)
+
+        for _ in range(scrolls):
+            driver.execute_script("window.scrollBy(0, window.innerHeight);")
+            time.sleep(1.5)
+
+        page = driver.execute_script("return document.documentElement.outerHTML")
+    finally:
+        browser.close()
+
+    page = re.sub(r'<script\b.*?</script>', '', page, flags=re.S | re.I)
+    page = '<!DOCTYPE html>' + page
+
+    path = fixture_path(name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(page, encoding='utf-8')
+    print(f"✅ Đã lưu snapshot {profile_url} -> {path}")
+    return path
+
+
+class FixtureServer:
+    """
+    Server HTTP local phát lại snapshot: GET /@<name> trả về fixtures/<name>.html
+    kèm script infinite scroll, GET /media/... trả về ảnh 1x1
+    """
+
+    def __init__(self, host='127.0.0.1', port=0):
+        replay_script = build_replay_script()
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = urlparse(self.path).path
+
+                if path.startswith('/media/'):
+                    self._send(200, 'image/gif', PIXEL_GIF)
+                    return
+
+                fixture = fixture_path(path.strip('/').lstrip('@'))
+                if not path.startswith('/@') or not fixture.exists():
+                    self._send(404, 'text/plain', b'not found')
+                    return
+
+                page = fixture.read_text(encoding='utf-8')
+                script = f'<script>{replay_script}</script>'
+                if '</body>' in page:
+                    page = page.replace('</body>', script + '</body>', 1)
+                else:
+                    page += script
+                self._send(200, 'text/html; charset=utf-8', page.encode('utf-8'))
+
+            def _send(self, status, content_type, body):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def profile_url(self, name):
+        return f"{self.base_url}/@{name}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+class ReplayRedirectAdapter(BaseAdapter):
+    """
+    Adapter requests trả lời redirect offline: link rút gọn s.shopee.vn/<code>
+    -> 302 tới https://shopee.vn/product/<shop>/<item>, sau độ trễ giả lập
+    """
+
+    def __init__(self, latency=BENCHMARK_REDIRECT_LATENCY):
+        super().__init__()
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def send(self, request, **kwargs):
+        with self._lock:
+            self.requests += 1
+        time.sleep(self.latency)
+
+        code = urlparse(request.url).path.strip('/')
+        item = int(hashlib.md5(code.encode()).hexdigest()[:8], 16)
+
+        response = requests.Response()
+        response.request = request
+        response.url = request.url
+        response.raw = io.BytesIO(b'')
+        if code:
+            response.status_code = 302
+            response.reason = 'Found'
+            response.headers['Location'] = f"https://shopee.vn/product/1000/{item}"
+        else:
+            response.status_code = 404
+            response.reason = 'Not Found'
+        return response
+
+    def close(self):
+        pass
+
+
+if __name__ == "__main__":
+    # python benchmarks/fixture_replay.py generate [số bài]
+    # python benchmarks/fixture_replay.py record <profile_url> [số lần scroll]
+    command = sys.argv[1] if len(sys.argv) > 1 else "generate"
+
+    if command == "record":
+        record_profile_snapshot(sys.argv[2], scrolls=int(sys.argv[3]) if len(sys.argv) > 3 else 30)
+    else:
+        generate_synthetic_fixture(posts=int(sys.argv[2]) if len(sys.argv) > 2 else 40)
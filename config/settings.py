@@ -14,7 +14,117 @@ BROWSER_PROFILE_DIR.mkdir(parents=True, exist_ok=True)
 HEADLESS_MODE = False
 PAGE_LOAD_TIMEOUT = 30
 IMPLICIT_WAIT = 10
+EXPLICIT_WAITS_ONLY = True  # Tắt implicit wait, chỉ đợi qua WaitEngine (tránh stall 10s khi selector không match)
 
 # Shopee settings
 SHOPEE_AFFILIATE_URL = "https://affiliate.shopee.vn/offer/custom_link"
-LOGIN_WAIT_TIME = 300  # 2 phút để đăng nhập
\ No newline at end of file
+LOGIN_WAIT_TIME = 300  # 2 phút để đăng nhập
+
+# Affiliate link cache
+AFFILIATE_CACHE_PATH = BASE_DIR / "data" / "affiliate_cache.db"
+AFFILIATE_CACHE_TTL = 7 * 24 * 3600  # 7 ngày
+AFFILIATE_CACHE_MAX_ENTRIES = 10000
+
+# Converter pool (API)
+BROWSER_POOL_PROFILE_DIR = BASE_DIR / "data" / "browser_profile_pool"
+CONVERTER_POOL_SIZE = 2
+CONVERTER_POOL_WAIT_TIMEOUT = 30  # Số giây tối đa chờ 1 converter rảnh
+CONVERTER_BATCH_MAX_URLS = 100  # Số link tối đa cho /api/convert/batch
+
+# Job queue convert bất đồng bộ (API)
+JOB_QUEUE_MAX_DEPTH = 200  # Số job tối đa đang chờ
+JOB_DEADLINE = 120  # Số giây tối đa từ lúc submit đến khi job phải được xử lý
+JOB_RESULT_TTL = 600  # Giữ kết quả job trong 10 phút
+JOB_STREAM_TIMEOUT = 300  # Thời gian tối đa 1 kết nối stream
+
+# Backend convert: "network" gọi thẳng API của trang custom link (lỗi thì fallback về browser),
+# "browser" luôn thao tác trên giao diện
+CONVERTER_BACKEND = "network"
+SHOPEE_AFFILIATE_API_URL = "https://affiliate.shopee.vn/api/v3/gql"
+AFFILIATE_REQUEST_TEMPLATE_PATH = BASE_DIR / "data" / "affiliate_request_template.json"
+NETWORK_CONVERTER_BATCH_SIZE = 20  # Số link tối đa mỗi request API
+NETWORK_CONVERTER_TIMEOUT = 15
+NETWORK_CONVERTER_MAX_FAILURES = 3  # Lỗi liên tiếp bao nhiêu lần thì tạm tắt, chỉ dùng browser
+
+# Chế độ "warm form": giữ trang custom link, chỉ reset form giữa các lần convert
+CONVERTER_WARM_FORM = True
+CONVERTER_RELOAD_EVERY = 20  # Reload trang sau mỗi N lần convert
+
+# Wait engine: đợi theo điều kiện thay cho sleep cố định
+WAIT_DEFAULT_TIMEOUT = 10
+WAIT_POLL_INTERVAL = 0.2
+
+# Stream bài viết trên trang cá nhân
+POST_STREAM_MAX_IDLE_SCROLLS = 50  # Scroll liên tiếp bao nhiêu lần không có bài mới thì dừng
+POST_STREAM_BATCH_SIZE = 5  # Số bài lấy tối đa mỗi lần execute_script
+
+# Crawl tăng dần theo watermark của từng trang cá nhân
+WATERMARK_SIZE = 5  # Số hash bài mới nhất lưu lại
+WATERMARK_STOP_MATCHES = 2  # Gặp liên tiếp bao nhiêu bài đã biết thì dừng (tránh dừng sớm vì bài ghim)
+
+# Danh sách trang cá nhân cần crawl
+# priority: số lớn hơn được crawl trước khi nhiều trang cùng đến hạn
+# refresh_minutes: bao lâu crawl lại 1 lần
+CRAWL_PROFILES = [
+    {"url": "https://www.threads.com/@wandererthroughspace", "priority": 2, "refresh_minutes": 60},
+    {"url": "https://www.threads.com/@hathu_vy", "priority": 1, "refresh_minutes": 120},
+    {"url": "https://www.threads.com/@cam_review08", "priority": 1, "refresh_minutes": 120},
+    {"url": "https://www.threads.com/@iam.lamii_", "priority": 1, "refresh_minutes": 120},
+    {"url": "https://www.threads.com/@__phlinh.ne", "priority": 1, "refresh_minutes": 120},
+    {"url": "https://www.threads.com/@puca.daily", "priority": 1, "refresh_minutes": 120},
+    {"url": "https://www.threads.com/@minhmiu2024", "priority": 1, "refresh_minutes": 120},
+    {"url": "https://www.threads.com/@luulam.010", "priority": 1, "refresh_minutes": 120},
+]
+
+# Scheduler crawl nhiều trang
+SCHEDULER_WORKERS = 2  # Số Chrome driver crawl song song
+SCHEDULER_POSTS_PER_MINUTE = 12  # Tổng số bài tối đa mỗi phút (cho tất cả worker)
+SCHEDULER_CRAWL_LIMIT = 15  # Số bài tối đa mỗi lần crawl 1 trang
+SCHEDULER_POLL_INTERVAL = 30  # Số giây giữa các lần kiểm tra trang đến hạn
+SCHEDULER_RETRY_MINUTES = 5  # Crawl lỗi: chờ N phút rồi thử lại, gấp đôi mỗi lần lỗi liên tiếp (tối đa refresh_minutes)
+
+# Resolve link redirect (l.threads.com -> shopee.vn) song song
+RESOLVER_WORKERS = 8  # Số link resolve cùng lúc
+RESOLVER_PER_HOST_CONCURRENCY = 3  # Số request đồng thời tối đa tới 1 host
+RESOLVER_PER_HOST_INTERVAL = 0.3  # Khoảng cách tối thiểu (giây) giữa 2 request tới cùng 1 host
+RESOLVER_MAX_HOPS = 10
+RESOLVER_TIMEOUT = 10
+
+# Cache kết quả resolve redirect (lưu trong database chính)
+REDIRECT_CACHE_TTL = 30 * 24 * 3600  # Link resolve thành công: 30 ngày
+REDIRECT_CACHE_NEGATIVE_TTL = 6 * 3600  # Captcha/lỗi: 6 giờ rồi thử lại
+
+# Benchmark crawler offline (snapshot trang cá nhân phát lại qua server local)
+BENCHMARK_FIXTURE_DIR = BASE_DIR / "benchmarks" / "fixtures"
+BENCHMARK_INITIAL_POSTS = 5  # Số bài có sẵn khi load trang
+BENCHMARK_BATCH_POSTS = 3  # Số bài load thêm mỗi lần scroll tới cuối
+BENCHMARK_LOAD_DELAY_MS = 300  # Độ trễ giả lập khi load thêm bài
+BENCHMARK_REDIRECT_LATENCY = 0.2  # Độ trễ giả lập mỗi bước redirect (giây)
+
+# Pacing: toàn bộ delay giả lập người dùng (xem src/core/pacing.py)
+PACING_PROFILE = "balanced"  # stealth | balanced | fast
+PACING_SESSION_BUDGET = None  # Tổng số giây delay tối đa mỗi phiên crawl (None = không giới hạn)
+PACING_BACKOFF_MULTIPLIER = 2.0  # Gặp captcha/login wall: nhân hệ số delay
+PACING_BACKOFF_COOLDOWN = (20, 40)  # Nghỉ thêm (giây) ngay khi gặp captcha/login wall
+PACING_SPEEDUP = 0.9  # Phiên ổn định: giảm hệ số delay
+PACING_HEALTHY_STREAK = 5  # Số bài ổn định liên tiếp trước khi tăng tốc
+PACING_LOG_PATH = BASE_DIR / "data" / "pacing_log.jsonl"
+
+# SQLite (data/threads_posts.db): WAL + mỗi thread 1 connection
+DB_BUSY_TIMEOUT = 30  # Số giây chờ khi database đang bị thread/process khác ghi
+DB_SYNCHRONOUS = "NORMAL"  # WAL + NORMAL: an toàn khi crash app, ít fsync hơn FULL
+DB_CACHE_SIZE_KB = 20000  # Page cache mỗi connection (KB)
+
+# Link affiliate dùng chung theo sản phẩm (bảng affiliate_links)
+AFFILIATE_MAX_FAILURES = 3  # Convert lỗi quá N lần thì không tự thử lại nữa
+
+# Phát hiện bài gần trùng (MinHash + LSH, xem src/utils/minhash.py)
+NEAR_DUPLICATE_THRESHOLD = 0.75  # Độ giống Jaccard ước lượng để coi là trùng (None = tắt)
+MINHASH_PERMUTATIONS = 64  # Số giá trị MinHash mỗi bài
+MINHASH_BANDS = 16  # Số band LSH (MINHASH_PERMUTATIONS chia hết cho số band)
+MINHASH_SHINGLE_SIZE = 5  # Số ký tự mỗi shingle
+# Đổi 3 tham số MinHash thì phải chạy Database.rebuild_near_duplicate_index()
+
+# Tìm kiếm bài viết (FTS5, API /api/posts/search)
+SEARCH_PAGE_SIZE = 20  # Số bài mỗi trang mặc định
+SEARCH_MAX_PAGE_SIZE = 100  # Số bài tối đa mỗi trang
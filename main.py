@@ -5,7 +5,11 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent))
 
 from src.core.browser_manager import BrowserManager
+from src.core.wait_engine import wait_stats
+from src.core.selector_stats import selector_stats
+from config.settings import CRAWL_PROFILES
 from src.crawler.crawl_personal_page import ThreadsCrawler
+from src.crawler.crawl_pipeline import crawl_and_save
 from src.database.database import Database
 from src.downloader.media_downloader import MediaDownloader
 from src.poster.threads_poster import ThreadsPoster
@@ -27,15 +31,9 @@ def main():
     print("="*80 + "\n")
     
     # ====== CONFIG ======
-    TARGET_PROFILE = "https://www.threads.com/@wandererthroughspace"
-    # https://www.threads.com/@hathu_vy
-    # https://www.threads.com/@cam_review08
-    # https://www.threads.com/@iam.lamii_
-    # https://www.threads.com/@__phlinh.ne
-    # https://www.threads.com/@puca.daily
-    # https://www.threads.com/@minhmiu2024
-    # https://www.threads.com/@luulam.010
-    # https://www.threads.com/@wandererthroughspace
+    # Danh sách trang cá nhân nằm trong config/settings.py (CRAWL_PROFILES),
+    # dùng src/scheduler/crawl_scheduler.py để crawl nhiều trang cùng lúc
+    TARGET_PROFILE = CRAWL_PROFILES[0]['url']
     CRAWL_LIMIT = 15  # Số bài viết cần crawl
     POST_LIMIT = 15   # Số bài viết cần đăng
     
@@ -53,40 +51,15 @@ def main():
         print("GIAI ĐOẠN 1: CRAWL VÀ LƯU VÀO DATABASE")
         print("=" * 80 + "\n")
         
-        crawler = ThreadsCrawler(browser)
-        posts_data = crawler.crawl_profile(TARGET_PROFILE, limit=CRAWL_LIMIT)
+        crawler = ThreadsCrawler(browser, db=db)
         
-        if not posts_data:
-            print("❌ Không crawl được bài viết!")
-            return
-        
-        # Lưu vào database
-        print(f"\n💾 Đang lưu {len(posts_data)} bài viết vào database...")
-        saved_count = 0
+        # Lưu từng bài ngay khi crawl xong, dừng giữa chừng cũng không mất dữ liệu
+        crawled_count, saved_count = crawl_and_save(crawler, db, TARGET_PROFILE, CRAWL_LIMIT)
         
-        for i, post_data in enumerate(posts_data, 1):
-            print(f"\n--- Bài {i}/{len(posts_data)} ---")
-            
-            # Kết hợp content
-            full_content = post_data['content_1']
-            if post_data['content_2']:
-                full_content += "\n\n" + post_data['content_2']
-            
-            post_id = db.save_post(
-                content=full_content,
-                images=post_data['images'],
-                videos=post_data['videos'],
-                shopee_links=post_data['shopee_links'],
-                original_url=TARGET_PROFILE
-            )
-            
-            if post_id:
-                saved_count += 1
-                print(f"✅ Đã lưu post_id={post_id}")
-            else:
-                print("⚠️  Bài viết đã tồn tại, bỏ qua")
+        if not crawled_count:
+            print("ℹ️  Không có bài viết mới kể từ lần crawl trước")
         
-        print(f"\n✅ Đã lưu {saved_count}/{len(posts_data)} bài viết mới")
+        print(f"\n✅ Đã lưu {saved_count}/{crawled_count} bài viết mới")
         
         # ===== GIAI ĐOẠN 2: LẤY BÀI CHƯA ĐĂNG VÀ UPLOAD =====
         print("\n" + "=" * 80)
@@ -105,6 +78,21 @@ def main():
         poster = ThreadsPoster(browser)
         posted_count = 0
         
+        # Convert mỗi sản phẩm 1 lần cho tất cả bài chưa đăng, kết quả dùng chung cho mọi bài
+        pending_links = db.get_pending_affiliate_links(post_ids=[post['id'] for post in unposted])
+        if pending_links:
+            print(f"🔄 Đang convert {len(pending_links)} sản phẩm Shopee...")
+            results = converter.convert_multiple([link['canonical_url'] for link in pending_links])
+            
+            for link in pending_links:
+                aff_link = results.get(link['canonical_url'])
+                if aff_link:
+                    db.set_affiliate_link(link['id'], aff_link)
+                else:
+                    db.record_affiliate_failure(link['id'], "Convert thất bại")
+            
+            unposted = db.get_posts([post['id'] for post in unposted])
+        
         for i, post in enumerate(unposted, 1):
             if posted_count >= POST_LIMIT:
                 print(f"\n✅ Đã đăng đủ {POST_LIMIT} bài, dừng lại!")
@@ -119,17 +107,9 @@ def main():
             content_1 = content_parts[0] if len(content_parts) > 0 else ""
             content_2 = content_parts[1] if len(content_parts) > 1 else None
             
-            # Convert Shopee links
-            affiliate_links = []
+            # Link affiliate đã convert ở trên (theo sản phẩm)
+            affiliate_links = post['affiliate_links']
             if post['shopee_links']:
-                print("🔄 Đang convert Shopee links...")
-                for shop_link in post['shopee_links']:
-                    aff_link = converter.convert_to_affiliate(shop_link)
-                    if aff_link:
-                        affiliate_links.append(aff_link)
-                        db.update_affiliate_link(post_id, shop_link, aff_link)
-                    time.sleep(2)
-                
                 # Thay thế link trong content
                 if affiliate_links:
                     print("🔄 Thay thế link trong content...")
@@ -181,6 +161,14 @@ def main():
         for key, value in stats.items():
             print(f"  {key}: {value}")
         
+        cache_stats = converter.cache.stats()
+        print(f"\n⚡ Cache affiliate: {cache_stats['hits']} hit / {cache_stats['misses']} miss "
+              f"(tiết kiệm ~{cache_stats['saved_seconds']}s browser)")
+        crawler.resolver.print_report()
+        
+        wait_stats.print_report()
+        selector_stats.print_report()
+        
         print(f"\n✅ Đã đăng: {posted_count}/{POST_LIMIT} bài")
         
         print("\n" + "=" * 80)
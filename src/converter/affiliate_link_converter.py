@@ -2,49 +2,134 @@ import time
 import sys
 from pathlib import Path
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.common.keys import Keys
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 
 # Add root directory to path
 sys.path.append(str(Path(__file__).parent.parent.parent))
-from config.settings import SHOPEE_AFFILIATE_URL
+from config.settings import (
+    SHOPEE_AFFILIATE_URL,
+    CONVERTER_BACKEND,
+    CONVERTER_WARM_FORM,
+    CONVERTER_RELOAD_EVERY,
+)
 from src.core.browser_manager import BrowserManager
+from src.core.wait_engine import WaitEngine
+from src.converter.link_cache import get_shared_cache
+from src.converter.network_converter import NetworkConverter
+from src.utils.url_utils import canonicalize_shopee_url
+
+
+# Selector trên trang custom link
+TEXTAREA_XPATH = "//div[@id='customLink_original_url']//textarea"
+GET_LINK_BUTTON_XPATH = "//button[span[text()='Lấy link']]"
+MODAL_XPATH = "//div[contains(@class, 'ant-modal-content')]"
+MODAL_CLOSE_XPATH = MODAL_XPATH + "//button[contains(@class, 'ant-modal-close')]"
+RESULT_TEXTAREA_XPATH = MODAL_XPATH + "//div[@class='success-modal-content']//textarea"
 
 
 class ShopeeConverter:
     """Convert link Shopee thường thành link affiliate"""
     
-    def __init__(self, browser_manager):
+    def __init__(self, browser_manager, cache=None, backend=CONVERTER_BACKEND,
+                 warm_form=CONVERTER_WARM_FORM, reload_every=CONVERTER_RELOAD_EVERY):
         """
         Args:
             browser_manager: Instance của BrowserManager đã init driver
+            cache: AffiliateLinkCache (mặc định dùng cache chung)
+            backend: "network" (gọi API, fallback browser) hoặc "browser"
+            warm_form: Giữ nguyên trang, chỉ reset form giữa các lần convert
+            reload_every: Ở chế độ warm_form, reload trang sau mỗi N lần convert
         """
         self.browser = browser_manager
         self.driver = browser_manager.driver
+        self.cache = cache if cache is not None else get_shared_cache()
+        self.warm_form = warm_form
+        self.reload_every = reload_every
+        self.waits = WaitEngine(self.driver)
+        
+        # Form đang ở trạng thái dùng lại được (lần convert trước thành công)
+        self._form_ready = False
+        self._modal_open = False
+        self._conversions_since_reload = 0
         
         if not self.driver:
             raise Exception("Browser chưa được khởi tạo!")
+        
+        self.network = NetworkConverter(self.driver) if backend == "network" else None
     
-    def convert_to_affiliate(self, shopee_url):
+    def convert_to_affiliate(self, shopee_url, check_cache=True):
+        """
+        Convert link Shopee thành affiliate, ưu tiên lấy từ cache
+        
+        Args:
+            shopee_url: Link Shopee
+            check_cache: False nếu caller đã tra cache (tránh tính miss 2 lần)
+        
+        Returns:
+            str: Link affiliate hoặc None nếu thất bại
+        """
+        if check_cache:
+            affiliate_link = self.cache.get(shopee_url)
+            if affiliate_link:
+                print(f"⚡ Cache hit: {shopee_url[:60]}... -> {affiliate_link}")
+                return affiliate_link
+        
+        return self._convert_and_cache(shopee_url)
+    
+    def _convert_and_cache(self, shopee_url):
+        """Convert (bỏ qua bước tra cache) và lưu kết quả vào cache"""
+        start = time.perf_counter()
+        affiliate_link = None
+        
+        if self.network and self.network.available:
+            affiliate_link = self.network.convert(shopee_url)
+            if affiliate_link:
+                print(f"⚡ API convert: {shopee_url[:60]}... -> {affiliate_link}")
+        
+        if not affiliate_link:
+            affiliate_link = self._convert_in_browser(shopee_url)
+            self._capture_network_request(shopee_url, affiliate_link)
+        
+        if affiliate_link:
+            self.cache.set(shopee_url, affiliate_link, elapsed=time.perf_counter() - start)
+        
+        return affiliate_link
+    
+    def _capture_network_request(self, shopee_url, affiliate_link):
+        """
+        Sau 1 lần convert bằng browser thành công, học lại request API từ performance log
+        
+        Mỗi lần convert bằng browser đều đọc hết log (kể cả khi đã capture hoặc convert lỗi)
+        để chromedriver không giữ log mãi trong bộ nhớ.
+        """
+        if not self.network or not self.browser.network_log:
+            return
+        
+        if affiliate_link and (not self.network.captured or not self.network.available):
+            self.network.capture_from_logs(shopee_url)
+        else:
+            self.network.drain_logs()
+    
+    def _convert_in_browser(self, shopee_url):
+        """Convert bằng cách thao tác trên trang custom link của Shopee Affiliate"""
         print(f"\n{'='*60}")
         print(f"🔄 Đang convert link: {shopee_url}")
         print(f"{'='*60}\n")
         
+        # Lỗi giữa chừng thì lần sau phải reload trang
+        form_ready, self._form_ready = self._form_ready, False
+        
         try:
-            # 1. REFRESH trang để reset state
-            print("📍 Bước 0: Mở và refresh trang Shopee...")
-            self.driver.get(SHOPEE_AFFILIATE_URL)
-            time.sleep(1)
-            self.driver.refresh()
-            time.sleep(1)
+            # 1. Reset form tại chỗ, hoặc REFRESH trang để reset state
+            if not (form_ready and self._reset_form()):
+                print("📍 Bước 0: Mở lại trang Shopee...")
+                self._reload_page()
 
             # 2. Tiếp tục như cũ
             print("📍 Bước 1: Tìm ô nhập link...")
-            textarea = WebDriverWait(self.driver, 10).until(
-                EC.presence_of_element_located(
-                    (By.XPATH, "//div[@id='customLink_original_url']//textarea")
-                )
+            textarea = self.waits.element_present(
+                (By.XPATH, TEXTAREA_XPATH), "converter.textarea", timeout=10
             )
             
             # Clear và nhập link
@@ -56,10 +141,8 @@ class ShopeeConverter:
             
             # 3. Click button "Lấy link"
             print("📍 Bước 4: Click nút 'Lấy link'...")
-            get_link_button = WebDriverWait(self.driver, 10).until(
-                EC.element_to_be_clickable(
-                    (By.XPATH, "//button[span[text()='Lấy link']]")
-                )
+            get_link_button = self.waits.element_clickable(
+                (By.XPATH, GET_LINK_BUTTON_XPATH), "converter.get_link_button", timeout=10
             )
             get_link_button.click()
             print("✅ Đã click!")
@@ -69,10 +152,8 @@ class ShopeeConverter:
             
             try:
                 # Đợi modal success hiện lên
-                affiliate_textarea = WebDriverWait(self.driver, 15).until(
-                    EC.presence_of_element_located(
-                        (By.XPATH, "//div[contains(@class, 'ant-modal-content')]//div[@class='success-modal-content']//textarea")
-                    )
+                affiliate_textarea = self.waits.element_present(
+                    (By.XPATH, RESULT_TEXTAREA_XPATH), "converter.result_modal", timeout=15
                 )
                 
                 # Lấy link từ textarea
@@ -86,14 +167,10 @@ class ShopeeConverter:
                     print(f"📤 Link affiliate: {affiliate_link}")
                     print(f"{'='*60}\n")
                     
-                    # Đóng modal (optional - tìm nút close nếu cần)
-                    try:
-                        close_button = self.driver.find_element(By.XPATH, "//div[contains(@class, 'ant-modal-content')]//button[contains(@class, 'ant-modal-close')]")
-                        close_button.click()
-                        time.sleep(0.5)
-                    except:
-                        pass  # Không sao nếu không tìm thấy nút close
-                    
+                    # Modal được đóng ở lần convert sau (_reset_form) hoặc mất khi reload
+                    self._conversions_since_reload += 1
+                    self._form_ready = self.warm_form
+                    self._modal_open = True
                     return affiliate_link
                 else:
                     print("⚠️  Link affiliate trống!")
@@ -118,31 +195,129 @@ class ShopeeConverter:
             traceback.print_exc()
             return None
     
-    def convert_multiple(self, shopee_urls):
+    def prepare(self):
+        """Mở sẵn trang custom link để lần convert đầu tiên không phải reload"""
+        self.driver.get(SHOPEE_AFFILIATE_URL)
+        self._modal_open = False
+        self._conversions_since_reload = 0
+        self._form_ready = self.warm_form
+    
+    def _reload_page(self):
+        """Mở lại trang custom link từ đầu (ô nhập link được đợi ở bước sau)"""
+        self.driver.get(SHOPEE_AFFILIATE_URL)
+        self._modal_open = False
+        self._conversions_since_reload = 0
+    
+    def _reset_form(self):
+        """
+        Đưa form về trạng thái ban đầu mà không reload trang:
+        đóng modal kết quả, xóa ô nhập, đợi nút 'Lấy link' hết loading
+        
+        Returns:
+            bool: False nếu cần reload trang (đã đủ reload_every lần hoặc reset lỗi)
+        """
+        if self._conversions_since_reload >= self.reload_every:
+            print(f"🔄 Đã convert {self._conversions_since_reload} link, reload trang...")
+            return False
+        
+        if SHOPEE_AFFILIATE_URL not in self.driver.current_url:
+            return False
+        
+        print("📍 Bước 0: Reset form (không reload trang)...")
+        
+        try:
+            if self._modal_open:
+                close_button = self.waits.element_clickable(
+                    (By.XPATH, MODAL_CLOSE_XPATH), "converter.modal_close", timeout=3
+                )
+                close_button.click()
+                self.waits.element_invisible(
+                    (By.XPATH, RESULT_TEXTAREA_XPATH), "converter.modal_closed", timeout=5
+                )
+                self._modal_open = False
+            
+            textarea = self.waits.element_clickable(
+                (By.XPATH, TEXTAREA_XPATH), "converter.textarea_ready", timeout=5
+            )
+            textarea.send_keys(Keys.CONTROL, 'a')
+            textarea.send_keys(Keys.DELETE)
+            
+            self.waits.until(
+                lambda d: 'ant-btn-loading' not in (
+                    d.find_element(By.XPATH, GET_LINK_BUTTON_XPATH).get_attribute('class') or ''
+                ),
+                "converter.button_idle", timeout=5
+            )
+            return True
+        
+        except Exception as e:
+            print(f"⚠️  Không reset được form, reload trang: {e}")
+            return False
+    
+    def convert_multiple(self, shopee_urls, check_cache=True):
         """
         Convert nhiều link cùng lúc
         
+        Link trùng sản phẩm (sau khi chuẩn hóa) chỉ convert 1 lần.
+        Các link chưa có trong cache được gửi qua API theo batch trước,
+        link nào API lỗi mới convert bằng browser. Chỉ nghỉ giữa các lần
+        thực sự phải convert bằng browser.
+        
         Args:
             shopee_urls (list): List các link Shopee
-            
+            check_cache: False nếu caller đã tra cache các link này (tránh tính miss 2 lần)
+        
         Returns:
             dict: {original_url: affiliate_url}
         """
-        results = {}
+        converted = {}  # canonical url -> affiliate link
+        pending = {}    # canonical url -> link gốc đầu tiên cần convert
         
         print(f"\n🔄 Bắt đầu convert {len(shopee_urls)} links...\n")
         
-        for i, url in enumerate(shopee_urls, 1):
-            print(f"\n--- Link {i}/{len(shopee_urls)} ---")
-            affiliate_link = self.convert_to_affiliate(url)
-            results[url] = affiliate_link
+        for url in shopee_urls:
+            key = canonicalize_shopee_url(url)
+            if key in converted or key in pending:
+                continue
             
-            # Đợi giữa các lần convert để tránh spam
-            if i < len(shopee_urls):
+            affiliate_link = self.cache.get(url) if check_cache else None
+            if affiliate_link:
+                print(f"⚡ Cache hit: {url[:60]}... -> {affiliate_link}")
+                converted[key] = affiliate_link
+            else:
+                pending[key] = url
+        
+        # 1 request API cho cả batch
+        if pending and self.network and self.network.available:
+            start = time.perf_counter()
+            api_results = self.network.convert_many(list(pending.values()))
+            elapsed = (time.perf_counter() - start) / len(pending)
+            
+            for key, url in list(pending.items()):
+                affiliate_link = api_results.get(url)
+                if affiliate_link:
+                    print(f"⚡ API convert: {url[:60]}... -> {affiliate_link}")
+                    self.cache.set(url, affiliate_link, elapsed=elapsed)
+                    converted[key] = affiliate_link
+                    del pending[key]
+        
+        # Còn lại convert bằng browser
+        for i, (key, url) in enumerate(pending.items(), 1):
+            print(f"\n--- Link {i}/{len(pending)} (browser) ---")
+            
+            # Đợi giữa các lần convert bằng browser để tránh spam
+            if i > 1:
                 time.sleep(2)
+            
+            start = time.perf_counter()
+            affiliate_link = self._convert_in_browser(url)
+            self._capture_network_request(url, affiliate_link)
+            
+            if affiliate_link:
+                self.cache.set(url, affiliate_link, elapsed=time.perf_counter() - start)
+            converted[key] = affiliate_link
         
-        return results
-
+        return {url: converted.get(canonicalize_shopee_url(url)) for url in shopee_urls}
 
 def test_converter():
     """Test function - Chạy thử converter"""
@@ -0,0 +1,121 @@
+import queue
+import threading
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from config.settings import (
+    CONVERTER_POOL_SIZE,
+    CONVERTER_POOL_WAIT_TIMEOUT,
+    CONVERTER_BACKEND,
+)
+from src.core.browser_manager import BrowserManager
+from src.converter.affiliate_link_converter import ShopeeConverter
+from src.converter.link_cache import get_shared_cache
+
+
+class PoolExhaustedError(Exception):
+    """Không có converter nào rảnh trong thời gian chờ cho phép"""
+
+
+class ConverterPool:
+    """
+    Pool gồm N Chrome driver đã mở sẵn trang custom link của Shopee Affiliate
+
+    Mỗi request mượn 1 converter, convert xong thì trả lại pool.
+    Driver đầu tiên dùng profile chính, các driver còn lại dùng bản clone
+    (Chrome không cho 2 process dùng chung user-data-dir).
+    """
+
+    def __init__(self, size=CONVERTER_POOL_SIZE, headless=True,
+                 wait_timeout=CONVERTER_POOL_WAIT_TIMEOUT, cache=None):
+        self.size = size
+        self.headless = headless
+        self.wait_timeout = wait_timeout
+        self.cache = cache if cache is not None else get_shared_cache()
+
+        self.browsers = []
+        self._available = queue.Queue()
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._checkouts = 0
+        self._exhausted = 0
+
+    def start(self):
+        """Khởi tạo toàn bộ driver và mở sẵn trang Shopee Affiliate"""
+        print(f"🔧 Đang khởi tạo converter pool ({self.size} driver)...")
+
+        for i in range(self.size):
+            profile_path = None
+            if i > 0:
+                profile_path = BrowserManager.clone_profile(f"converter_{i}")
+
+            browser = BrowserManager(
+                headless=self.headless,
+                profile_path=profile_path,
+                network_log=(CONVERTER_BACKEND == "network")
+            )
+            browser.init_driver()
+            self.browsers.append(browser)
+
+            converter = ShopeeConverter(browser, cache=self.cache)
+            converter.prepare()
+            self._available.put(converter)
+
+            print(f"  ✅ Converter {i + 1}/{self.size} đã sẵn sàng")
+
+        print("✅ Converter pool đã sẵn sàng!")
+
+    @contextmanager
+    def acquire(self, timeout=None):
+        """
+        Mượn 1 converter từ pool
+
+        Args:
+            timeout: Số giây chờ tối đa (mặc định: wait_timeout của pool)
+
+        Raises:
+            PoolExhaustedError: Nếu hết thời gian chờ mà không có converter rảnh
+        """
+        wait = self.wait_timeout if timeout is None else timeout
+
+        try:
+            converter = self._available.get(timeout=wait)
+        except queue.Empty:
+            with self._lock:
+                self._exhausted += 1
+            raise PoolExhaustedError(
+                f"Tất cả {self.size} converter đang bận, đã chờ {wait}s"
+            )
+
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+
+        try:
+            yield converter
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._available.put(converter)
+
+    def stats(self):
+        """Thống kê trạng thái pool"""
+        with self._lock:
+            return {
+                'size': self.size,
+                'available': self._available.qsize(),
+                'in_use': self._in_use,
+                'checkouts': self._checkouts,
+                'exhausted': self._exhausted,
+            }
+
+    def close(self):
+        """Đóng toàn bộ driver trong pool"""
+        for browser in self.browsers:
+            try:
+                browser.close()
+            except Exception as e:
+                print(f"⚠️  Lỗi đóng browser: {e}")
+        self.browsers = []
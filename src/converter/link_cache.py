@@ -0,0 +1,170 @@
+import sqlite3
+import threading
+import time
+import sys
+from collections import OrderedDict
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from config.settings import (
+    AFFILIATE_CACHE_PATH,
+    AFFILIATE_CACHE_TTL,
+    AFFILIATE_CACHE_MAX_ENTRIES,
+)
+from src.utils.url_utils import canonicalize_shopee_url
+
+
+class AffiliateLinkCache:
+    """
+    Cache link affiliate theo sản phẩm Shopee (shop_id + item_id)
+
+    - Đọc: chỉ tra dict trong RAM, không đụng tới driver hay SQLite
+    - Ghi: ghi vào RAM và SQLite để giữ cache giữa các lần chạy
+    - Hết hạn theo TTL, vượt quá max_entries thì bỏ entry ít dùng nhất (LRU)
+    """
+
+    def __init__(self, db_path=AFFILIATE_CACHE_PATH, ttl=AFFILIATE_CACHE_TTL,
+                 max_entries=AFFILIATE_CACHE_MAX_ENTRIES):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (affiliate_link, expires_at)
+
+        self.hits = 0
+        self.misses = 0
+        self._convert_seconds = 0.0
+        self._convert_count = 0
+
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._init_table()
+        self._load()
+
+    def _init_table(self):
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS affiliate_cache (
+                cache_key TEXT PRIMARY KEY,
+                affiliate_link TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                last_used_at REAL NOT NULL
+            )
+        ''')
+        self.conn.commit()
+
+    def _load(self):
+        """Nạp các entry còn hạn từ SQLite vào RAM"""
+        now = time.time()
+        self.conn.execute('DELETE FROM affiliate_cache WHERE expires_at <= ?', (now,))
+        self.conn.commit()
+
+        rows = self.conn.execute('''
+            SELECT cache_key, affiliate_link, expires_at FROM affiliate_cache
+            ORDER BY last_used_at DESC
+            LIMIT ?
+        ''', (self.max_entries,)).fetchall()
+
+        # Entry dùng gần nhất nằm cuối OrderedDict
+        for key, affiliate_link, expires_at in reversed(rows):
+            self._entries[key] = (affiliate_link, expires_at)
+
+    def get(self, shopee_url):
+        """
+        Lấy link affiliate đã cache
+
+        Returns:
+            str: Link affiliate hoặc None nếu chưa có/hết hạn
+        """
+        key = canonicalize_shopee_url(shopee_url)
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            affiliate_link, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return affiliate_link
+
+    def set(self, shopee_url, affiliate_link, elapsed=None):
+        """
+        Lưu link affiliate vào cache
+
+        Args:
+            shopee_url: Link Shopee gốc
+            affiliate_link: Link affiliate đã convert
+            elapsed: Thời gian (giây) convert bằng browser, dùng để ước tính thời gian tiết kiệm
+        """
+        key = canonicalize_shopee_url(shopee_url)
+        now = time.time()
+        expires_at = now + self.ttl
+
+        with self._lock:
+            if elapsed is not None:
+                self._convert_seconds += elapsed
+                self._convert_count += 1
+
+            self._entries[key] = (affiliate_link, expires_at)
+            self._entries.move_to_end(key)
+
+            evicted = []
+            while len(self._entries) > self.max_entries:
+                old_key, _ = self._entries.popitem(last=False)
+                evicted.append((old_key,))
+
+            self.conn.execute('''
+                INSERT OR REPLACE INTO affiliate_cache (cache_key, affiliate_link, expires_at, last_used_at)
+                VALUES (?, ?, ?, ?)
+            ''', (key, affiliate_link, expires_at, now))
+            if evicted:
+                self.conn.executemany('DELETE FROM affiliate_cache WHERE cache_key = ?', evicted)
+            self.conn.commit()
+
+    def stats(self):
+        """Thống kê hit/miss và thời gian browser đã tiết kiệm được"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            avg_convert = (self._convert_seconds / self._convert_count) if self._convert_count else 0.0
+
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'size': len(self._entries),
+                'avg_convert_seconds': round(avg_convert, 2),
+                'saved_seconds': round(self.hits * avg_convert, 1),
+            }
+
+    def clear(self):
+        """Xóa toàn bộ cache"""
+        with self._lock:
+            self._entries.clear()
+            self.conn.execute('DELETE FROM affiliate_cache')
+            self.conn.commit()
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_shared_cache():
+    """Cache dùng chung cho main.py, ConverterService và convert_multiple"""
+    global _shared_cache
+
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = AffiliateLinkCache()
+        return _shared_cache
@@ -0,0 +1,370 @@
+import copy
+import json
+import threading
+import sys
+from pathlib import Path
+import requests
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from config.settings import (
+    SHOPEE_AFFILIATE_URL,
+    SHOPEE_AFFILIATE_API_URL,
+    AFFILIATE_REQUEST_TEMPLATE_PATH,
+    NETWORK_CONVERTER_BATCH_SIZE,
+    NETWORK_CONVERTER_TIMEOUT,
+    NETWORK_CONVERTER_MAX_FAILURES,
+)
+
+
+# Request mà nút "Lấy link" gửi đi (GraphQL), dùng khi chưa capture được từ browser
+DEFAULT_REQUEST_TEMPLATE = {
+    'url': SHOPEE_AFFILIATE_API_URL,
+    'headers': {
+        'Content-Type': 'application/json; charset=UTF-8',
+        'Accept': 'application/json, text/plain, */*',
+        'Origin': 'https://affiliate.shopee.vn',
+        'Referer': SHOPEE_AFFILIATE_URL,
+    },
+    'body': {
+        'operationName': 'batchGetCustomLink',
+        'query': (
+            'mutation batchGetCustomLink($linkParams: [CustomLinkParam!], $sourceCaller: SourceCaller){\n'
+            '  batchCustomLink(linkParams: $linkParams, sourceCaller: $sourceCaller){\n'
+            '    shortLink\n    longLink\n    failCode\n  }\n}'
+        ),
+        'variables': {
+            'linkParams': [{'originalLink': '', 'advancedLinkParams': {}}],
+            'sourceCaller': 'CUSTOM_LINK_CALLER',
+        },
+    },
+}
+
+# Header không được copy từ request đã capture
+SKIP_HEADERS = {'cookie', 'content-length', 'host', 'connection', 'accept-encoding'}
+
+
+class NetworkConverter:
+    """
+    Convert link bằng cách gọi thẳng API mà trang custom link sử dụng
+
+    Dùng requests.Session với cookies lấy từ Chrome profile (qua driver),
+    1 request HTTP convert được nhiều link. Template request có thể được
+    capture từ performance log của Chrome sau 1 lần convert bằng browser.
+    """
+
+    def __init__(self, driver=None, template_path=AFFILIATE_REQUEST_TEMPLATE_PATH,
+                 batch_size=NETWORK_CONVERTER_BATCH_SIZE, timeout=NETWORK_CONVERTER_TIMEOUT):
+        """
+        Args:
+            driver: Chrome driver để lấy cookies/capture request (optional)
+            template_path: File JSON lưu template request đã capture
+            batch_size: Số link tối đa mỗi request
+            timeout: Timeout mỗi request (giây)
+        """
+        self.driver = driver
+        self.template_path = Path(template_path)
+        self.batch_size = batch_size
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        self.template = self._load_template()
+        self.captured = self.template is not DEFAULT_REQUEST_TEMPLATE
+
+        self._lock = threading.Lock()
+        self._cookies_synced = False
+        self._failures = 0
+
+    @property
+    def available(self):
+        """False nếu API lỗi liên tiếp quá nhiều lần (chờ capture lại template)"""
+        return self._failures < NETWORK_CONVERTER_MAX_FAILURES
+
+    def _load_template(self):
+        if self.template_path.exists():
+            try:
+                with open(self.template_path, encoding='utf-8') as f:
+                    return json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠️  Không đọc được template request: {e}")
+        return DEFAULT_REQUEST_TEMPLATE
+
+    def sync_cookies(self):
+        """Copy toàn bộ cookies của Chrome profile sang requests.Session"""
+        if not self.driver:
+            return
+
+        cookies = self.driver.execute_cdp_cmd('Network.getAllCookies', {}).get('cookies', [])
+        for cookie in cookies:
+            self.session.cookies.set(
+                cookie['name'], cookie['value'],
+                domain=cookie.get('domain'), path=cookie.get('path', '/')
+            )
+
+        # Shopee kiểm tra csrftoken cookie khớp header
+        csrf_token = self.session.cookies.get('csrftoken')
+        if csrf_token:
+            self.session.headers['csrf-token'] = csrf_token
+
+        self._cookies_synced = True
+
+    def capture_from_logs(self, shopee_url):
+        """
+        Tìm request "Lấy link" trong performance log của Chrome và lưu làm template
+
+        Cần driver được khởi tạo với network_log=True.
+
+        Args:
+            shopee_url: Link vừa được convert bằng browser (để nhận diện request)
+
+        Returns:
+            bool: True nếu capture được
+        """
+        if not self.driver:
+            return False
+
+        try:
+            entries = self.driver.get_log('performance')
+        except Exception:
+            return False
+
+        needles = (shopee_url, json.dumps(shopee_url)[1:-1])
+
+        for entry in entries:
+            message = json.loads(entry['message'])['message']
+            if message.get('method') != 'Network.requestWillBeSent':
+                continue
+
+            request = message['params']['request']
+            if request.get('method') != 'POST':
+                continue
+
+            post_data = request.get('postData')
+            if post_data is None and request.get('hasPostData'):
+                try:
+                    post_data = self.driver.execute_cdp_cmd(
+                        'Network.getRequestPostData',
+                        {'requestId': message['params']['requestId']}
+                    ).get('postData')
+                except Exception:
+                    continue
+
+            if not post_data or not any(needle in post_data for needle in needles):
+                continue
+
+            try:
+                body = json.loads(post_data)
+            except ValueError:
+                continue
+
+            template = {
+                'url': request['url'],
+                'headers': {
+                    key: value for key, value in request.get('headers', {}).items()
+                    if key.lower() not in SKIP_HEADERS
+                },
+                'body': body,
+                'sample_url': shopee_url,
+            }
+
+            with self._lock:
+                self.template = template
+                self.captured = True
+                self._failures = 0
+
+            self.template_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.template_path, 'w', encoding='utf-8') as f:
+                json.dump(template, f, ensure_ascii=False, indent=2)
+
+            print(f"✅ Đã capture request convert: {request['url']}")
+            return True
+
+        return False
+
+    def drain_logs(self):
+        """Bỏ các entry performance log chưa đọc (chromedriver giữ log đến khi được đọc)"""
+        if not self.driver:
+            return
+
+        try:
+            self.driver.get_log('performance')
+        except Exception:
+            pass
+
+    def _build_body(self, shopee_urls):
+        """Điền list link vào body theo template"""
+        body = copy.deepcopy(self.template['body'])
+        variables = body.get('variables') if isinstance(body, dict) else None
+        link_params = variables.get('linkParams') if isinstance(variables, dict) else None
+
+        if isinstance(link_params, list) and link_params:
+            variables['linkParams'] = [
+                dict(link_params[0], originalLink=url) for url in shopee_urls
+            ]
+            return body
+
+        # Template dạng khác: chỉ hỗ trợ 1 link, thay link mẫu bằng link mới
+        sample_url = self.template.get('sample_url')
+        if len(shopee_urls) != 1 or not sample_url:
+            raise ValueError("Template request không hỗ trợ convert nhiều link")
+
+        raw = json.dumps(body, ensure_ascii=False).replace(
+            json.dumps(sample_url, ensure_ascii=False)[1:-1],
+            json.dumps(shopee_urls[0], ensure_ascii=False)[1:-1]
+        )
+        return json.loads(raw)
+
+    @staticmethod
+    def _parse_response(data, count):
+        """
+        Lấy list link affiliate (theo thứ tự request) từ response
+
+        Raises:
+            ValueError: Response không đúng dạng {'data': {'batchCustomLink': [...]}}
+        """
+        payload = data.get('data') if isinstance(data, dict) else None
+        items = payload.get('batchCustomLink') if isinstance(payload, dict) else None
+        if not isinstance(items, list):
+            raise ValueError(f"Response không có batchCustomLink: {str(data)[:200]}")
+
+        links = []
+        for i in range(count):
+            item = items[i] if i < len(items) else None
+            if isinstance(item, dict) and not item.get('failCode') and item.get('shortLink'):
+                links.append(item['shortLink'])
+            else:
+                links.append(None)
+
+        return links
+
+    def _post(self, shopee_urls):
+        response = self.session.post(
+            self.template['url'],
+            json=self._build_body(shopee_urls),
+            headers=self.template.get('headers', {}),
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        return self._parse_response(response.json(), len(shopee_urls))
+
+    def convert_many(self, shopee_urls):
+        """
+        Convert nhiều link bằng API, mỗi request tối đa batch_size link
+
+        Returns:
+            dict: {original_url: affiliate_url | None}
+        """
+        results = {url: None for url in shopee_urls}
+        if not self.available:
+            return results
+
+        if not self._cookies_synced:
+            self.sync_cookies()
+
+        batch_size = self.batch_size
+        if not isinstance((self.template.get('body') or {}).get('variables', {}).get('linkParams'), list):
+            batch_size = 1
+
+        for start in range(0, len(shopee_urls), batch_size):
+            batch = shopee_urls[start:start + batch_size]
+
+            try:
+                try:
+                    links = self._post(batch)
+                except requests.HTTPError as e:
+                    # Cookies hết hạn: đồng bộ lại từ browser rồi thử 1 lần nữa
+                    if e.response is None or e.response.status_code not in (401, 403):
+                        raise
+                    self.sync_cookies()
+                    links = self._post(batch)
+
+            except (requests.RequestException, ValueError) as e:
+                print(f"⚠️  API convert lỗi: {e}")
+                with self._lock:
+                    self._failures += 1
+                continue
+
+            # HTTP 2xx nhưng không link nào convert được (template sai, lỗi GraphQL...)
+            # cũng tính là lỗi để tự tắt backend thay vì tốn 1 request mỗi lần convert
+            with self._lock:
+                if any(links):
+                    self._failures = 0
+                else:
+                    self._failures += 1
+
+            for url, link in zip(batch, links):
+                results[url] = link
+
+        return results
+
+    def convert(self, shopee_url):
+        """Convert 1 link, trả về link affiliate hoặc None"""
+        return self.convert_many([shopee_url])[shopee_url]
+
+
+def test_network_converter():
+    """Test function - Chạy NetworkConverter với server giả lập chạy local"""
+    import tempfile
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+
+    class FakeAffiliateHandler(BaseHTTPRequestHandler):
+        # Response lỗi nhưng vẫn HTTP 200 (lần lượt), rỗng = trả kết quả bình thường
+        broken_responses = []
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            items = [
+                {'shortLink': f"https://s.shopee.vn/fake{i}", 'longLink': p['originalLink'], 'failCode': 0}
+                for i, p in enumerate(body['variables']['linkParams'])
+            ]
+            payload = json.dumps({'data': {'batchCustomLink': items}}).encode()
+            if self.broken_responses:
+                payload = json.dumps(self.broken_responses.pop(0)).encode()
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    print("\n" + "="*60)
+    print("🧪 TEST NETWORK CONVERTER (server local)")
+    print("="*60 + "\n")
+
+    server = HTTPServer(('127.0.0.1', 0), FakeAffiliateHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    try:
+        template_path = Path(tempfile.mkdtemp()) / "template.json"
+        template = copy.deepcopy(DEFAULT_REQUEST_TEMPLATE)
+        template['url'] = f"http://127.0.0.1:{server.server_port}/api/v3/gql"
+        with open(template_path, 'w', encoding='utf-8') as f:
+            json.dump(template, f)
+
+        converter = NetworkConverter(template_path=template_path, batch_size=2)
+        urls = [f"https://shopee.vn/product/1/{i}" for i in range(5)]
+        results = converter.convert_many(urls)
+
+        for url, link in results.items():
+            print(f"  {url} -> {link}")
+
+        # Response 200 nhưng sai dạng / lỗi GraphQL: không raise, tính là lỗi và tự tắt backend
+        FakeAffiliateHandler.broken_responses = [
+            [], {'data': None, 'errors': [{'message': 'fail'}]}, {'data': {'batchCustomLink': []}},
+        ] * NETWORK_CONVERTER_MAX_FAILURES
+        for _ in range(NETWORK_CONVERTER_MAX_FAILURES):
+            converter.convert(urls[0])
+        print(f"\n  Sau {NETWORK_CONVERTER_MAX_FAILURES} response lỗi: available={converter.available}")
+
+        if all(results.values()) and not converter.available:
+            print("\n✅ Test thành công!")
+        else:
+            print("\n❌ Test thất bại!")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    test_network_converter()
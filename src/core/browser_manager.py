@@ -1,4 +1,4 @@
-import time
+import shutil
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
@@ -8,15 +8,18 @@ import sys
 # Add root directory to path
 sys.path.append(str(Path(__file__).parent.parent.parent))
 from config.settings import *
+from src.core.wait_engine import WaitEngine
 
 
 class BrowserManager:
     """Quản lý Chrome browser với user profile riêng"""
     
-    def __init__(self, headless=HEADLESS_MODE):
+    def __init__(self, headless=HEADLESS_MODE, profile_path=None, network_log=False):
         self.driver = None
         self.headless = headless
-        self.profile_path = str(BROWSER_PROFILE_DIR)
+        self.network_log = network_log
+        self.implicit_wait = None
+        self.profile_path = str(profile_path or BROWSER_PROFILE_DIR)
         self.driver_path = str(CHROME_DRIVER_PATH)
     
     def init_driver(self):
@@ -54,6 +57,10 @@ class BrowserManager:
         if self.headless:
             options.add_argument("--headless=new")
         
+        # Ghi performance log để capture request mạng (dùng cho NetworkConverter)
+        if self.network_log:
+            options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+        
         # Khởi tạo service với ChromeDriver path
         service = Service(executable_path=self.driver_path)
         
@@ -74,7 +81,11 @@ class BrowserManager:
             })
             
             self.driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT)
-            self.driver.implicitly_wait(IMPLICIT_WAIT)
+            
+            # Chế độ explicit-wait: find_elements không thấy gì thì trả về ngay,
+            # mọi chỗ cần đợi đều dùng WaitEngine
+            self.implicit_wait = 0 if EXPLICIT_WAITS_ONLY else IMPLICIT_WAIT
+            self.driver.implicitly_wait(self.implicit_wait)
             
             # Maximize window
             self.driver.maximize_window()
@@ -109,7 +120,11 @@ class BrowserManager:
         
         print(f"🌐 Đang mở: {url}")
         self.driver.get(url)
-        time.sleep(3)  # Đợi page load
+        
+        # Đợi page load xong và hết request mạng (tối đa 3s)
+        waits = WaitEngine(self.driver)
+        waits.page_loaded("browser.page_loaded", timeout=PAGE_LOAD_TIMEOUT, soft=True)
+        waits.network_idle("browser.network_idle", timeout=3)
     
     def close(self):
         """Đóng browser"""
@@ -118,6 +133,35 @@ class BrowserManager:
             self.driver.quit()
             print("✅ Đã đóng!")
     
+    @staticmethod
+    def clone_profile(name):
+        """
+        Copy user profile chính sang một thư mục riêng
+        
+        Chrome khóa user-data-dir nên mỗi driver chạy song song cần 1 profile riêng.
+        Bản copy giữ cookies đăng nhập, bỏ qua cache và file lock.
+        
+        Args:
+            name: Tên thư mục clone (vd: "converter_1")
+        
+        Returns:
+            Path của profile đã clone
+        """
+        target = BROWSER_POOL_PROFILE_DIR / name
+        
+        if target.exists():
+            shutil.rmtree(target, ignore_errors=True)
+        
+        shutil.copytree(
+            BROWSER_PROFILE_DIR,
+            target,
+            ignore=shutil.ignore_patterns(
+                'Singleton*', 'Cache', 'Code Cache', 'GPUCache',
+                'Service Worker', 'ShaderCache', 'GrShaderCache'
+            )
+        )
+        return target
+    
     def __enter__(self):
         """Context manager support"""
         self.init_driver()
@@ -0,0 +1,267 @@
+import json
+import random
+import threading
+import time
+import sys
+from datetime import datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from config.settings import (
+    PACING_PROFILE,
+    PACING_SESSION_BUDGET,
+    PACING_BACKOFF_MULTIPLIER,
+    PACING_BACKOFF_COOLDOWN,
+    PACING_SPEEDUP,
+    PACING_HEALTHY_STREAK,
+    PACING_LOG_PATH,
+)
+
+
+# Mỗi profile gồm:
+#   delays: khoảng (min, max) giây cho từng loại delay
+#   counts: khoảng (min, max) số lần lặp của các thao tác giả lập (di chuột, scroll...)
+#   min_factor/max_factor: giới hạn hệ số nhân delay khi tự điều chỉnh
+PACING_PROFILES = {
+    # Giống hành vi cũ: đọc từng bài 2-5s, nghỉ 2-5s giữa các bài
+    'stealth': {
+        'delays': {
+            'mouse_move': (0.3, 0.8),
+            'scroll_step': (0.1, 0.3),
+            'scroll_settle': (0.5, 1.2),
+            'feed_scroll': (0.3, 0.8),
+            'warmup': (0.5, 1.0),
+            'warmup_settle': (1.0, 2.0),
+            'read': (2.0, 5.0),
+            'read_jiggle': (0.3, 0.8),
+            'between_posts': (2.0, 5.0),
+        },
+        'counts': {
+            'warmup_moves': (2, 4),
+            'scroll_steps': (3, 6),
+            'read_jiggles': (1, 3),
+            'post_mouse_moves': (1, 1),
+        },
+        'min_factor': 0.8,
+        'max_factor': 4.0,
+    },
+    'balanced': {
+        'delays': {
+            'mouse_move': (0.1, 0.4),
+            'scroll_step': (0.05, 0.15),
+            'scroll_settle': (0.3, 0.6),
+            'feed_scroll': (0.2, 0.5),
+            'warmup': (0.3, 0.6),
+            'warmup_settle': (0.5, 1.0),
+            'read': (0.8, 2.0),
+            'read_jiggle': (0.1, 0.4),
+            'between_posts': (0.8, 2.0),
+        },
+        'counts': {
+            'warmup_moves': (1, 2),
+            'scroll_steps': (2, 4),
+            'read_jiggles': (0, 1),
+            'post_mouse_moves': (0, 1),
+        },
+        'min_factor': 0.5,
+        'max_factor': 4.0,
+    },
+    # Chỉ giữ delay tối thiểu để feed kịp load, không giả lập đọc/di chuột
+    'fast': {
+        'delays': {
+            'mouse_move': (0.0, 0.1),
+            'scroll_step': (0.0, 0.05),
+            'scroll_settle': (0.1, 0.3),
+            'feed_scroll': (0.1, 0.3),
+            'warmup': (0.0, 0.2),
+            'warmup_settle': (0.2, 0.4),
+            'read': (0.0, 0.0),
+            'read_jiggle': (0.0, 0.0),
+            'between_posts': (0.1, 0.4),
+        },
+        'counts': {
+            'warmup_moves': (0, 1),
+            'scroll_steps': (1, 2),
+            'read_jiggles': (0, 0),
+            'post_mouse_moves': (0, 0),
+        },
+        'min_factor': 0.5,
+        'max_factor': 6.0,
+    },
+}
+
+# Tín hiệu làm chậm lại
+BACKOFF_SIGNALS = {'captcha', 'login_wall', 'rate_limited', 'error'}
+
+
+class Pacer:
+    """
+    Quản lý toàn bộ delay giả lập người dùng của 1 phiên crawl
+
+    - Delay lấy theo profile (stealth/balanced/fast) nhân với hệ số tự điều chỉnh
+    - Gặp captcha/login wall: tăng hệ số và nghỉ cooldown; phiên ổn định: giảm dần hệ số
+    - Có budget tổng thời gian delay mỗi phiên; hết budget thì chỉ còn delay backoff
+    - Mỗi delay được ghi lại (loại, thời gian, hệ số) để phân tích và tinh chỉnh
+    """
+
+    def __init__(self, profile=PACING_PROFILE, session_budget=PACING_SESSION_BUDGET,
+                 log_path=PACING_LOG_PATH):
+        if profile not in PACING_PROFILES:
+            raise ValueError(f"Pacing profile không hợp lệ: {profile} (chọn: {', '.join(PACING_PROFILES)})")
+
+        self.profile = profile
+        self.config = PACING_PROFILES[profile]
+        self.session_budget = session_budget
+        self.log_path = Path(log_path) if log_path else None
+
+        self._lock = threading.Lock()
+        self.start_session()
+
+    def start_session(self, name=None):
+        """Bắt đầu phiên mới: reset hệ số, budget và bản ghi"""
+        with self._lock:
+            self.session_name = name
+            self.session_started_at = datetime.now()
+            self.factor = 1.0
+            self.healthy_streak = 0
+            self.spent = 0.0
+            self.records = []
+            self.signals = []
+
+    @property
+    def remaining_budget(self):
+        if self.session_budget is None:
+            return None
+        return max(0.0, self.session_budget - self.spent)
+
+    def count(self, kind):
+        """Số lần lặp ngẫu nhiên cho 1 thao tác giả lập (vd: số lần di chuột)"""
+        low, high = self.config['counts'][kind]
+        return random.randint(low, high)
+
+    def pause(self, kind):
+        """
+        Nghỉ 1 khoảng ngẫu nhiên theo loại delay
+
+        Returns:
+            float: Số giây đã nghỉ
+        """
+        low, high = self.config['delays'][kind]
+        requested = random.uniform(low, high) * self.factor
+
+        delay = requested
+        remaining = self.remaining_budget
+        if remaining is not None:
+            delay = min(delay, remaining)
+
+        return self._sleep(kind, requested, delay)
+
+    def signal(self, name, detail=None):
+        """
+        Báo tín hiệu quan sát được trong phiên
+
+        Args:
+            name: 'healthy' (1 bài crawl thành công) hoặc 'captcha' | 'login_wall' | 'rate_limited' | 'error'
+            detail: Thông tin thêm (ghi vào log)
+        """
+        if name in BACKOFF_SIGNALS:
+            with self._lock:
+                self.healthy_streak = 0
+                self.factor = min(self.config['max_factor'], self.factor * PACING_BACKOFF_MULTIPLIER)
+                self.signals.append({'signal': name, 'detail': detail, 'factor': round(self.factor, 2),
+                                     'at': time.time()})
+
+            print(f"🐢 Pacing: gặp {name}, tăng delay x{self.factor:.2f}")
+            # Cooldown không tính vào budget: an toàn quan trọng hơn tốc độ
+            cooldown = random.uniform(*PACING_BACKOFF_COOLDOWN)
+            self._sleep('backoff', cooldown, cooldown, charge=False)
+            return
+
+        if name == 'healthy':
+            with self._lock:
+                self.healthy_streak += 1
+                if self.healthy_streak >= PACING_HEALTHY_STREAK:
+                    self.healthy_streak = 0
+                    self.factor = max(self.config['min_factor'], self.factor * PACING_SPEEDUP)
+                    self.signals.append({'signal': name, 'detail': detail, 'factor': round(self.factor, 2),
+                                         'at': time.time()})
+
+    def _sleep(self, kind, requested, delay, charge=True):
+        start = time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        actual = time.perf_counter() - start
+
+        with self._lock:
+            if charge:
+                self.spent += actual
+            self.records.append({
+                'kind': kind,
+                'requested': round(requested, 3),
+                'actual': round(actual, 3),
+                'factor': round(self.factor, 2),
+                'at': time.time(),
+            })
+        return actual
+
+    def summary(self):
+        """
+        Returns:
+            dict: Tổng quan phiên + thống kê theo loại delay
+        """
+        with self._lock:
+            kinds = {}
+            for record in self.records:
+                stat = kinds.setdefault(record['kind'], {'count': 0, 'total': 0.0, 'skipped': 0.0})
+                stat['count'] += 1
+                stat['total'] += record['actual']
+                stat['skipped'] += max(0.0, record['requested'] - record['actual'])
+
+            for stat in kinds.values():
+                stat['avg'] = round(stat['total'] / stat['count'], 2)
+                stat['total'] = round(stat['total'], 2)
+                stat['skipped'] = round(stat['skipped'], 2)
+
+            return {
+                'profile': self.profile,
+                'factor': round(self.factor, 2),
+                'spent': round(self.spent, 2),
+                'budget': self.session_budget,
+                'backoffs': sum(1 for s in self.signals if s['signal'] in BACKOFF_SIGNALS),
+                'kinds': dict(sorted(kinds.items(), key=lambda item: item[1]['total'], reverse=True)),
+            }
+
+    def print_report(self):
+        summary = self.summary()
+        budget = f"/{summary['budget']}s" if summary['budget'] is not None else ""
+
+        print(f"\n🕰️  Pacing '{summary['profile']}': delay {summary['spent']}s{budget}, "
+              f"hệ số cuối x{summary['factor']}, backoff {summary['backoffs']} lần")
+        for kind, stat in summary['kinds'].items():
+            print(f"  {kind}: {stat['count']} lần, tổng {stat['total']}s, TB {stat['avg']}s"
+                  + (f", bỏ qua {stat['skipped']}s do budget" if stat['skipped'] else ""))
+
+    def end_session(self):
+        """Kết thúc phiên: in báo cáo và ghi bản ghi delay vào log (JSON lines)"""
+        self.print_report()
+
+        if not self.log_path:
+            return
+
+        with self._lock:
+            entry = {
+                'session': self.session_name,
+                'started_at': self.session_started_at.isoformat(),
+                'profile': self.profile,
+                'budget': self.session_budget,
+                'spent': round(self.spent, 3),
+                'signals': self.signals,
+                'delays': self.records,
+            }
+
+        try:
+            self.log_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        except OSError as e:
+            print(f"⚠️  Không ghi được pacing log: {e}")
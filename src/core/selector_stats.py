@@ -0,0 +1,87 @@
+import threading
+import time
+
+
+class SelectorStats:
+    """Đếm hit/miss và thời gian của từng selector (theo label)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, label, found, elapsed):
+        with self._lock:
+            stat = self._stats.setdefault(label, {
+                'hits': 0, 'misses': 0, 'total': 0.0, 'max': 0.0
+            })
+            if found:
+                stat['hits'] += 1
+            else:
+                stat['misses'] += 1
+            stat['total'] += elapsed
+            stat['max'] = max(stat['max'], elapsed)
+
+    def summary(self):
+        """
+        Returns:
+            dict: {label: {hits, misses, total, avg, max}} sắp xếp theo tổng thời gian
+        """
+        with self._lock:
+            items = sorted(self._stats.items(), key=lambda item: item[1]['total'], reverse=True)
+            return {
+                label: {
+                    'hits': stat['hits'],
+                    'misses': stat['misses'],
+                    'total': round(stat['total'], 3),
+                    'avg': round(stat['total'] / (stat['hits'] + stat['misses']), 3),
+                    'max': round(stat['max'], 3),
+                }
+                for label, stat in items
+            }
+
+    def print_report(self):
+        summary = self.summary()
+        if not summary:
+            return
+
+        print(f"\n🔎 Thống kê selector:")
+        for label, stat in summary.items():
+            print(f"  {label}: {stat['hits']} hit / {stat['misses']} miss, "
+                  f"tổng {stat['total']}s, TB {stat['avg']}s, max {stat['max']}s")
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+# Thống kê dùng chung cho crawler, converter, poster
+selector_stats = SelectorStats()
+
+
+def find_all(root, by, selector, label):
+    """
+    find_elements có ghi thống kê
+
+    Khi driver chạy chế độ explicit-wait (implicit wait = 0), lần tìm không
+    thấy trả về ngay; nếu implicit wait bị bật lại, các lần miss chậm sẽ hiện
+    rõ trong thống kê.
+
+    Args:
+        root: Driver hoặc WebElement
+        by: Kiểu selector (By.CSS_SELECTOR, By.XPATH, ...)
+        selector: Selector
+        label: Tên ngắn gọn để thống kê
+
+    Returns:
+        list: Các element tìm được
+    """
+    start = time.perf_counter()
+    elements = root.find_elements(by, selector)
+    selector_stats.record(label, bool(elements), time.perf_counter() - start)
+    return elements
+
+
+def find_first(root, by, selector, label):
+    """Như find_all nhưng trả về element đầu tiên hoặc None"""
+    elements = find_all(root, by, selector, label)
+    return elements[0] if elements else None
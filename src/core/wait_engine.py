@@ -0,0 +1,171 @@
+import threading
+import time
+import sys
+from pathlib import Path
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from config.settings import WAIT_DEFAULT_TIMEOUT, WAIT_POLL_INTERVAL
+
+
+class WaitStats:
+    """Ghi lại thời gian thực tế của từng bước đợi (theo label)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, label, elapsed, ok):
+        with self._lock:
+            stat = self._stats.setdefault(label, {
+                'count': 0, 'total': 0.0, 'max': 0.0, 'timeouts': 0
+            })
+            stat['count'] += 1
+            stat['total'] += elapsed
+            stat['max'] = max(stat['max'], elapsed)
+            if not ok:
+                stat['timeouts'] += 1
+
+    def summary(self):
+        """
+        Returns:
+            dict: {label: {count, total, avg, max, timeouts}} sắp xếp theo tổng thời gian
+        """
+        with self._lock:
+            items = sorted(self._stats.items(), key=lambda item: item[1]['total'], reverse=True)
+            return {
+                label: {
+                    'count': stat['count'],
+                    'total': round(stat['total'], 2),
+                    'avg': round(stat['total'] / stat['count'], 2),
+                    'max': round(stat['max'], 2),
+                    'timeouts': stat['timeouts'],
+                }
+                for label, stat in items
+            }
+
+    def print_report(self):
+        summary = self.summary()
+        if not summary:
+            return
+
+        print(f"\n⏱️  Thời gian đợi theo bước:")
+        for label, stat in summary.items():
+            print(f"  {label}: {stat['count']} lần, tổng {stat['total']}s, "
+                  f"TB {stat['avg']}s, max {stat['max']}s, timeout {stat['timeouts']}")
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+# Thống kê dùng chung cho converter, poster, crawler
+wait_stats = WaitStats()
+
+
+# JS đếm số resource đã tải, dùng để phát hiện network idle
+RESOURCE_COUNT_JS = "return performance.getEntriesByType('resource').length"
+
+# JS kiểm tra còn thanh tiến trình upload nào đang hiển thị không
+UPLOAD_IN_PROGRESS_JS = """
+    return Array.from(document.querySelectorAll('[role="progressbar"]'))
+        .some(el => el.offsetParent !== null);
+"""
+
+
+class WaitEngine:
+    """
+    Đợi theo điều kiện DOM/network thay cho time.sleep cố định
+
+    Mỗi lần đợi có label và deadline riêng, thời gian thực tế được ghi vào wait_stats.
+    """
+
+    def __init__(self, driver, default_timeout=WAIT_DEFAULT_TIMEOUT,
+                 poll_interval=WAIT_POLL_INTERVAL, stats=None):
+        self.driver = driver
+        self.default_timeout = default_timeout
+        self.poll_interval = poll_interval
+        self.stats = stats if stats is not None else wait_stats
+
+    def until(self, condition, label, timeout=None, soft=False):
+        """
+        Đợi đến khi condition(driver) trả về giá trị truthy
+
+        Args:
+            condition: Hàm nhận driver
+            label: Tên bước (dùng cho thống kê)
+            timeout: Deadline (giây), mặc định default_timeout
+            soft: True thì hết giờ trả về None thay vì raise
+
+        Returns:
+            Giá trị trả về của condition
+
+        Raises:
+            TimeoutException: Hết giờ mà điều kiện chưa thỏa (khi soft=False)
+        """
+        timeout = self.default_timeout if timeout is None else timeout
+        start = time.perf_counter()
+
+        try:
+            result = WebDriverWait(self.driver, timeout, poll_frequency=self.poll_interval).until(
+                condition, message=f"Timeout {timeout}s: {label}"
+            )
+        except TimeoutException:
+            self.stats.record(label, time.perf_counter() - start, ok=False)
+            if soft:
+                return None
+            raise
+
+        self.stats.record(label, time.perf_counter() - start, ok=True)
+        return result
+
+    def element_present(self, locator, label, timeout=None, soft=False):
+        """Đợi element xuất hiện trong DOM"""
+        return self.until(EC.presence_of_element_located(locator), label, timeout, soft)
+
+    def element_clickable(self, locator, label, timeout=None, soft=False):
+        """Đợi element hiển thị và enabled"""
+        return self.until(EC.element_to_be_clickable(locator), label, timeout, soft)
+
+    def element_invisible(self, locator, label, timeout=None, soft=False):
+        """Đợi element biến mất/ẩn đi"""
+        return self.until(EC.invisibility_of_element_located(locator), label, timeout, soft)
+
+    def script_true(self, script, label, timeout=None, soft=False):
+        """Đợi đến khi đoạn JS trả về truthy (1 round trip mỗi lần poll)"""
+        return self.until(lambda d: d.execute_script(script), label, timeout, soft)
+
+    def page_loaded(self, label, timeout=None, soft=False):
+        """Đợi document.readyState == 'complete'"""
+        return self.until(
+            lambda d: d.execute_script("return document.readyState") == 'complete',
+            label, timeout, soft
+        )
+
+    def network_idle(self, label, idle_time=0.5, timeout=None, soft=True):
+        """
+        Đợi đến khi không có resource mới được tải trong idle_time giây
+
+        Mặc định soft=True: trang SPA có thể không bao giờ idle hẳn.
+        """
+        state = {'count': -1, 'since': time.perf_counter()}
+
+        def idle(driver):
+            count = driver.execute_script(RESOURCE_COUNT_JS)
+            now = time.perf_counter()
+            if count != state['count']:
+                state['count'] = count
+                state['since'] = now
+                return False
+            return now - state['since'] >= idle_time
+
+        return self.until(idle, label, timeout, soft)
+
+    def upload_finished(self, label, timeout=None, soft=False):
+        """Đợi đến khi không còn thanh tiến trình upload nào hiển thị"""
+        return self.until(
+            lambda d: not d.execute_script(UPLOAD_IN_PROGRESS_JS),
+            label, timeout, soft
+        )
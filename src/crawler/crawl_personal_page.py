@@ -1,35 +1,92 @@
 import time
 import sys
 import random
-from urllib.parse import urlparse, parse_qs, unquote
 from pathlib import Path
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.common.action_chains import ActionChains
-import requests
 
 sys.path.append(str(Path(__file__).parent.parent.parent))
+from config.settings import WATERMARK_STOP_MATCHES
 from src.core.browser_manager import BrowserManager
+from src.core.wait_engine import WaitEngine
+from src.core.selector_stats import selector_stats
+from src.crawler.post_stream import ProfilePostStream
+from src.crawler.link_resolver import RedirectResolver
+from src.core.pacing import Pacer
+
+
+# Container chứa feed bài viết (cần ít nhất 3 container, feed nằm ở container thứ 3)
+FEED_CONTAINER_CSS = 'div.x78zum5.xdt5ytf.x1iyjqo2.x1n2onr6'
+
+# Span chứa nội dung bài viết (span thứ 1: content_1, span thứ 2: content_2)
+TEXT_SPAN_CSS = 'span.x1lliihq.x1plvlek.xryxfnj.x1n2onr6.xyejjpt.x15dsfln.xi7mnp6.x193iq5w.xeuugli.x1fj9vlw.x13faqbe.x1vvkbs.x1s928wv.xhkezso.x1gmr53x.x1cpjm7i.x1fgarty.x1943h6x.x1i0vuye.xjohtrz.xo1l8bm.xp07o12.x1yc453h.xat24cr.xdj266r'
+
+# Ảnh/video trong bài viết
+MEDIA_CSS = '.x1lliihq.x5yr21d.xh8yej3'
+
+# Lấy toàn bộ dữ liệu của các bài viết trong 1 lần gọi execute_script
+# arguments: [post elements, TEXT_SPAN_CSS, MEDIA_CSS]
+EXTRACT_POSTS_JS = """
+    const [posts, textSpanCss, mediaCss] = arguments;
+
+    function readSpan(span, links) {
+        const parts = [];
+        for (const child of span.querySelectorAll(':scope > span, :scope > a')) {
+            const text = (child.innerText || '').trim();
+            if (text) parts.push(text);
+
+            if (child.tagName === 'A') {
+                const href = child.href;
+                if (href && (href.includes('l.threads.com') || href.includes('shopee.vn'))) {
+                    links.push(href);
+                }
+            }
+        }
+        return parts.join(' ');
+    }
+
+    return posts.map(post => {
+        const links = [];
+        const spans = post.querySelectorAll(textSpanCss);
+        const result = {
+            content_1: spans.length >= 1 ? readSpan(spans[0], links) : '',
+            content_2: spans.length >= 2 ? readSpan(spans[1], links) : '',
+            links: links,
+            videos: [],
+            images: []
+        };
+
+        for (const el of post.querySelectorAll(mediaCss)) {
+            const src = el.src || el.getAttribute('src');
+            if (!src) continue;
+            if (el.tagName === 'VIDEO') result.videos.push(src);
+            else if (el.tagName === 'IMG') result.images.push(src);
+        }
+        return result;
+    });
+"""
 
 
 class ThreadsCrawler:
     """Crawl bài viết từ trang cá nhân Threads"""
     
-    def __init__(self, browser_manager):
+    def __init__(self, browser_manager, resolver=None, db=None, pacer=None):
         self.browser = browser_manager
         self.driver = browser_manager.driver
         
         if not self.driver:
             raise Exception("Browser chưa được khởi tạo!")
         
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-        })
+        # db: Database dùng làm cache resolve redirect (optional)
+        self.resolver = resolver or RedirectResolver(cache=db)
+        
+        # Toàn bộ delay giả lập người dùng đi qua pacer (profile, budget, backoff)
+        self.pacer = pacer or Pacer()
         
         # Khởi tạo ActionChains để mô phỏng chuột
         self.actions = ActionChains(self.driver)
+        self.waits = WaitEngine(self.driver)
     
     def human_like_mouse_move(self, element=None):
         """
@@ -56,7 +113,7 @@ class ThreadsCrawler:
                 self.actions.move_to_element_with_offset(body, x, y).perform()
             
             # Đợi random giống người thật
-            time.sleep(random.uniform(0.3, 0.8))
+            self.pacer.pause('mouse_move')
             
         except Exception as e:
             pass  # Không cần báo lỗi, chỉ là mô phỏng
@@ -72,19 +129,19 @@ class ThreadsCrawler:
             scroll_amount = random.randint(300, 700)
         
         # Scroll từ từ, không scroll một lúc
-        steps = random.randint(3, 6)
+        steps = max(1, self.pacer.count('scroll_steps'))
         scroll_per_step = scroll_amount // steps
         
         for _ in range(steps):
             self.driver.execute_script(f"window.scrollBy(0, {scroll_per_step});")
-            time.sleep(random.uniform(0.1, 0.3))
+            self.pacer.pause('scroll_step')
         
         # Đợi thêm chút như người thật
-        time.sleep(random.uniform(0.5, 1.2))
+        self.pacer.pause('scroll_settle')
     
-    def random_pause(self, min_sec=0.5, max_sec=2.0):
-        """Dừng random để giống người thật"""
-        time.sleep(random.uniform(min_sec, max_sec))
+    def random_pause(self, kind='feed_scroll'):
+        """Dừng random để giống người thật (thời gian theo pacing profile)"""
+        self.pacer.pause(kind)
     
     def simulate_reading(self, element):
         """
@@ -93,20 +150,23 @@ class ThreadsCrawler:
         Args:
             element: Element cần "đọc"
         """
+        jiggles = self.pacer.count('read_jiggles')
+        
         try:
-            # Di chuột đến element
-            self.human_like_mouse_move(element)
+            # Di chuột đến element (profile fast bỏ qua cả bước đọc)
+            if jiggles or self.pacer.config['delays']['read'][1] > 0:
+                self.human_like_mouse_move(element)
             
-            # Dừng lại như đang đọc (2-5 giây)
-            time.sleep(random.uniform(2.0, 5.0))
+            # Dừng lại như đang đọc
+            self.pacer.pause('read')
             
             # Di chuột random nhẹ trong element
-            for _ in range(random.randint(1, 3)):
+            for _ in range(jiggles):
                 offset_x = random.randint(-50, 50)
                 offset_y = random.randint(-20, 20)
                 try:
                     self.actions.move_to_element_with_offset(element, offset_x, offset_y).perform()
-                    time.sleep(random.uniform(0.3, 0.8))
+                    self.pacer.pause('read_jiggle')
                 except:
                     pass
         except:
@@ -114,97 +174,59 @@ class ThreadsCrawler:
     
     def extract_shopee_link(self, redirect_url):
         """Extract link Shopee từ redirect URL"""
-        print(f"\n  🔗 Xử lý link: {redirect_url[:80]}...")
+        return self.extract_shopee_links([redirect_url])[0]
+    
+    def extract_shopee_links(self, redirect_urls):
+        """
+        Resolve song song các redirect URL của 1 bài viết thành link Shopee
         
-        try:
-            parsed = urlparse(redirect_url)
-            params = parse_qs(parsed.query)
-            
-            if 'u' in params:
-                real_url = unquote(params['u'][0])
-            else:
-                real_url = redirect_url
-            
-            time.sleep(random.uniform(0.8, 1.5))  # Random delay
-            response = self.session.get(real_url, allow_redirects=True, timeout=10)
-            final_url = response.url
-            
-            if 'shopee.vn' in final_url and 'captcha' not in final_url:
-                print(f"  ✅ Lấy được: {final_url[:80]}...")
-                return final_url
-            
-            return None
-            
-        except Exception as e:
-            print(f"  ❌ Lỗi: {e}")
-            return None
+        Returns:
+            list: Link Shopee theo thứ tự redirect_urls (None với link không resolve được)
+        """
+        for url in redirect_urls:
+            print(f"\n  🔗 Xử lý link: {url[:80]}...")
+        
+        results = self.resolver.resolve_many(redirect_urls)
+        
+        for result in results:
+            if result:
+                print(f"  ✅ Lấy được: {result[:80]}...")
+        return results
     
-    def extract_media(self, post_element):
-        """Extract video và image từ bài viết"""
-        videos = []
-        images = []
+    def extract_posts_data(self, post_elements):
+        """
+        Extract nội dung, link, video, image của nhiều bài viết trong 1 lần execute_script
         
+        Args:
+            post_elements: List WebElement bài viết
+        
+        Returns:
+            list: Mỗi phần tử là dict {content_1, content_2, links, videos, images}
+        """
+        if not post_elements:
+            return []
+        
+        start = time.perf_counter()
         try:
-            media_elements = post_element.find_elements(
-                By.CSS_SELECTOR,
-                '.x1lliihq.x5yr21d.xh8yej3'
+            data = self.driver.execute_script(
+                EXTRACT_POSTS_JS, post_elements, TEXT_SPAN_CSS, MEDIA_CSS
             )
-            
-            print(f"\n  🎬 Tìm thấy {len(media_elements)} media elements")
-            
-            for i, element in enumerate(media_elements, 1):
-                tag_name = element.tag_name
-                
-                if tag_name == 'video':
-                    video_src = element.get_attribute('src')
-                    if video_src:
-                        videos.append(video_src)
-                        print(f"  ✅ Video {i}: {video_src}")
-                
-                elif tag_name == 'img':
-                    img_src = element.get_attribute('src')
-                    if img_src:
-                        images.append(img_src)
-                        print(f"  ✅ Image {i}: {img_src}")
-        
         except Exception as e:
-            print(f"  ❌ Lỗi extract media: {e}")
+            print(f"  ❌ Lỗi extract bài viết: {e}")
+            data = None
+        selector_stats.record("crawler.extract_js", bool(data), time.perf_counter() - start)
         
-        return videos, images
+        empty = {'content_1': '', 'content_2': '', 'links': [], 'videos': [], 'images': []}
+        return data or [dict(empty) for _ in post_elements]
     
-    def scroll_until_post_loaded(self, post_index):
-        """Scroll từ từ cho đến khi post tại index xuất hiện và không còn hidden"""
-        print(f"\n  ⏬ Đang scroll để load bài viết {post_index + 1}...")
-        
-        max_attempts = 50
-        for attempt in range(max_attempts):
-            containers = self.driver.find_elements(
-                By.CSS_SELECTOR, 
-                'div.x78zum5.xdt5ytf.x1iyjqo2.x1n2onr6'
-            )
-            
-            if len(containers) < 3:
-                self.random_pause(0.8, 1.5)
-                continue
-            
-            posts = containers[2].find_elements(By.CSS_SELECTOR, 'div.x78zum5.xdt5ytf')
-            
-            if len(posts) > post_index:
-                post = posts[post_index]
-                hidden_div = post.find_elements(By.CSS_SELECTOR, 'div[hidden]')
-                
-                if not hidden_div:
-                    print(f"  ✅ Bài viết {post_index + 1} đã load xong!")
-                    return True
-            
-            # Scroll tự nhiên thay vì dùng Keys.PAGE_DOWN
-            self.human_like_scroll()
-            
-            # Random pause giữa các lần scroll
-            self.random_pause(0.3, 0.8)
-        
-        print(f"  ⚠️ Timeout: Không load được bài {post_index + 1}")
-        return False
+    def extract_post_data(self, post_element):
+        """Extract dữ liệu 1 bài viết (1 round trip WebDriver)"""
+        return self.extract_posts_data([post_element])[0]
+    
+    def extract_media(self, post_element):
+        """Extract video và image từ bài viết"""
+        data = self.extract_post_data(post_element)
+        return data['videos'], data['images']
     
     def crawl_profile(self, profile_url, limit):
         """
@@ -217,6 +239,38 @@ class ThreadsCrawler:
         Returns:
             list: Danh sách dict chứa thông tin bài viết
         """
+        return list(self.iter_crawl_profile(profile_url, limit))
+    
+    def iter_crawl_profile(self, profile_url, limit, is_known=None,
+                           stop_after_known=WATERMARK_STOP_MATCHES, checkpoint=None):
+        """
+        Crawl trang cá nhân, trả về từng bài viết ngay khi extract xong
+        
+        Args:
+            profile_url: URL trang cá nhân
+            limit: Số bài viết cần crawl
+            is_known: Hàm nhận dict bài viết (content_1, content_2...), trả về True
+                      nếu bài đã crawl ở lần trước (theo watermark)
+            stop_after_known: Gặp liên tiếp bao nhiêu bài đã biết thì dừng crawl
+            checkpoint: CrawlCheckpoint của lần crawl bị dừng giữa chừng (optional).
+                        Bài đã xử lý được bỏ qua, feed được scroll nhanh tới vị trí cũ,
+                        link đã resolve được dùng lại
+        
+        Yields:
+            dict: {content_1, content_2, shopee_links, videos, images, feed_index}
+        """
+        self.pacer.start_session(profile_url)
+        try:
+            yield from self._iter_posts(profile_url, limit, is_known, stop_after_known, checkpoint)
+        finally:
+            self.pacer.end_session()
+    
+    def is_blocked(self):
+        """Trang bị chuyển tới login wall / checkpoint / captcha"""
+        url = (self.driver.current_url or '').lower()
+        return any(marker in url for marker in ('/login', '/accounts/', 'checkpoint', 'challenge', 'captcha'))
+    
+    def _iter_posts(self, profile_url, limit, is_known, stop_after_known, checkpoint):
         print(f"\n{'='*60}")
         print(f"🔍 Crawl: {profile_url}")
         print(f"🎯 Số bài cần crawl: {limit}")
@@ -226,119 +280,113 @@ class ThreadsCrawler:
         
         # Đợi trang load và mô phỏng hành vi người dùng
         print("⏳ Đang load trang...")
-        time.sleep(random.uniform(3, 5))
+        self.waits.until(
+            lambda d: d.execute_script(
+                "return document.querySelectorAll(arguments[0]).length", FEED_CONTAINER_CSS
+            ) >= 3,
+            "crawler.feed_loaded", timeout=15, soft=True
+        )
+        
+        if self.is_blocked():
+            self.pacer.signal('login_wall', self.driver.current_url)
         
         # Di chuột random để giống người thật
         print("🖱️  Mô phỏng hành vi người dùng...")
-        for _ in range(random.randint(2, 4)):
+        for _ in range(self.pacer.count('warmup_moves')):
             self.human_like_mouse_move()
         
         # Scroll nhẹ lên xuống như người thật
         self.human_like_scroll(random.randint(100, 300))
-        time.sleep(random.uniform(0.5, 1.0))
+        self.pacer.pause('warmup')
         self.driver.execute_script("window.scrollTo(0, 0);")  # Scroll về đầu
-        time.sleep(random.uniform(1, 2))
+        self.pacer.pause('warmup_settle')
         
-        results = []
+        display_number = 0
+        known_streak = 0
         
-        for i in range(limit):
-            post_index = i
-            display_number = i + 1
-            
-            print(f"\n{'='*60}")
-            print(f"📝 Crawl bài viết {display_number}/{limit}")
-            print(f"{'='*60}")
-            
-            if not self.scroll_until_post_loaded(post_index):
-                print(f"⚠️ Dừng lại ở bài {display_number - 1}")
+        resume_index = checkpoint.last_index if checkpoint else -1
+        if resume_index >= 0:
+            print(f"♻️  Tiếp tục từ checkpoint: đã xử lý tới bài {resume_index + 1}")
+        
+        # Các bài được trả về ngay khi load xong, không query lại cả feed mỗi bài
+        stream = ProfilePostStream(self, FEED_CONTAINER_CSS, fast_until=resume_index)
+        for post_index, current_post in stream:
+            if display_number >= limit:
                 break
             
-            containers = self.driver.find_elements(
-                By.CSS_SELECTOR, 
-                'div.x78zum5.xdt5ytf.x1iyjqo2.x1n2onr6'
-            )
+            post_data = None
             
-            if len(containers) < 3:
-                print("❌ Không tìm thấy container!")
-                break
+            # Bài đã xử lý ở lần chạy bị dừng: bỏ qua, không tính vào limit
+            if checkpoint:
+                post_data = self.extract_post_data(current_post)
+                if checkpoint.is_processed(post_data):
+                    print(f"⏩ Bài {post_index + 1} đã xử lý ở lần chạy trước, bỏ qua")
+                    continue
             
-            posts = containers[2].find_elements(By.CSS_SELECTOR, 'div.x78zum5.xdt5ytf')
+            print(f"\n{'='*60}")
+            print(f"🎬 Đang extract nội dung, link, video/image...")
+            print(f"{'='*60}")
+            if post_data is None:
+                post_data = self.extract_post_data(current_post)
+            
+            # Đã tới phần feed crawl ở lần trước: bỏ qua, không đọc/resolve link, không tính vào limit
+            if is_known and is_known(post_data):
+                known_streak += 1
+                print(f"⏭️  Bài đã crawl ở lần trước ({known_streak}/{stop_after_known})")
+                if known_streak >= stop_after_known:
+                    print("🛑 Đã tới watermark, dừng crawl")
+                    break
+                continue
+            known_streak = 0
             
-            if len(posts) <= post_index:
-                print("❌ Không còn bài viết!")
-                break
+            display_number += 1
             
-            current_post = posts[post_index]
+            print(f"\n{'='*60}")
+            print(f"📝 Crawl bài viết {display_number}/{limit}")
+            print(f"{'='*60}")
             
             # Mô phỏng đọc bài viết
             print("👀 Mô phỏng đọc bài viết...")
             self.simulate_reading(current_post)
             
-            content_1 = ""
-            content_2 = ""
-            redirect_links = []
-            
-            try:
-                text_spans = current_post.find_elements(
-                    By.CSS_SELECTOR, 
-                    'span.x1lliihq.x1plvlek.xryxfnj.x1n2onr6.xyejjpt.x15dsfln.xi7mnp6.x193iq5w.xeuugli.x1fj9vlw.x13faqbe.x1vvkbs.x1s928wv.xhkezso.x1gmr53x.x1cpjm7i.x1fgarty.x1943h6x.x1i0vuye.xjohtrz.xo1l8bm.xp07o12.x1yc453h.xat24cr.xdj266r'
-                )
-                
-                if len(text_spans) >= 1:
-                    parts = []
-                    for child in text_spans[0].find_elements(By.XPATH, './span | ./a'):
-                        text = child.text.strip()
-                        if text:
-                            parts.append(text)
-                        
-                        if child.tag_name == 'a':
-                            href = child.get_attribute('href')
-                            if href and ('l.threads.com' in href or 'shopee.vn' in href):
-                                redirect_links.append(href)
-                    
-                    content_1 = " ".join(parts)
-                
-                if len(text_spans) >= 2:
-                    parts = []
-                    for child in text_spans[1].find_elements(By.XPATH, './span | ./a'):
-                        text = child.text.strip()
-                        if text:
-                            parts.append(text)
-                        
-                        if child.tag_name == 'a':
-                            href = child.get_attribute('href')
-                            if href and ('l.threads.com' in href or 'shopee.vn' in href):
-                                redirect_links.append(href)
-                    
-                    content_2 = " ".join(parts)
-            except:
-                pass
+            content_1 = post_data['content_1']
+            content_2 = post_data['content_2']
+            redirect_links = post_data['links']
+            videos = post_data['videos']
+            images = post_data['images']
             
-            print(f"\n{'='*60}")
-            print(f"🎬 Đang extract video/image...")
-            print(f"{'='*60}")
-            videos, images = self.extract_media(current_post)
+            for i, video_src in enumerate(videos, 1):
+                print(f"  ✅ Video {i}: {video_src}")
+            for i, img_src in enumerate(images, 1):
+                print(f"  ✅ Image {i}: {img_src}")
             
             print(f"\n{'='*60}")
             print(f"🔗 Tìm thấy {len(redirect_links)} links")
             print(f"{'='*60}")
             
-            shopee_links = []
-            for link in redirect_links:
-                shopee_link = self.extract_shopee_link(link)
-                if shopee_link:
-                    shopee_links.append(shopee_link)
+            shopee_links = checkpoint.resolved_links(post_data) if checkpoint else None
+            if shopee_links is not None:
+                print(f"♻️  Dùng lại {len(shopee_links)} link đã resolve trước khi dừng")
+            else:
+                captchas_before = self.resolver.captchas
+                shopee_links = [link for link in self.extract_shopee_links(redirect_links) if link]
+                if self.resolver.captchas > captchas_before:
+                    self.pacer.signal('captcha', f"{self.resolver.captchas - captchas_before} link bị captcha")
+                else:
+                    self.pacer.signal('healthy')
+                
+                if checkpoint:
+                    checkpoint.save_links(post_data, shopee_links)
             
             result = {
                 'content_1': content_1,
                 'content_2': content_2,
                 'shopee_links': shopee_links,
                 'videos': videos,
-                'images': images
+                'images': images,
+                'feed_index': post_index
             }
             
-            results.append(result)
-            
             print(f"\n{'='*60}")
             print(f"📊 KẾT QUẢ BÀI {display_number}")
             print(f"{'='*60}")
@@ -349,21 +397,23 @@ class ThreadsCrawler:
             print(f"Images: {len(images)}")
             print(f"{'='*60}\n")
             
+            # Trả bài về cho bên gọi xử lý (lưu DB...) trước khi crawl bài tiếp
+            yield result
+            
+            if display_number >= limit:
+                break
+            
             # Pause random giữa các bài để tránh spam
-            if i < limit - 1:
-                pause_time = random.uniform(2, 5)
-                print(f"⏸️  Nghỉ {pause_time:.1f}s trước khi crawl bài tiếp...")
-                time.sleep(pause_time)
-                
-                # Di chuột random
+            pause_time = self.pacer.pause('between_posts')
+            print(f"⏸️  Đã nghỉ {pause_time:.1f}s trước khi crawl bài tiếp...")
+            
+            # Di chuột random
+            for _ in range(self.pacer.count('post_mouse_moves')):
                 self.human_like_mouse_move()
         
         print(f"\n{'='*60}")
-        print(f"✅ HOÀN THÀNH: Crawl được {len(results)} bài viết")
+        print(f"✅ HOÀN THÀNH: Crawl được {display_number} bài viết")
         print(f"{'='*60}\n")
-        
-        return results
-
 
 def test_crawler():
     """Test crawler"""
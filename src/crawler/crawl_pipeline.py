@@ -0,0 +1,160 @@
+import sys
+from datetime import datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+
+def build_full_content(post_data):
+    """Kết hợp content_1 và content_2 thành nội dung lưu database"""
+    full_content = post_data['content_1']
+    if post_data['content_2']:
+        full_content += "\n\n" + post_data['content_2']
+    return full_content
+
+
+class CrawlCheckpoint:
+    """
+    Checkpoint của 1 phiên crawl trang cá nhân, lưu trong database
+
+    Ghi lại vị trí bài cuối đã lưu, hash các bài đã lưu và link Shopee đã resolve
+    của bài đang xử lý dở. Nếu Chrome crash hoặc bị dừng giữa chừng, lần chạy sau
+    tiếp tục từ đây thay vì crawl lại từ đầu feed.
+    """
+
+    def __init__(self, db, profile_url):
+        self.db = db
+        self.profile_url = profile_url
+
+        saved = db.get_checkpoint(profile_url)
+        self.resumed = saved is not None
+        self.last_index = saved['last_index'] if saved else -1
+        self.last_hash = saved['last_hash'] if saved else None
+        self.processed_hashes = saved['processed_hashes'] if saved else []
+        self.partial_hash = saved['partial_hash'] if saved else None
+        self.partial_links = saved['partial_links'] if saved else None
+        self.started_at = saved['started_at'] if saved else datetime.now()
+
+        self._processed = set(self.processed_hashes)
+
+    def content_hash(self, post_data):
+        return self.db.generate_content_hash(build_full_content(post_data))
+
+    def is_processed(self, post_data):
+        """Bài đã được lưu ở lần chạy trước (hoặc trước đó trong lần này)"""
+        return self.content_hash(post_data) in self._processed
+
+    def resolved_links(self, post_data):
+        """
+        Link Shopee đã resolve của bài đang xử lý dở khi bị dừng
+
+        Returns:
+            list: Link Shopee, hoặc None nếu chưa resolve bài này
+        """
+        if self.partial_hash and self.partial_hash == self.content_hash(post_data):
+            return list(self.partial_links or [])
+        return None
+
+    def save_links(self, post_data, shopee_links):
+        """Ghi link đã resolve của bài đang xử lý (trước khi lưu bài)"""
+        self.partial_hash = self.content_hash(post_data)
+        self.partial_links = list(shopee_links)
+        self._save()
+
+    def mark_processed(self, post_data, feed_index):
+        """Ghi nhận bài đã lưu vào database"""
+        content_hash = self.content_hash(post_data)
+        if content_hash not in self._processed:
+            self._processed.add(content_hash)
+            self.processed_hashes.append(content_hash)
+
+        self.last_index = max(self.last_index, feed_index)
+        self.last_hash = content_hash
+        if self.partial_hash == content_hash:
+            self.partial_hash = None
+            self.partial_links = None
+        self._save()
+
+    def complete(self):
+        """Crawl xong: xóa checkpoint"""
+        self.db.delete_checkpoint(self.profile_url)
+
+    def _save(self):
+        self.db.save_checkpoint(
+            self.profile_url, self.last_index, self.last_hash, self.processed_hashes,
+            self.partial_hash, self.partial_links, self.started_at
+        )
+
+
+def crawl_and_save(crawler, db, profile_url, limit, before_next=None):
+    """
+    Crawl 1 trang cá nhân và lưu từng bài vào database ngay khi crawl xong
+
+    Dừng sớm khi gặp watermark của lần crawl trước, cập nhật watermark khi xong.
+    Tiến độ được ghi vào checkpoint sau mỗi bài; nếu lần trước bị dừng giữa chừng
+    thì tiếp tục từ checkpoint.
+
+    Args:
+        crawler: ThreadsCrawler
+        db: Database
+        profile_url: URL trang cá nhân
+        limit: Số bài tối đa cần crawl
+        before_next: Hàm gọi trước khi crawl mỗi bài (vd: chờ rate limit)
+
+    Returns:
+        tuple: (số bài crawl được, số bài mới đã lưu)
+    """
+    crawled_count = 0
+    saved_count = 0
+
+    # Watermark: hash các bài mới nhất đã thấy ở lần crawl trước
+    watermark = db.get_watermark(profile_url)
+    known_hashes = set(watermark['content_hashes']) if watermark else set()
+    if watermark:
+        print(f"📌 Watermark: {len(known_hashes)} bài, crawl lần trước lúc {watermark['last_crawled_at']}")
+
+    checkpoint = CrawlCheckpoint(db, profile_url)
+    if checkpoint.resumed:
+        print(f"♻️  Checkpoint: {len(checkpoint.processed_hashes)} bài đã lưu, "
+              f"phiên bắt đầu lúc {checkpoint.started_at}")
+
+    def is_known(post_data):
+        return checkpoint.content_hash(post_data) in known_hashes
+
+    posts = crawler.iter_crawl_profile(profile_url, limit=limit, is_known=is_known, checkpoint=checkpoint)
+
+    try:
+        while True:
+            if before_next:
+                before_next()
+
+            post_data = next(posts, None)
+            if post_data is None:
+                break
+
+            crawled_count += 1
+            print(f"\n💾 Lưu bài {crawled_count}/{limit} vào database...")
+
+            post_id = db.save_post(
+                content=build_full_content(post_data),
+                images=post_data['images'],
+                videos=post_data['videos'],
+                shopee_links=post_data['shopee_links'],
+                original_url=profile_url
+            )
+            checkpoint.mark_processed(post_data, post_data['feed_index'])
+
+            if post_id:
+                saved_count += 1
+                print(f"✅ Đã lưu post_id={post_id}")
+            else:
+                print("⚠️  Bài viết đã tồn tại, bỏ qua")
+    finally:
+        posts.close()
+
+    # Chỉ cập nhật watermark khi crawl trọn vẹn; bị dừng giữa chừng thì giữ checkpoint
+    # để lần sau crawl tiếp phần còn lại thay vì dừng ngay ở watermark mới
+    db.update_watermark(profile_url, checkpoint.processed_hashes)
+    checkpoint.complete()
+
+    return crawled_count, saved_count
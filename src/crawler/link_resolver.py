@@ -0,0 +1,288 @@
+import threading
+import time
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import urlparse, parse_qs, unquote, urljoin
+from pathlib import Path
+import requests
+from requests.adapters import HTTPAdapter
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from config.settings import (
+    RESOLVER_WORKERS,
+    RESOLVER_PER_HOST_CONCURRENCY,
+    RESOLVER_PER_HOST_INTERVAL,
+    RESOLVER_MAX_HOPS,
+    RESOLVER_TIMEOUT,
+)
+
+
+# Host của link Shopee cuối cùng; các host khác (s.shopee.vn, shope.ee...) là link rút gọn, phải đi tiếp
+SHOPEE_FINAL_HOSTS = {'shopee.vn', 'www.shopee.vn'}
+
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+}
+
+
+def unwrap_threads_redirect(redirect_url):
+    """l.threads.com/?u=<url> -> <url>"""
+    params = parse_qs(urlparse(redirect_url).query)
+    if 'u' in params:
+        return unquote(params['u'][0])
+    return redirect_url
+
+
+def is_final_shopee_url(url):
+    return urlparse(url).netloc.lower() in SHOPEE_FINAL_HOSTS
+
+
+class RedirectResolver:
+    """
+    Resolve link redirect thành link Shopee, nhiều link cùng lúc
+
+    Chỉ đọc header Location của từng bước redirect (không tải body trang
+    sản phẩm) và dừng ngay khi Location là link shopee.vn. Mỗi host có giới
+    hạn số request đồng thời và khoảng cách tối thiểu giữa 2 request.
+
+    Nếu có cache (Database), kết quả được tra trước khi gửi request và lưu lại
+    sau khi resolve, kể cả captcha/lỗi (TTL ngắn hơn). Cache chỉ được đọc/ghi
+    trong thread gọi resolve_many, các thread của pool chỉ làm HTTP.
+    """
+
+    def __init__(self, max_workers=RESOLVER_WORKERS, per_host_concurrency=RESOLVER_PER_HOST_CONCURRENCY,
+                 per_host_interval=RESOLVER_PER_HOST_INTERVAL, max_hops=RESOLVER_MAX_HOPS,
+                 timeout=RESOLVER_TIMEOUT, session=None, cache=None):
+        self.max_workers = max_workers
+        self.per_host_concurrency = per_host_concurrency
+        self.per_host_interval = per_host_interval
+        self.max_hops = max_hops
+        self.timeout = timeout
+
+        if session is None:
+            session = requests.Session()
+            session.headers.update(DEFAULT_HEADERS)
+            adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
+
+        self.cache = cache
+
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.captchas = 0  # Số lần resolve (không tính cache) ra trang captcha
+        self._saved_seconds = 0.0
+        self._resolve_seconds = 0.0
+
+    @contextmanager
+    def _host_slot(self, host):
+        """Giữ 1 slot của host, đảm bảo giới hạn đồng thời và khoảng cách giữa các request"""
+        with self._lock:
+            slot = self._hosts.setdefault(host, {
+                'semaphore': threading.BoundedSemaphore(self.per_host_concurrency),
+                'next_at': 0.0,
+            })
+
+        with slot['semaphore']:
+            with self._lock:
+                now = time.monotonic()
+                start_at = max(now, slot['next_at'])
+                slot['next_at'] = start_at + self.per_host_interval
+
+            if start_at > now:
+                time.sleep(start_at - now)
+            yield
+
+    def _next_hop(self, url):
+        """
+        Gửi 1 request không follow redirect, không đọc body
+
+        Returns:
+            tuple: (status_code, location hoặc None)
+        """
+        host = urlparse(url).netloc.lower()
+        with self._host_slot(host):
+            response = self.session.get(url, allow_redirects=False, stream=True, timeout=self.timeout)
+            try:
+                location = response.headers.get('Location')
+                return response.status_code, urljoin(url, location) if location else None
+            finally:
+                response.close()
+
+    def _resolve(self, url):
+        """
+        Đi theo redirect cho tới link shopee.vn
+
+        Returns:
+            tuple: (final_url hoặc None, status 'ok' | 'captcha' | 'failed')
+        """
+        for _ in range(self.max_hops):
+            if is_final_shopee_url(url):
+                return (None, 'captcha') if 'captcha' in url else (url, 'ok')
+
+            status, location = self._next_hop(url)
+            if status not in REDIRECT_STATUSES or not location:
+                # Hết redirect ở host trung gian của Shopee (vd: trang rút gọn trả 200)
+                if 'shopee.vn' in urlparse(url).netloc.lower() and 'captcha' not in url:
+                    return url, 'ok'
+                return None, 'failed'
+
+            url = location
+
+        return None, 'failed'
+
+    def _timed_resolve(self, url):
+        start = time.perf_counter()
+        try:
+            final_url, status = self._resolve(url)
+        except Exception as e:
+            print(f"  ❌ Lỗi resolve {url[:80]}: {e}")
+            final_url, status = None, 'failed'
+        return final_url, status, time.perf_counter() - start
+
+    def resolve(self, redirect_url):
+        """
+        Resolve 1 link redirect
+
+        Args:
+            redirect_url: Link trong bài viết (l.threads.com/?u=..., link rút gọn, link shopee)
+
+        Returns:
+            str: Link shopee.vn, hoặc None nếu không resolve được / bị captcha
+        """
+        return self.resolve_many([redirect_url])[0]
+
+    def resolve_many(self, redirect_urls):
+        """
+        Resolve nhiều link cùng lúc (tra cache trước, chỉ gửi request cho link chưa có)
+
+        Returns:
+            list: Kết quả theo đúng thứ tự đầu vào (None với link lỗi/captcha)
+        """
+        if not redirect_urls:
+            return []
+
+        # Key cache là link bên trong l.threads.com để cùng 1 link rút gọn dùng chung entry
+        keys = [unwrap_threads_redirect(url) for url in redirect_urls]
+        cached = self.cache.get_cached_redirects(keys) if self.cache else {}
+
+        pending = [key for key in dict.fromkeys(keys) if key not in cached]
+        with self._lock:
+            for key in keys:
+                entry = cached.get(key)
+                if entry is None:
+                    continue
+                if entry['status'] == 'ok':
+                    self.hits += 1
+                else:
+                    self.negative_hits += 1
+                self._saved_seconds += entry['resolve_seconds']
+            self.misses += len(pending)
+
+        resolved = {}
+        if pending:
+            workers = min(self.max_workers, len(pending))
+            if workers == 1:
+                outcomes = [self._timed_resolve(pending[0])]
+            else:
+                with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="resolver") as executor:
+                    outcomes = list(executor.map(self._timed_resolve, pending))
+
+            with self._lock:
+                self._resolve_seconds += sum(elapsed for _, _, elapsed in outcomes)
+                self.captchas += sum(1 for _, status, _ in outcomes if status == 'captcha')
+
+            if self.cache:
+                self.cache.cache_redirects([
+                    (key, final_url, status, elapsed)
+                    for key, (final_url, status, elapsed) in zip(pending, outcomes)
+                ])
+            resolved = {key: final_url for key, (final_url, _, _) in zip(pending, outcomes)}
+
+        return [
+            cached[key]['final_url'] if key in cached else resolved[key]
+            for key in keys
+        ]
+
+    def stats(self):
+        """Thống kê cache hit/miss và thời gian request đã tiết kiệm"""
+        with self._lock:
+            lookups = self.hits + self.negative_hits + self.misses
+            return {
+                'hits': self.hits,
+                'negative_hits': self.negative_hits,
+                'misses': self.misses,
+                'hit_rate': round((self.hits + self.negative_hits) / lookups, 3) if lookups else 0.0,
+                'avg_resolve_seconds': round(self._resolve_seconds / self.misses, 2) if self.misses else 0.0,
+                'saved_seconds': round(self._saved_seconds, 1),
+            }
+
+    def print_report(self):
+        stats = self.stats()
+        print(f"\n🔁 Cache redirect: {stats['hits']} hit / {stats['negative_hits']} hit captcha-lỗi / "
+              f"{stats['misses']} miss (tỉ lệ {stats['hit_rate']:.0%}, tiết kiệm ~{stats['saved_seconds']}s request)")
+
+
+def test_link_resolver():
+    """Test resolver với server redirect chạy local"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class RedirectHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(0.5)  # Giả lập độ trễ mạng
+            item = self.path.strip('/')
+            if item == 'captcha':
+                location = 'https://shopee.vn/verify/captcha?item=1'
+            else:
+                location = f'https://shopee.vn/product/1/{item}'
+            self.send_response(302)
+            self.send_header('Location', location)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), RedirectHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    print("\n" + "="*60)
+    print("🧪 TEST REDIRECT RESOLVER")
+    print("="*60 + "\n")
+
+    import tempfile
+    from src.database.database import Database
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(Path(tmp) / "resolver_test.db")
+        resolver = RedirectResolver(per_host_interval=0.05, cache=db)
+        links = [f"https://l.threads.com/?u={base}/{i}" for i in range(1, 5)] + [f"{base}/captcha"]
+
+        for attempt in (1, 2):
+            start = time.perf_counter()
+            results = resolver.resolve_many(links)
+            elapsed = time.perf_counter() - start
+
+            print(f"\n--- Lần {attempt} ---")
+            for link, result in zip(links, results):
+                print(f"  {link[-30:]} -> {result}")
+            print(f"⏱️  {len(links)} link trong {elapsed:.2f}s (tuần tự ~{0.5 * len(links):.1f}s)")
+
+        resolver.print_report()
+        print(f"📊 {db.get_redirect_cache_stats()}")
+        db.close()
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    test_link_resolver()
@@ -0,0 +1,156 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from config.settings import POST_STREAM_MAX_IDLE_SCROLLS, POST_STREAM_BATCH_SIZE
+
+
+# Bài viết trong feed (tìm bên trong container feed)
+POST_CSS = 'div.x78zum5.xdt5ytf'
+
+# Cài MutationObserver vào trang: mỗi bài viết mới xuất hiện trong feed được đánh số
+# theo thứ tự và đưa vào hàng đợi trong page. Chỉ xử lý node mới thêm, không quét lại feed.
+# arguments: [FEED_CONTAINER_CSS, POST_CSS]
+INSTALL_OBSERVER_JS = """
+    const [feedCss, postCss] = arguments;
+    if (window.__acStream) return window.__acStream.next;
+
+    const state = {id: Math.random(), next: 0, queue: [], posts: new Map()};
+    window.__acStream = state;
+
+    const feed = () => document.querySelectorAll(feedCss)[2];
+
+    function register(el) {
+        if (el.__acStreamId === state.id) return;
+        el.__acStreamId = state.id;
+        const index = state.next++;
+        state.posts.set(index, el);
+        state.queue.push(index);
+    }
+
+    function collect(node) {
+        const root = feed();
+        if (!root || node.nodeType !== 1) return;
+        if (node !== root && node.contains(root)) {
+            root.querySelectorAll(postCss).forEach(register);
+            return;
+        }
+        if (!root.contains(node)) return;
+        if (node.matches(postCss)) register(node);
+        node.querySelectorAll(postCss).forEach(register);
+    }
+
+    const root = feed();
+    if (root) root.querySelectorAll(postCss).forEach(register);
+
+    state.observer = new MutationObserver(records => {
+        for (const record of records) record.addedNodes.forEach(collect);
+    });
+    state.observer.observe(document.body, {childList: true, subtree: true});
+    return state.next;
+"""
+
+# Lấy tối đa N bài đầu hàng đợi đã load xong (không còn div[hidden]), giữ đúng thứ tự.
+# Bài bị React gỡ khỏi DOM thì bỏ qua.
+# arguments: [max_items]
+TAKE_READY_POSTS_JS = """
+    const state = window.__acStream;
+    if (!state) return null;
+
+    const ready = [];
+    while (state.queue.length && ready.length < arguments[0]) {
+        const index = state.queue[0];
+        const el = state.posts.get(index);
+
+        if (!el || !el.isConnected) {
+            state.queue.shift();
+            state.posts.delete(index);
+            continue;
+        }
+        if (el.querySelector('div[hidden]')) break;
+
+        state.queue.shift();
+        state.posts.delete(index);
+        ready.push({index: index, element: el});
+    }
+    return ready;
+"""
+
+UNINSTALL_OBSERVER_JS = """
+    if (window.__acStream) {
+        window.__acStream.observer.disconnect();
+        delete window.__acStream;
+    }
+"""
+
+
+class ProfilePostStream:
+    """
+    Iterator trả về lần lượt từng bài viết của trang cá nhân ngay khi load xong
+
+    Bài mới được MutationObserver trong page đưa vào hàng đợi, Python chỉ cần
+    1 lần execute_script mỗi vòng để lấy các bài đã sẵn sàng, nên chi phí
+    mỗi bài không tăng theo độ dài feed.
+    """
+
+    def __init__(self, crawler, feed_css, max_idle_scrolls=POST_STREAM_MAX_IDLE_SCROLLS,
+                 batch_size=POST_STREAM_BATCH_SIZE, fast_until=-1):
+        """
+        Args:
+            crawler: ThreadsCrawler (dùng driver và các hàm scroll/pause giống người)
+            feed_css: Selector container feed
+            max_idle_scrolls: Scroll liên tiếp bao nhiêu lần không có bài mới thì dừng
+            batch_size: Số bài tối đa lấy mỗi lần gọi execute_script
+            fast_until: Chưa tới bài có index này thì scroll thẳng xuống cuối feed,
+                        không scroll giống người (dùng khi resume từ checkpoint)
+        """
+        self.crawler = crawler
+        self.driver = crawler.driver
+        self.feed_css = feed_css
+        self.max_idle_scrolls = max_idle_scrolls
+        self.batch_size = batch_size
+        self.fast_until = fast_until
+
+    def __iter__(self):
+        """
+        Yields:
+            tuple: (index, post_element) theo thứ tự xuất hiện trong feed
+        """
+        self.driver.execute_script(INSTALL_OBSERVER_JS, self.feed_css, POST_CSS)
+        idle_scrolls = 0
+        last_index = -1
+
+        try:
+            while True:
+                ready = self.driver.execute_script(TAKE_READY_POSTS_JS, self.batch_size)
+
+                # Page bị reload/điều hướng: cài lại observer
+                if ready is None:
+                    self.driver.execute_script(INSTALL_OBSERVER_JS, self.feed_css, POST_CSS)
+                    continue
+
+                if ready:
+                    idle_scrolls = 0
+                    for item in ready:
+                        last_index = item['index']
+                        yield item['index'], item['element']
+                    continue
+
+                if idle_scrolls >= self.max_idle_scrolls:
+                    print(f"  ⚠️ Scroll {idle_scrolls} lần không có bài mới, dừng lại")
+                    return
+
+                if last_index < self.fast_until:
+                    # Đang tua lại tới vị trí checkpoint: scroll thẳng xuống cuối
+                    self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+                    self.crawler.random_pause('scroll_step')
+                else:
+                    # Chưa có bài sẵn sàng: scroll tự nhiên để feed load thêm
+                    self.crawler.human_like_scroll()
+                    self.crawler.random_pause('feed_scroll')
+                idle_scrolls += 1
+        finally:
+            try:
+                self.driver.execute_script(UNINSTALL_OBSERVER_JS)
+            except Exception:
+                pass
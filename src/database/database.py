@@ -1,17 +1,42 @@
 import sqlite3
 import hashlib
+import json
+import threading
+import time
 from pathlib import Path
 from datetime import datetime
 import sys
 
 # Add root directory to path
 sys.path.append(str(Path(__file__).parent.parent.parent))
+from config.settings import (
+    WATERMARK_SIZE,
+    REDIRECT_CACHE_TTL,
+    REDIRECT_CACHE_NEGATIVE_TTL,
+    DB_BUSY_TIMEOUT,
+    DB_SYNCHRONOUS,
+    DB_CACHE_SIZE_KB,
+    AFFILIATE_MAX_FAILURES,
+    NEAR_DUPLICATE_THRESHOLD,
+    MINHASH_PERMUTATIONS,
+    MINHASH_BANDS,
+    MINHASH_SHINGLE_SIZE,
+)
+from src.utils.url_utils import canonicalize_shopee_url
+from src.utils.minhash import MinHasher
+from src.database.migrations import run_migrations, get_schema_version, LATEST_VERSION
 
 
 class Database:
-    """Quản lý database SQLite để lưu posts từ Threads"""
+    """
+    Quản lý database SQLite để lưu posts từ Threads
     
-    def __init__(self, db_path=None):
+    Database chạy ở chế độ WAL: nhiều thread/process đọc cùng lúc không chặn
+    thread đang ghi. Mỗi thread dùng 1 connection riêng (self.conn), nên có
+    thể dùng chung 1 instance Database giữa các thread.
+    """
+    
+    def __init__(self, db_path=None, schema_version=LATEST_VERSION):
         if db_path is None:
             # Tự động xác định đường dẫn từ root project
             root_dir = Path(__file__).parent.parent.parent
@@ -19,71 +44,212 @@ class Database:
         
         self.db_path = Path(db_path)
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
-        self.conn = None
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self.minhasher = MinHasher(MINHASH_PERMUTATIONS, MINHASH_BANDS, MINHASH_SHINGLE_SIZE)
         self.connect()
-        self.init_database()
+        self.init_database(schema_version)
+    
+    @property
+    def conn(self):
+        """Connection của thread hiện tại (tự mở khi thread dùng lần đầu)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._open_connection()
+        return conn
     
     def connect(self):
-        """Kết nối database, tạo file nếu chưa có"""
-        self.conn = sqlite3.connect(self.db_path)
+        """Kết nối database, tạo file nếu chưa có và bật WAL"""
+        conn = self._open_connection()
+        
+        # journal_mode lưu trong file database, các connection sau tự dùng WAL
+        journal_mode = conn.execute('PRAGMA journal_mode=WAL').fetchone()[0]
+        if journal_mode.lower() != 'wal':
+            print(f"⚠️  Không bật được WAL (journal_mode={journal_mode})")
         print(f"✅ Đã kết nối database: {self.db_path}")
     
-    def init_database(self):
-        """Tạo các bảng nếu chưa tồn tại"""
-        cursor = self.conn.cursor()
+    def _open_connection(self):
+        """Mở connection cho thread hiện tại với các pragma đã tinh chỉnh"""
+        # check_same_thread=False chỉ để close() đóng được connection của thread khác;
+        # mỗi connection vẫn chỉ được dùng bởi thread đã mở nó
+        conn = sqlite3.connect(self.db_path, timeout=DB_BUSY_TIMEOUT, check_same_thread=False)
+        conn.execute(f'PRAGMA busy_timeout = {int(DB_BUSY_TIMEOUT * 1000)}')
+        conn.execute(f'PRAGMA synchronous = {DB_SYNCHRONOUS}')
+        conn.execute(f'PRAGMA cache_size = -{DB_CACHE_SIZE_KB}')
+        conn.execute('PRAGMA temp_store = MEMORY')
         
-        # Bảng chính: lưu thông tin bài viết
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS posts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                content_hash TEXT UNIQUE NOT NULL,
-                content TEXT NOT NULL,
-                original_url TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                is_posted INTEGER DEFAULT 0,
-                posted_at TIMESTAMP
-            )
-        ''')
+        self._local.conn = conn
+        with self._connections_lock:
+            # Đóng connection của các thread đã kết thúc (vd: thread request của Flask)
+            alive = []
+            for thread, old_conn in self._connections:
+                if thread.is_alive():
+                    alive.append((thread, old_conn))
+                else:
+                    old_conn.close()
+            alive.append((threading.current_thread(), conn))
+            self._connections = alive
+        return conn
+    
+    def init_database(self, target_version=LATEST_VERSION):
+        """Tạo/cập nhật schema bằng các migration chưa chạy (xem migrations.py)"""
+        run_migrations(self, self.conn, target_version)
+        print(f"✅ Database schema đã sẵn sàng (version {get_schema_version(self.conn)})")
+    
+    def _get_link_ids(self, cursor, shopee_links):
+        """
+        Lấy id trong affiliate_links của các link (tạo dòng mới nếu chưa có)
         
-        # Bảng lưu ảnh
+        Returns:
+            dict: {canonical_url: link_id}
+        """
+        canonical_urls = list(dict.fromkeys(canonicalize_shopee_url(link) for link in shopee_links))
+        if not canonical_urls:
+            return {}
+        
+        cursor.executemany('INSERT OR IGNORE INTO affiliate_links (canonical_url) VALUES (?)',
+                           [(url,) for url in canonical_urls])
         cursor.execute('''
-            CREATE TABLE IF NOT EXISTS post_images (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                post_id INTEGER NOT NULL,
-                image_url TEXT NOT NULL,
-                local_path TEXT,
-                FOREIGN KEY (post_id) REFERENCES posts(id) ON DELETE CASCADE
-            )
-        ''')
+            SELECT canonical_url, id FROM affiliate_links
+            WHERE canonical_url IN (SELECT value FROM json_each(?))
+        ''', (json.dumps(canonical_urls),))
+        return dict(cursor.fetchall())
+    
+    def _index_signatures(self, cursor, signatures):
+        """
+        Lưu signature MinHash và bucket LSH của các bài
         
-        # Bảng lưu video
+        Args:
+            signatures: Dict {post_id: signature} (bỏ qua signature None)
+        """
+        signatures = {post_id: sig for post_id, sig in signatures.items() if sig}
+        cursor.executemany('INSERT OR REPLACE INTO post_signatures (post_id, signature) VALUES (?, ?)', [
+            (post_id, MinHasher.to_bytes(sig)) for post_id, sig in signatures.items()
+        ])
+        cursor.executemany('INSERT OR IGNORE INTO post_lsh_buckets (bucket, post_id) VALUES (?, ?)', [
+            (bucket, post_id)
+            for post_id, sig in signatures.items()
+            for bucket in self.minhasher.buckets(sig)
+        ])
+    
+    def _backfill_signatures(self, cursor, batch_size=1000):
+        """Tính signature cho các bài chưa có trong index gần trùng"""
         cursor.execute('''
-            CREATE TABLE IF NOT EXISTS post_videos (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                post_id INTEGER NOT NULL,
-                video_url TEXT NOT NULL,
-                local_path TEXT,
-                FOREIGN KEY (post_id) REFERENCES posts(id) ON DELETE CASCADE
-            )
+            SELECT COUNT(*) FROM posts
+            WHERE id NOT IN (SELECT post_id FROM post_signatures)
         ''')
+        total = cursor.fetchone()[0]
+        if not total:
+            return
+        
+        print(f"🔄 Tính signature gần trùng cho {total} bài...")
+        done = 0
+        last_id = 0
+        while True:
+            cursor.execute('''
+                SELECT id, content FROM posts
+                WHERE id > ? AND id NOT IN (SELECT post_id FROM post_signatures)
+                ORDER BY id
+                LIMIT ?
+            ''', (last_id, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            
+            self._index_signatures(cursor, {
+                post_id: self.minhasher.signature(content) for post_id, content in rows
+            })
+            last_id = rows[-1][0]
+            done += len(rows)
+            if done % (batch_size * 10) == 0:
+                print(f"   {done}/{total}")
+        print(f"✅ Đã thêm {total} bài vào index gần trùng")
+    
+    def _match_near_duplicates(self, cursor, signatures, threshold):
+        """
+        Tìm bài gần trùng cho nhiều signature (trong database và giữa các bài với nhau)
+        
+        Chỉ so signature với các bài chung ít nhất 1 bucket LSH (2 query, không quét
+        toàn bảng). Bài đứng sau trùng bài đứng trước trong cùng lô cũng bị tính là trùng.
+        
+        Args:
+            signatures: Dict {key: signature} theo thứ tự (signature None = bỏ qua)
+            threshold: Độ giống tối thiểu
+        
+        Returns:
+            dict: {key: (post_id hoặc None nếu trùng bài trong lô, độ giống)} của các bài gần trùng
+        """
+        buckets = {key: self.minhasher.buckets(sig) for key, sig in signatures.items() if sig}
+        if not buckets:
+            return {}
         
-        # Bảng lưu link Shopee
         cursor.execute('''
-            CREATE TABLE IF NOT EXISTS shopee_links (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                post_id INTEGER NOT NULL,
-                original_link TEXT NOT NULL,
-                affiliate_link TEXT,
-                FOREIGN KEY (post_id) REFERENCES posts(id) ON DELETE CASCADE
-            )
-        ''')
+            SELECT bucket, post_id FROM post_lsh_buckets
+            WHERE bucket IN (SELECT value FROM json_each(?))
+        ''', (json.dumps([b for key_buckets in buckets.values() for b in key_buckets]),))
+        bucket_posts = {}
+        for bucket, post_id in cursor.fetchall():
+            bucket_posts.setdefault(bucket, set()).add(post_id)
         
-        # Tạo index để tăng tốc độ truy vấn
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_content_hash ON posts(content_hash)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_is_posted ON posts(is_posted)')
+        candidate_ids = set().union(*bucket_posts.values()) if bucket_posts else set()
+        stored = {}
+        if candidate_ids:
+            cursor.execute('''
+                SELECT post_id, signature FROM post_signatures
+                WHERE post_id IN (SELECT value FROM json_each(?))
+            ''', (json.dumps(list(candidate_ids)),))
+            stored = {post_id: MinHasher.from_bytes(data) for post_id, data in cursor.fetchall()}
         
-        self.conn.commit()
-        print(f"✅ Database schema đã sẵn sàng")
+        matches = {}
+        batch_buckets = {}
+        for key, key_buckets in buckets.items():
+            sig = signatures[key]
+            best = None
+            
+            post_ids = set().union(*(bucket_posts.get(b, ()) for b in key_buckets))
+            for post_id in post_ids:
+                similarity = self.minhasher.similarity(sig, stored[post_id])
+                if similarity >= threshold and (best is None or similarity > best[1]):
+                    best = (post_id, similarity)
+            
+            if best is None:
+                earlier = set().union(*(batch_buckets.get(b, ()) for b in key_buckets))
+                for other in earlier:
+                    similarity = self.minhasher.similarity(sig, signatures[other])
+                    if similarity >= threshold and (best is None or similarity > best[1]):
+                        best = (None, similarity)
+            
+            if best is None:
+                for b in key_buckets:
+                    batch_buckets.setdefault(b, []).append(key)
+            else:
+                matches[key] = best
+        
+        return matches
+    
+    def find_near_duplicate(self, content, threshold=NEAR_DUPLICATE_THRESHOLD):
+        """
+        Tìm bài đã lưu gần trùng với content (khác emoji, hashtag, link rút gọn...)
+        
+        Returns:
+            tuple: (post_id, độ giống) của bài giống nhất, hoặc None
+        """
+        return self._match_near_duplicates(
+            self.conn.cursor(), {0: self.minhasher.signature(content)}, threshold
+        ).get(0)
+    
+    def rebuild_near_duplicate_index(self):
+        """Tính lại toàn bộ index gần trùng (sau khi đổi tham số MinHash trong settings)"""
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute('DELETE FROM post_lsh_buckets')
+            cursor.execute('DELETE FROM post_signatures')
+            self._backfill_signatures(cursor)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
     
     def generate_content_hash(self, content):
         """Tạo hash từ content để phát hiện trùng lặp"""
@@ -97,8 +263,8 @@ class Database:
         cursor.execute('SELECT id FROM posts WHERE content_hash = ?', (content_hash,))
         return cursor.fetchone() is not None
     
-    def save_post(self, content, images=None, videos=None, shopee_links=None, 
-                  original_url=None):
+    def save_post(self, content, images=None, videos=None, shopee_links=None,
+                  original_url=None, near_duplicate_threshold=NEAR_DUPLICATE_THRESHOLD):
         """
         Lưu bài viết mới vào database
         
@@ -108,105 +274,326 @@ class Database:
             videos: List URL video ['url1', 'url2', ...]
             shopee_links: List link Shopee ['link1', 'link2', ...]
             original_url: URL gốc của bài viết
+            near_duplicate_threshold: Độ giống để coi là trùng bài đã lưu (None = chỉ kiểm tra trùng y hệt)
         
         Returns:
             post_id nếu thành công, None nếu trùng lặp
         """
-        if self.is_duplicate(content):
+        post_id = self.save_posts([{
+            'content': content,
+            'images': images,
+            'videos': videos,
+            'shopee_links': shopee_links,
+            'original_url': original_url
+        }], verbose=False, near_duplicate_threshold=near_duplicate_threshold)[0]
+        
+        if post_id is None:
             print(f"⚠️  Bài viết đã tồn tại (duplicate content)")
-            return None
+        else:
+            print(f"✅ Đã lưu post_id={post_id}")
+        return post_id
+    
+    def save_posts(self, posts, verbose=True, near_duplicate_threshold=NEAR_DUPLICATE_THRESHOLD):
+        """
+        Lưu nhiều bài viết trong 1 transaction
+        
+        Kiểm tra trùng với database bằng 1 query, insert post và ảnh/video/link
+        bằng executemany, commit 1 lần.
+        
+        Args:
+            posts: Iterable dict {content, images, videos, shopee_links, original_url}
+                   (chỉ content là bắt buộc)
+            near_duplicate_threshold: Độ giống (MinHash) để coi là trùng (None = chỉ kiểm tra trùng y hệt)
+        
+        Returns:
+            list: post_id theo đúng thứ tự đầu vào, None với bài trùng lặp hoặc gần trùng
+                  (trùng database hoặc trùng bài trước đó trong cùng lô)
+        """
+        posts = list(posts)
+        if not posts:
+            return []
         
+        hashes = [self.generate_content_hash(post['content']) for post in posts]
         cursor = self.conn.cursor()
-        content_hash = self.generate_content_hash(content)
         
         try:
-            # 1. Insert post chính
             cursor.execute('''
-                INSERT INTO posts (content_hash, content, original_url)
-                VALUES (?, ?, ?)
-            ''', (content_hash, content, original_url))
-            
-            post_id = cursor.lastrowid
+                SELECT content_hash FROM posts
+                WHERE content_hash IN (SELECT value FROM json_each(?))
+            ''', (json.dumps(hashes),))
+            existing = {row[0] for row in cursor.fetchall()}
             
-            # 2. Insert images
-            if images:
-                for img_url in images:
-                    cursor.execute('''
-                        INSERT INTO post_images (post_id, image_url)
-                        VALUES (?, ?)
-                    ''', (post_id, img_url))
+            # Bài mới: chưa có trong database, trùng trong lô thì lấy bài đầu tiên
+            new_posts = {}
+            for post, content_hash in zip(posts, hashes):
+                if content_hash not in existing and content_hash not in new_posts:
+                    new_posts[content_hash] = post
             
-            # 3. Insert videos
-            if videos:
-                for vid_url in videos:
-                    cursor.execute('''
-                        INSERT INTO post_videos (post_id, video_url)
-                        VALUES (?, ?)
-                    ''', (post_id, vid_url))
+            # Bài gần trùng (khác emoji, hashtag, link rút gọn...) cũng bỏ qua
+            signatures = {
+                content_hash: self.minhasher.signature(post['content'])
+                for content_hash, post in new_posts.items()
+            }
+            near_duplicates = {}
+            if near_duplicate_threshold:
+                near_duplicates = self._match_near_duplicates(cursor, signatures, near_duplicate_threshold)
+                for content_hash, (post_id, similarity) in near_duplicates.items():
+                    del new_posts[content_hash]
+                    match = f"post_id={post_id}" if post_id else "bài trước đó trong lô"
+                    print(f"⚠️  Bài gần trùng với {match} (độ giống {similarity:.2f})")
             
-            # 4. Insert Shopee links
-            if shopee_links:
-                for link in shopee_links:
-                    cursor.execute('''
-                        INSERT INTO shopee_links (post_id, original_link)
-                        VALUES (?, ?)
-                    ''', (post_id, link))
+            ids = {}
+            if new_posts:
+                cursor.executemany('''
+                    INSERT INTO posts (content_hash, content, original_url)
+                    VALUES (?, ?, ?)
+                ''', [
+                    (content_hash, post['content'], post.get('original_url'))
+                    for content_hash, post in new_posts.items()
+                ])
+                
+                cursor.execute('''
+                    SELECT content_hash, id FROM posts
+                    WHERE content_hash IN (SELECT value FROM json_each(?))
+                ''', (json.dumps(list(new_posts)),))
+                ids = dict(cursor.fetchall())
+                
+                # Mỗi sản phẩm chỉ có 1 dòng trong affiliate_links, các bài cùng trỏ tới
+                link_ids = self._get_link_ids(cursor, [
+                    link for post in new_posts.values() for link in post.get('shopee_links') or []
+                ])
+                
+                images, videos, links = [], [], []
+                for content_hash, post in new_posts.items():
+                    post_id = ids[content_hash]
+                    images.extend((post_id, url) for url in post.get('images') or [])
+                    videos.extend((post_id, url) for url in post.get('videos') or [])
+                    links.extend(
+                        (post_id, link, link_ids[canonicalize_shopee_url(link)])
+                        for link in post.get('shopee_links') or []
+                    )
+                
+                cursor.executemany('INSERT INTO post_images (post_id, image_url) VALUES (?, ?)', images)
+                cursor.executemany('INSERT INTO post_videos (post_id, video_url) VALUES (?, ?)', videos)
+                cursor.executemany(
+                    'INSERT INTO shopee_links (post_id, original_link, link_id) VALUES (?, ?, ?)', links
+                )
+                
+                self._index_signatures(cursor, {
+                    ids[content_hash]: signatures[content_hash] for content_hash in new_posts
+                })
             
             self.conn.commit()
-            print(f"✅ Đã lưu post_id={post_id}")
-            return post_id
-            
+        
         except sqlite3.IntegrityError as e:
             print(f"❌ Lỗi trùng lặp: {e}")
             self.conn.rollback()
-            return None
+            return [None] * len(posts)
         except Exception as e:
             print(f"❌ Lỗi lưu database: {e}")
             self.conn.rollback()
             raise
-    
+        
+        # Chỉ lần xuất hiện đầu tiên của mỗi bài mới nhận id
+        result = []
+        for content_hash in hashes:
+            result.append(ids.pop(content_hash, None))
+        
+        if verbose:
+            print(f"✅ Đã lưu {len(new_posts)}/{len(posts)} bài viết "
+                  f"({len(posts) - len(new_posts)} trùng lặp, {len(near_duplicates)} gần trùng)")
+        return result
+
     def get_post(self, post_id):
         """Lấy thông tin đầy đủ của 1 post"""
+        posts = self.get_posts([post_id])
+        return posts[0] if posts else None
+    
+    def get_posts(self, post_ids):
+        """
+        Lấy thông tin đầy đủ của nhiều post (4 query, không phụ thuộc số post)
+        
+        Returns:
+            list: Dict post theo thứ tự post_ids (bỏ qua id không tồn tại)
+        """
+        post_ids = list(post_ids)
+        if not post_ids:
+            return []
+        
         cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT id, content, original_url, is_posted, created_at FROM posts
+            WHERE id IN (SELECT value FROM json_each(?))
+        ''', (json.dumps(post_ids),))
+        rows = {row[0]: row for row in cursor.fetchall()}
         
-        cursor.execute('SELECT * FROM posts WHERE id = ?', (post_id,))
-        post = cursor.fetchone()
+        return self._load_posts([rows[pid] for pid in post_ids if pid in rows])
+    
+    def _load_posts(self, rows):
+        """
+        Ghép ảnh, video, link Shopee vào các dòng posts (mỗi bảng con 1 query)
         
-        if not post:
-            return None
+        Args:
+            rows: List (id, content, original_url, is_posted, created_at)
+        """
+        if not rows:
+            return []
+        
+        posts = {}
+        for row in rows:
+            posts[row[0]] = {
+                'id': row[0],
+                'content': row[1],
+                'original_url': row[2],
+                'images': [],
+                'videos': [],
+                'shopee_links': [],
+                'affiliate_links': [],
+                'is_posted': row[3]
+            }
         
-        cursor.execute('SELECT image_url, local_path FROM post_images WHERE post_id = ?', (post_id,))
-        images = cursor.fetchall()
+        ids_json = json.dumps(list(posts))
+        cursor = self.conn.cursor()
         
-        cursor.execute('SELECT video_url, local_path FROM post_videos WHERE post_id = ?', (post_id,))
-        videos = cursor.fetchall()
+        cursor.execute('''
+            SELECT post_id, image_url FROM post_images
+            WHERE post_id IN (SELECT value FROM json_each(?))
+            ORDER BY id
+        ''', (ids_json,))
+        for post_id, image_url in cursor.fetchall():
+            posts[post_id]['images'].append(image_url)
         
-        cursor.execute('SELECT original_link, affiliate_link FROM shopee_links WHERE post_id = ?', (post_id,))
-        shopee_links = cursor.fetchall()
+        cursor.execute('''
+            SELECT post_id, video_url FROM post_videos
+            WHERE post_id IN (SELECT value FROM json_each(?))
+            ORDER BY id
+        ''', (ids_json,))
+        for post_id, video_url in cursor.fetchall():
+            posts[post_id]['videos'].append(video_url)
         
-        return {
-            'id': post[0],
-            'content': post[2],
-            'original_url': post[3],
-            'images': [img[0] for img in images],
-            'videos': [vid[0] for vid in videos],
-            'shopee_links': [link[0] for link in shopee_links],
-            'affiliate_links': [link[1] for link in shopee_links if link[1]],
-            'is_posted': post[5]
-        }
+        cursor.execute('''
+            SELECT s.post_id, s.original_link, a.affiliate_link
+            FROM shopee_links s
+            LEFT JOIN affiliate_links a ON a.id = s.link_id
+            WHERE s.post_id IN (SELECT value FROM json_each(?))
+            ORDER BY s.id
+        ''', (ids_json,))
+        for post_id, original_link, affiliate_link in cursor.fetchall():
+            posts[post_id]['shopee_links'].append(original_link)
+            if affiliate_link:
+                posts[post_id]['affiliate_links'].append(affiliate_link)
+        
+        return list(posts.values())
     
     def get_unposted_posts(self, limit=10):
         """Lấy các bài chưa đăng"""
-        cursor = self.conn.cursor()
-        cursor.execute('''
-            SELECT id FROM posts 
-            WHERE is_posted = 0 
-            ORDER BY created_at DESC 
+        posts, _ = self.get_unposted_page(limit)
+        return posts
+    
+    def get_unposted_page(self, page_size=100, cursor=None):
+        """
+        Lấy 1 trang bài chưa đăng, mới nhất trước (phân trang theo keyset, không dùng OFFSET)
+        
+        Args:
+            page_size: Số bài mỗi trang
+            cursor: Cursor trả về từ trang trước (None = trang đầu)
+        
+        Returns:
+            tuple: (list post, cursor trang sau hoặc None nếu hết)
+        """
+        db_cursor = self.conn.cursor()
+        
+        if cursor is None:
+            db_cursor.execute('''
+                SELECT id, content, original_url, is_posted, created_at FROM posts
+                WHERE is_posted = 0
+                ORDER BY created_at DESC, id DESC
+                LIMIT ?
+            ''', (page_size,))
+        else:
+            created_at, last_id = cursor
+            db_cursor.execute('''
+                SELECT id, content, original_url, is_posted, created_at FROM posts
+                WHERE is_posted = 0
+                  AND (created_at < ? OR (created_at = ? AND id < ?))
+                ORDER BY created_at DESC, id DESC
+                LIMIT ?
+            ''', (created_at, created_at, last_id, page_size))
+        
+        rows = db_cursor.fetchall()
+        next_cursor = (rows[-1][4], rows[-1][0]) if len(rows) == page_size else None
+        return self._load_posts(rows), next_cursor
+    
+    def iter_unposted_posts(self, page_size=100):
+        """
+        Duyệt toàn bộ bài chưa đăng theo từng trang, mới nhất trước
+        
+        Yields:
+            dict: Post (cùng dạng với get_post)
+        """
+        cursor = None
+        while True:
+            posts, cursor = self.get_unposted_page(page_size, cursor)
+            yield from posts
+            if cursor is None:
+                break
+    
+    @staticmethod
+    def _fts_query(query):
+        """
+        Chuyển từ khóa người dùng nhập thành câu MATCH của FTS5
+        
+        Mỗi từ được đặt trong ngoặc kép (không lỗi cú pháp với ký tự đặc biệt),
+        các từ nối bằng AND. Từ cuối tìm theo tiền tố để gõ dở vẫn ra kết quả.
+        """
+        terms = ['"' + term.replace('"', '""') + '"' for term in query.split()]
+        if not terms:
+            return None
+        terms[-1] += '*'
+        return ' '.join(terms)
+    
+    def search(self, query, limit=20, cursor=None):
+        """
+        Tìm bài viết theo nội dung (FTS5), mới nhất trước, phân trang theo keyset
+        
+        Args:
+            query: Từ khóa (không phân biệt hoa thường và dấu)
+            limit: Số bài mỗi trang
+            cursor: Cursor trả về từ trang trước (None = trang đầu)
+        
+        Returns:
+            tuple: (list post kèm 'snippet', cursor trang sau hoặc None nếu hết)
+        """
+        match = self._fts_query(query)
+        if match is None:
+            return [], None
+        
+        params = [match]
+        cursor_filter = ''
+        if cursor is not None:
+            cursor_filter = 'AND posts_fts.rowid < ?'
+            params.append(cursor)
+        params.append(limit)
+        
+        # rowid của posts_fts = posts.id; FTS5 duyệt rowid giảm dần và dừng ở LIMIT
+        db_cursor = self.conn.cursor()
+        db_cursor.execute(f'''
+            SELECT p.id, p.content, p.original_url, p.is_posted, p.created_at,
+                   snippet(posts_fts, 0, '[', ']', '…', 16)
+            FROM posts_fts
+            JOIN posts p ON p.id = posts_fts.rowid
+            WHERE posts_fts MATCH ? {cursor_filter}
+            ORDER BY posts_fts.rowid DESC
             LIMIT ?
-        ''', (limit,))
+        ''', params)
         
-        post_ids = [row[0] for row in cursor.fetchall()]
-        return [self.get_post(pid) for pid in post_ids]
+        rows = db_cursor.fetchall()
+        posts = self._load_posts([row[:5] for row in rows])
+        for post, row in zip(posts, rows):
+            post['snippet'] = row[5]
+        
+        next_cursor = rows[-1][0] if len(rows) == limit else None
+        return posts, next_cursor
     
     def mark_as_posted(self, post_id):
         """Đánh dấu bài đã đăng"""
@@ -220,16 +607,236 @@ class Database:
         print(f"✅ Đã đánh dấu post_id={post_id} là đã đăng")
     
     def update_affiliate_link(self, post_id, original_link, affiliate_link):
-        """Cập nhật affiliate link sau khi convert"""
+        """Cập nhật affiliate link sau khi convert (áp dụng cho mọi bài có cùng sản phẩm)"""
         cursor = self.conn.cursor()
         cursor.execute('''
-            UPDATE shopee_links 
-            SET affiliate_link = ?
-            WHERE post_id = ? AND original_link = ?
-        ''', (affiliate_link, post_id, original_link))
-        self.conn.commit()
+            SELECT link_id FROM shopee_links WHERE post_id = ? AND original_link = ?
+        ''', (post_id, original_link))
+        row = cursor.fetchone()
+        
+        link_id = row[0] if row else self._get_link_ids(cursor, [original_link])[canonicalize_shopee_url(original_link)]
+        self.set_affiliate_link(link_id, affiliate_link)
         print(f"✅ Đã cập nhật affiliate link cho post_id={post_id}")
     
+    def set_affiliate_link(self, link_id, affiliate_link):
+        """Lưu kết quả convert của 1 sản phẩm, mọi bài trỏ tới link_id đều dùng được ngay"""
+        now = datetime.now()
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            UPDATE affiliate_links
+            SET affiliate_link = ?, status = 'converted', last_error = NULL,
+                converted_at = ?, updated_at = ?
+            WHERE id = ?
+        ''', (affiliate_link, now, now, link_id))
+        self.conn.commit()
+    
+    def record_affiliate_failure(self, link_id, error=None):
+        """Ghi nhận convert lỗi (quá AFFILIATE_MAX_FAILURES lần thì không tự thử lại)"""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            UPDATE affiliate_links
+            SET fail_count = fail_count + 1, last_error = ?, updated_at = ?,
+                status = CASE WHEN fail_count + 1 >= ? THEN 'failed' ELSE status END
+            WHERE id = ?
+        ''', (error, datetime.now(), AFFILIATE_MAX_FAILURES, link_id))
+        self.conn.commit()
+    
+    def get_pending_affiliate_links(self, post_ids=None, limit=None):
+        """
+        Các sản phẩm chưa có link affiliate (mỗi sản phẩm 1 lần dù xuất hiện ở nhiều bài)
+        
+        Args:
+            post_ids: Chỉ lấy sản phẩm của các bài này (None = tất cả)
+            limit: Số sản phẩm tối đa
+        
+        Returns:
+            list: Dict {id, canonical_url, fail_count, post_count}, sản phẩm nhiều bài trước
+        """
+        params = []
+        post_filter = ''
+        if post_ids is not None:
+            post_filter = 'AND s.post_id IN (SELECT value FROM json_each(?))'
+            params.append(json.dumps(list(post_ids)))
+        params.append(-1 if limit is None else limit)
+        
+        cursor = self.conn.cursor()
+        cursor.execute(f'''
+            SELECT a.id, a.canonical_url, a.fail_count, COUNT(DISTINCT s.post_id) AS post_count
+            FROM affiliate_links a
+            JOIN shopee_links s ON s.link_id = a.id
+            WHERE a.status = 'pending' {post_filter}
+            GROUP BY a.id
+            ORDER BY post_count DESC, a.id
+            LIMIT ?
+        ''', params)
+        
+        return [
+            {'id': row[0], 'canonical_url': row[1], 'fail_count': row[2], 'post_count': row[3]}
+            for row in cursor.fetchall()
+        ]
+    
+    def get_watermark(self, profile_url):
+        """
+        Lấy watermark crawl của 1 trang cá nhân
+        
+        Returns:
+            dict: {'content_hashes': [...], 'last_crawled_at': ...} hoặc None nếu chưa crawl
+        """
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT content_hashes, last_crawled_at FROM crawl_watermarks
+            WHERE profile_url = ?
+        ''', (profile_url,))
+        row = cursor.fetchone()
+        
+        if not row:
+            return None
+        
+        return {
+            'content_hashes': json.loads(row[0]),
+            'last_crawled_at': row[1]
+        }
+    
+    def update_watermark(self, profile_url, new_hashes, size=WATERMARK_SIZE):
+        """
+        Cập nhật watermark sau khi crawl
+        
+        Args:
+            profile_url: URL trang cá nhân
+            new_hashes: Hash các bài mới crawl được (theo thứ tự feed, mới nhất trước)
+            size: Số hash giữ lại
+        """
+        old = self.get_watermark(profile_url)
+        hashes = list(new_hashes) + (old['content_hashes'] if old else [])
+        hashes = list(dict.fromkeys(hashes))[:size]
+        
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            INSERT OR REPLACE INTO crawl_watermarks (profile_url, content_hashes, last_crawled_at)
+            VALUES (?, ?, ?)
+        ''', (profile_url, json.dumps(hashes), datetime.now()))
+        self.conn.commit()
+        print(f"✅ Đã cập nhật watermark cho {profile_url} ({len(hashes)} bài)")
+    
+    def get_checkpoint(self, profile_url):
+        """
+        Lấy checkpoint crawl dở của 1 trang cá nhân
+        
+        Returns:
+            dict: {last_index, last_hash, processed_hashes, partial_hash, partial_links,
+                   started_at, updated_at} hoặc None nếu không có
+        """
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT last_index, last_hash, processed_hashes, partial_hash, partial_links,
+                   started_at, updated_at
+            FROM crawl_checkpoints WHERE profile_url = ?
+        ''', (profile_url,))
+        row = cursor.fetchone()
+        
+        if not row:
+            return None
+        
+        return {
+            'last_index': row[0],
+            'last_hash': row[1],
+            'processed_hashes': json.loads(row[2]),
+            'partial_hash': row[3],
+            'partial_links': json.loads(row[4]) if row[4] is not None else None,
+            'started_at': row[5],
+            'updated_at': row[6]
+        }
+    
+    def save_checkpoint(self, profile_url, last_index, last_hash, processed_hashes,
+                        partial_hash=None, partial_links=None, started_at=None):
+        """Ghi checkpoint crawl (ghi đè checkpoint cũ của trang)"""
+        now = datetime.now()
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            INSERT OR REPLACE INTO crawl_checkpoints
+                (profile_url, last_index, last_hash, processed_hashes, partial_hash, partial_links,
+                 started_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            profile_url, last_index, last_hash, json.dumps(processed_hashes), partial_hash,
+            json.dumps(partial_links) if partial_links is not None else None,
+            started_at or now, now
+        ))
+        self.conn.commit()
+    
+    def delete_checkpoint(self, profile_url):
+        """Xóa checkpoint khi crawl xong"""
+        cursor = self.conn.cursor()
+        cursor.execute('DELETE FROM crawl_checkpoints WHERE profile_url = ?', (profile_url,))
+        self.conn.commit()
+    
+    def get_cached_redirects(self, redirect_urls):
+        """
+        Tra cache resolve redirect cho nhiều link trong 1 query
+        
+        Returns:
+            dict: {redirect_url: {'final_url', 'status', 'resolve_seconds'}} chỉ gồm entry còn hạn
+        """
+        redirect_urls = list(dict.fromkeys(redirect_urls))
+        if not redirect_urls:
+            return {}
+        
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT redirect_url, final_url, status, resolve_seconds FROM redirect_cache
+            WHERE redirect_url IN (SELECT value FROM json_each(?)) AND expires_at > ?
+        ''', (json.dumps(redirect_urls), time.time()))
+        rows = cursor.fetchall()
+        
+        if rows:
+            cursor.executemany('UPDATE redirect_cache SET hits = hits + 1 WHERE redirect_url = ?',
+                               [(row[0],) for row in rows])
+            self.conn.commit()
+        
+        return {
+            row[0]: {'final_url': row[1], 'status': row[2], 'resolve_seconds': row[3] or 0.0}
+            for row in rows
+        }
+    
+    def cache_redirects(self, results):
+        """
+        Lưu kết quả resolve redirect
+        
+        Args:
+            results: List (redirect_url, final_url, status, resolve_seconds).
+                     status 'ok' giữ REDIRECT_CACHE_TTL, captcha/lỗi giữ REDIRECT_CACHE_NEGATIVE_TTL
+        """
+        now = time.time()
+        rows = [
+            (redirect_url, final_url, status, resolve_seconds,
+             now + (REDIRECT_CACHE_TTL if status == 'ok' else REDIRECT_CACHE_NEGATIVE_TTL))
+            for redirect_url, final_url, status, resolve_seconds in results
+        ]
+        if not rows:
+            return
+        
+        cursor = self.conn.cursor()
+        cursor.executemany('''
+            INSERT OR REPLACE INTO redirect_cache (redirect_url, final_url, status, resolve_seconds, expires_at)
+            VALUES (?, ?, ?, ?, ?)
+        ''', rows)
+        self.conn.commit()
+    
+    def get_redirect_cache_stats(self):
+        """Số entry còn hạn theo status và tổng số lần hit"""
+        cursor = self.conn.cursor()
+        cursor.execute('''
+            SELECT status, COUNT(*), SUM(hits) FROM redirect_cache
+            WHERE expires_at > ?
+            GROUP BY status
+        ''', (time.time(),))
+        
+        stats = {'ok': 0, 'captcha': 0, 'failed': 0, 'total_hits': 0}
+        for status, count, hits in cursor.fetchall():
+            stats[status] = count
+            stats['total_hits'] += hits or 0
+        return stats
+    
     def get_stats(self):
         """Thống kê database"""
         cursor = self.conn.cursor()
@@ -243,22 +850,46 @@ class Database:
         cursor.execute('SELECT COUNT(*) FROM shopee_links')
         total_links = cursor.fetchone()[0]
         
-        cursor.execute('SELECT COUNT(*) FROM shopee_links WHERE affiliate_link IS NOT NULL')
+        cursor.execute('''
+            SELECT COUNT(*) FROM shopee_links s
+            JOIN affiliate_links a ON a.id = s.link_id
+            WHERE a.affiliate_link IS NOT NULL
+        ''')
         converted_links = cursor.fetchone()[0]
         
+        cursor.execute('''
+            SELECT COUNT(*), SUM(status = 'converted'), SUM(status = 'failed') FROM affiliate_links
+        ''')
+        products, converted_products, failed_products = cursor.fetchone()
+        
         return {
             'total_posts': total_posts,
             'posted': posted,
             'unposted': total_posts - posted,
             'total_shopee_links': total_links,
-            'converted_links': converted_links
+            'converted_links': converted_links,
+            'distinct_products': products,
+            'converted_products': converted_products or 0,
+            'failed_products': failed_products or 0
         }
     
     def close(self):
-        """Đóng kết nối database"""
-        if self.conn:
-            self.conn.close()
-            print("✅ Đã đóng database")
+        """Đóng kết nối database (của mọi thread)"""
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        
+        if not connections:
+            return
+        
+        for _, conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        
+        # Thread nào dùng lại sau khi close sẽ mở connection mới
+        self._local = threading.local()
+        print("✅ Đã đóng database")
 
 
 if __name__ == "__main__":
@@ -314,8 +945,17 @@ if __name__ == "__main__":
         print("\n--- Test 6: Đánh dấu đã đăng ---")
         db.mark_as_posted(post_id)
     
-    # Test 7: Thống kê
-    print("\n--- Test 7: Thống kê database ---")
+    # Test 7: Lưu nhiều bài trong 1 transaction
+    print("\n--- Test 7: Lưu nhiều bài ---")
+    ids = db.save_posts([
+        {'content': "Váy maxi đi biển 🌊", 'images': ["https://example.com/vay.jpg"]},
+        {'content': "Áo polo nam đẹp giá rẻ 🔥 Chất vải mềm mại, thoáng mát"},
+        {'content': "Váy maxi đi biển 🌊"},
+    ])
+    print(f"post_id: {ids}")
+    
+    # Test 8: Thống kê
+    print("\n--- Test 8: Thống kê database ---")
     stats = db.get_stats()
     for key, value in stats.items():
         print(f"{key}: {value}")
@@ -0,0 +1,279 @@
+import sys
+from datetime import datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from src.utils.url_utils import canonicalize_shopee_url
+
+
+# Phiên bản schema lưu trong PRAGMA user_version của file database.
+# Mỗi migration chạy trong 1 transaction và chỉ chạy 1 lần; thay đổi schema
+# mới thì thêm hàm migration mới vào cuối MIGRATIONS, không sửa migration cũ.
+# Các migration dùng IF NOT EXISTS / kiểm tra cột để chạy được trên database
+# tạo trước khi có user_version (user_version = 0).
+
+
+def migrate_initial_schema(db, cursor):
+    """Bảng bài viết, ảnh, video, link Shopee"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS posts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            content_hash TEXT UNIQUE NOT NULL,
+            content TEXT NOT NULL,
+            original_url TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            is_posted INTEGER DEFAULT 0,
+            posted_at TIMESTAMP
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS post_images (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            post_id INTEGER NOT NULL,
+            image_url TEXT NOT NULL,
+            local_path TEXT,
+            FOREIGN KEY (post_id) REFERENCES posts(id) ON DELETE CASCADE
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS post_videos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            post_id INTEGER NOT NULL,
+            video_url TEXT NOT NULL,
+            local_path TEXT,
+            FOREIGN KEY (post_id) REFERENCES posts(id) ON DELETE CASCADE
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS shopee_links (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            post_id INTEGER NOT NULL,
+            original_link TEXT NOT NULL,
+            affiliate_link TEXT,
+            FOREIGN KEY (post_id) REFERENCES posts(id) ON DELETE CASCADE
+        )
+    ''')
+
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_content_hash ON posts(content_hash)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_is_posted ON posts(is_posted)')
+
+
+def migrate_crawl_state(db, cursor):
+    """Watermark, checkpoint crawl và cache resolve redirect"""
+    # content_hashes: JSON list hash của các bài mới nhất đã thấy (theo thứ tự feed)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS crawl_watermarks (
+            profile_url TEXT PRIMARY KEY,
+            content_hashes TEXT NOT NULL,
+            last_crawled_at TIMESTAMP
+        )
+    ''')
+
+    # Checkpoint của phiên crawl đang chạy dở (xóa khi crawl xong)
+    # processed_hashes: JSON list hash các bài đã lưu (theo thứ tự feed)
+    # partial_hash/partial_links: bài đang xử lý dở và các link Shopee đã resolve
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS crawl_checkpoints (
+            profile_url TEXT PRIMARY KEY,
+            last_index INTEGER NOT NULL DEFAULT -1,
+            last_hash TEXT,
+            processed_hashes TEXT NOT NULL DEFAULT '[]',
+            partial_hash TEXT,
+            partial_links TEXT,
+            started_at TIMESTAMP,
+            updated_at TIMESTAMP
+        )
+    ''')
+
+    # status: 'ok' | 'captcha' | 'failed'; final_url NULL khi không resolve được
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS redirect_cache (
+            redirect_url TEXT PRIMARY KEY,
+            final_url TEXT,
+            status TEXT NOT NULL,
+            resolve_seconds REAL,
+            expires_at REAL NOT NULL,
+            hits INTEGER DEFAULT 0
+        )
+    ''')
+
+
+def migrate_affiliate_links(db, cursor):
+    """Bảng link affiliate dùng chung theo sản phẩm, shopee_links.link_id trỏ tới"""
+    # status: 'pending' | 'converted' | 'failed'
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS affiliate_links (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            canonical_url TEXT UNIQUE NOT NULL,
+            affiliate_link TEXT,
+            status TEXT NOT NULL DEFAULT 'pending',
+            fail_count INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            converted_at TIMESTAMP,
+            updated_at TIMESTAMP
+        )
+    ''')
+
+    # Cột shopee_links.affiliate_link cũ chỉ còn để đọc dữ liệu trước khi có bảng này
+    columns = {row[1] for row in cursor.execute('PRAGMA table_info(shopee_links)')}
+    if 'link_id' not in columns:
+        cursor.execute('ALTER TABLE shopee_links ADD COLUMN link_id INTEGER REFERENCES affiliate_links(id)')
+
+    # Gắn các link đã có vào affiliate_links, giữ lại kết quả đã convert
+    cursor.execute('SELECT id, original_link, affiliate_link FROM shopee_links WHERE link_id IS NULL')
+    rows = cursor.fetchall()
+    if rows:
+        link_ids = db._get_link_ids(cursor, [row[1] for row in rows])
+
+        converted = {}
+        for _, original_link, affiliate_link in rows:
+            if affiliate_link:
+                converted[link_ids[canonicalize_shopee_url(original_link)]] = affiliate_link
+
+        now = datetime.now()
+        cursor.executemany('''
+            UPDATE affiliate_links
+            SET affiliate_link = ?, status = 'converted', converted_at = ?, updated_at = ?
+            WHERE id = ? AND affiliate_link IS NULL
+        ''', [(link, now, now, link_id) for link_id, link in converted.items()])
+
+        cursor.executemany('UPDATE shopee_links SET link_id = ? WHERE id = ?', [
+            (link_ids[canonicalize_shopee_url(original_link)], row_id)
+            for row_id, original_link, _ in rows
+        ])
+        print(f"✅ Đã gắn {len(rows)} link Shopee cũ vào bảng affiliate_links")
+
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_shopee_links_link_id ON shopee_links(link_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_affiliate_links_status ON affiliate_links(status)')
+
+
+def migrate_child_indexes(db, cursor):
+    """Index post_id cho các bảng con và (is_posted, created_at) cho bài chưa đăng"""
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_post_images_post_id ON post_images(post_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_post_videos_post_id ON post_videos(post_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_shopee_links_post_id ON shopee_links(post_id)')
+
+    # Lọc is_posted và sắp xếp theo created_at (rowid = id nằm sẵn cuối index) không cần sort
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_posts_unposted ON posts(is_posted, created_at)')
+
+    # idx_is_posted là prefix của index trên; idx_content_hash trùng với index UNIQUE tự tạo
+    cursor.execute('DROP INDEX IF EXISTS idx_is_posted')
+    cursor.execute('DROP INDEX IF EXISTS idx_content_hash')
+
+    cursor.execute('ANALYZE')
+
+
+def migrate_near_duplicate_index(db, cursor):
+    """Index gần trùng: signature MinHash và bucket LSH của từng bài"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS post_signatures (
+            post_id INTEGER PRIMARY KEY,
+            signature BLOB NOT NULL,
+            FOREIGN KEY (post_id) REFERENCES posts(id) ON DELETE CASCADE
+        )
+    ''')
+
+    # Mỗi bài 1 dòng cho mỗi band; tra theo bucket nên bucket đứng đầu khóa chính
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS post_lsh_buckets (
+            bucket INTEGER NOT NULL,
+            post_id INTEGER NOT NULL,
+            PRIMARY KEY (bucket, post_id)
+        ) WITHOUT ROWID
+    ''')
+
+    db._backfill_signatures(cursor)
+
+
+def migrate_full_text_search(db, cursor):
+    """Bảng FTS5 tìm kiếm nội dung bài, đồng bộ với posts bằng trigger"""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'posts_fts'")
+    exists = cursor.fetchone() is not None
+
+    # External content: chỉ lưu index, nội dung đọc từ posts theo rowid = posts.id
+    # remove_diacritics: tìm "ao thun" vẫn ra "áo thun"
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5(
+            content,
+            content='posts',
+            content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS posts_fts_insert AFTER INSERT ON posts BEGIN
+            INSERT INTO posts_fts (rowid, content) VALUES (new.id, new.content);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS posts_fts_delete AFTER DELETE ON posts BEGIN
+            INSERT INTO posts_fts (posts_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS posts_fts_update AFTER UPDATE OF content ON posts BEGIN
+            INSERT INTO posts_fts (posts_fts, rowid, content) VALUES ('delete', old.id, old.content);
+            INSERT INTO posts_fts (rowid, content) VALUES (new.id, new.content);
+        END
+    ''')
+
+    if not exists:
+        cursor.execute("INSERT INTO posts_fts (posts_fts) VALUES ('rebuild')")
+
+
+# (version, mô tả, hàm migration) theo thứ tự tăng dần
+MIGRATIONS = [
+    (1, "Schema gốc: posts, ảnh, video, link Shopee", migrate_initial_schema),
+    (2, "Watermark, checkpoint crawl, cache redirect", migrate_crawl_state),
+    (3, "Bảng affiliate_links dùng chung theo sản phẩm", migrate_affiliate_links),
+    (4, "Index post_id bảng con và (is_posted, created_at)", migrate_child_indexes),
+    (5, "Index bài gần trùng (MinHash + LSH)", migrate_near_duplicate_index),
+    (6, "Tìm kiếm toàn văn FTS5 cho nội dung bài", migrate_full_text_search),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def run_migrations(db, conn, target=LATEST_VERSION):
+    """
+    Chạy các migration chưa áp dụng, mỗi migration 1 transaction
+
+    Args:
+        db: Database (migration có thể dùng helper của Database)
+        conn: Connection sqlite3
+        target: Version đích (mặc định bản mới nhất)
+
+    Returns:
+        list: Version các migration đã chạy
+    """
+    current = get_schema_version(conn)
+    applied = []
+
+    for version, description, migrate in MIGRATIONS:
+        if version <= current or version > target:
+            continue
+
+        cursor = conn.cursor()
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            migrate(db, cursor)
+            cursor.execute(f'PRAGMA user_version = {version}')
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            print(f"❌ Migration {version} ({description}) lỗi: {e}")
+            raise
+
+        applied.append(version)
+        print(f"🔧 Migration {version}: {description}")
+
+    return applied
@@ -1,13 +1,24 @@
-import time
 import sys
 from pathlib import Path
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException
 
 sys.path.append(str(Path(__file__).parent.parent.parent))
 from src.core.browser_manager import BrowserManager
+from src.core.wait_engine import WaitEngine
+from src.core.selector_stats import find_all
+
+
+# Đếm số ảnh/video đã được đưa vào khung soạn bài (preview dạng blob:)
+MEDIA_PREVIEW_COUNT_JS = """
+    return document.querySelectorAll(
+        'div[role="dialog"] img[src^="blob:"], div[role="dialog"] video[src^="blob:"]'
+    ).length;
+"""
+
+TEXTBOX_CSS = 'div[role="textbox"][contenteditable="true"]'
+POSTED_XPATH = "//div[normalize-space(text())='Posted']"
+POST_FAILED_XPATH = "//div[normalize-space(text())='Post failed to upload']"
 
 
 class ThreadsPoster:
@@ -20,6 +31,8 @@ class ThreadsPoster:
         if not self.driver:
             raise Exception("Browser chưa được khởi tạo!")
 
+        self.waits = WaitEngine(self.driver)
+
     def create_post(self, content_1, content_2=None, media_paths=None):
         """
         Tạo bài post trên Threads
@@ -40,25 +53,20 @@ class ThreadsPoster:
             # 1. Mở trang Threads
             print("📍 Bước 1: Mở Threads...")
             self.driver.get("https://www.threads.net/")
-            time.sleep(3)
 
-            # 2. Click nút 'Post'
+            # 2. Click nút 'Post' (đợi đến khi trang render xong nút)
             print("📍 Bước 2: Click nút 'Post'...")
-            post_button = WebDriverWait(self.driver, 15).until(
-                EC.element_to_be_clickable(
-                    (By.XPATH, "//div[@role='button']//div[normalize-space(text())='Post']")
-                )
+            post_button = self.waits.element_clickable(
+                (By.XPATH, "//div[@role='button']//div[normalize-space(text())='Post']"),
+                "poster.open_composer", timeout=15
             )
             post_button.click()
             print("✅ Đã click nút 'Post'!")
-            time.sleep(2)
 
             # 3. Nhập nội dung thread 1
             print("📍 Bước 3: Nhập nội dung thread 1...")
-            textbox = WebDriverWait(self.driver, 10).until(
-                EC.presence_of_element_located(
-                    (By.CSS_SELECTOR, 'div[role="textbox"][contenteditable="true"]')
-                )
+            textbox = self.waits.element_clickable(
+                (By.CSS_SELECTOR, TEXTBOX_CSS), "poster.textbox_1", timeout=10
             )
             
             self.driver.execute_script("""
@@ -71,16 +79,13 @@ class ThreadsPoster:
                 box.dispatchEvent(new Event('input', { bubbles: true }));
             """, textbox, content_1)
             print(f"✅ Đã nhập: {content_1[:80]}...")
-            time.sleep(1)
 
             # 4. Upload media nếu có
             if media_paths and len(media_paths) > 0:
                 print(f"\n📍 Bước 4: Upload {len(media_paths)} file media...")
                 
-                file_input = WebDriverWait(self.driver, 10).until(
-                    EC.presence_of_element_located(
-                        (By.XPATH, "//input[@type='file']")
-                    )
+                file_input = self.waits.element_present(
+                    (By.XPATH, "//input[@type='file']"), "poster.file_input", timeout=10
                 )
                 
                 for i, media_path in enumerate(media_paths, 1):
@@ -89,24 +94,37 @@ class ThreadsPoster:
                         continue
                     
                     print(f"  📤 [{i}/{len(media_paths)}] Upload: {Path(media_path).name}")
+                    preview_count = self.driver.execute_script(MEDIA_PREVIEW_COUNT_JS)
                     file_input.send_keys(str(Path(media_path).absolute()))
-                    time.sleep(2)
+                    
+                    # Đợi preview của file vừa chọn xuất hiện
+                    self.waits.until(
+                        lambda d: d.execute_script(MEDIA_PREVIEW_COUNT_JS) > preview_count,
+                        "poster.media_preview", timeout=15, soft=True
+                    )
                 
+                self.waits.upload_finished("poster.media_uploaded", timeout=120)
                 print("✅ Đã upload tất cả media!")
-                time.sleep(2)
 
             # 5. Thêm thread thứ 2 nếu có
             if content_2:
                 print("\n📍 Bước 5: Thêm thread thứ 2...")
                 
-                add_button = WebDriverWait(self.driver, 10).until(
-                    EC.element_to_be_clickable(
-                        (By.XPATH, "//span[normalize-space(text())='Add to thread']")
-                    )
+                add_button = self.waits.element_clickable(
+                    (By.XPATH, "//span[normalize-space(text())='Add to thread']"),
+                    "poster.add_to_thread", timeout=10
                 )
                 add_button.click()
                 print("✅ Đã click 'Add to thread'!")
-                time.sleep(2)
+                
+                # Đợi ô nhập thứ 2 xuất hiện và được focus
+                self.waits.until(
+                    lambda d: len(find_all(d, By.CSS_SELECTOR, TEXTBOX_CSS, "poster.textboxes")) >= 2
+                    and d.execute_script(
+                        "return document.activeElement && document.activeElement.isContentEditable"
+                    ),
+                    "poster.textbox_2", timeout=10
+                )
                 
                 print("📍 Bước 6: Nhập nội dung thread 2...")
                 self.driver.execute_script("""
@@ -115,32 +133,32 @@ class ThreadsPoster:
                     document.activeElement.dispatchEvent(new Event('input', { bubbles: true }));
                 """, content_2)
                 print(f"✅ Đã nhập: {content_2[:80]}...")
-                time.sleep(2)
 
-            # 6. Click nút "Post" để đăng bài
+            # 6. Click nút "Post" để đăng bài (sau khi media xử lý xong)
             print("\n📍 Bước cuối: Click nút 'Post' để đăng bài...")
-            time.sleep(10)
-            post_final_button = WebDriverWait(self.driver, 10).until(
-                EC.element_to_be_clickable((
+            self.waits.upload_finished("poster.before_post", timeout=120)
+            post_final_button = self.waits.element_clickable(
+                (
                     By.XPATH,
                     "//h1[.//span[normalize-space()='New thread']]/ancestor::div[@role='dialog']//div[@role='button']//div[normalize-space()='Post']"
-                ))
+                ),
+                "poster.final_post_button", timeout=30
             )
             self.driver.execute_script("arguments[0].scrollIntoView({block:'center'});", post_final_button)
             self.driver.execute_script("arguments[0].click();", post_final_button)
             print("✅ Đã click nút Post!")
-            time.sleep(3)
             
             # 7. Đợi kết quả
             print("📍 Đợi kết quả đăng bài (timeout 120s)...")
             try:
-                WebDriverWait(self.driver, 120).until(
-                    lambda d: d.find_elements(By.XPATH, "//div[normalize-space(text())='Posted']") or
-                            d.find_elements(By.XPATH, "//div[normalize-space(text())='Post failed to upload']")
+                self.waits.until(
+                    lambda d: find_all(d, By.XPATH, POSTED_XPATH, "poster.posted_toast") or
+                            find_all(d, By.XPATH, POST_FAILED_XPATH, "poster.failed_toast"),
+                    "poster.post_result", timeout=120
                 )
                 
                 # Kiểm tra kết quả
-                if self.driver.find_elements(By.XPATH, "//div[normalize-space(text())='Post failed to upload']"):
+                if find_all(self.driver, By.XPATH, POST_FAILED_XPATH, "poster.failed_toast"):
                     print("\n" + "=" * 60)
                     print("❌ ĐĂNG BÀI THẤT BẠI!")
                     print("=" * 60 + "\n")
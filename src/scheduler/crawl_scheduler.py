@@ -0,0 +1,232 @@
+import queue
+import threading
+import time
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from config.settings import (
+    HEADLESS_MODE,
+    CRAWL_PROFILES,
+    SCHEDULER_WORKERS,
+    SCHEDULER_POSTS_PER_MINUTE,
+    SCHEDULER_CRAWL_LIMIT,
+    SCHEDULER_POLL_INTERVAL,
+    SCHEDULER_RETRY_MINUTES,
+)
+from src.core.browser_manager import BrowserManager
+from src.crawler.crawl_personal_page import ThreadsCrawler
+from src.crawler.crawl_pipeline import crawl_and_save
+from src.database.database import Database
+
+
+class RateBudget:
+    """Token bucket dùng chung cho mọi worker: tối đa N bài mỗi phút"""
+
+    def __init__(self, per_minute):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, float(per_minute) / 4)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Chờ đến khi có 1 token"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+
+            time.sleep(wait)
+
+
+class CrawlScheduler:
+    """
+    Crawl nhiều trang cá nhân theo lịch, mỗi trang có priority và chu kỳ refresh riêng
+
+    Mỗi worker có 1 Chrome driver riêng (profile clone); các worker dùng chung 1
+    Database (WAL, mỗi thread 1 connection).
+    Tất cả worker dùng chung 1 RateBudget để giới hạn tổng số bài crawl mỗi phút.
+    Trang crawl lỗi được thử lại sau retry_minutes, gấp đôi mỗi lần lỗi liên tiếp.
+    """
+
+    def __init__(self, profiles=CRAWL_PROFILES, workers=SCHEDULER_WORKERS,
+                 posts_per_minute=SCHEDULER_POSTS_PER_MINUTE, crawl_limit=SCHEDULER_CRAWL_LIMIT,
+                 poll_interval=SCHEDULER_POLL_INTERVAL, retry_minutes=SCHEDULER_RETRY_MINUTES,
+                 headless=HEADLESS_MODE, db_path=None):
+        self.profiles = profiles
+        self.workers = workers
+        self.crawl_limit = crawl_limit
+        self.poll_interval = poll_interval
+        self.retry_minutes = retry_minutes
+        self.headless = headless
+        self.db = None
+        self.db_path = db_path
+
+        self.budget = RateBudget(posts_per_minute)
+        self._jobs = queue.Queue()
+        self._in_flight = set()
+        # Trang crawl lỗi: {url: (số lần lỗi liên tiếp, thời điểm được thử lại)}
+        self._retry_after = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+
+        self.stats = {'crawls': 0, 'failed': 0, 'crawled_posts': 0, 'saved_posts': 0}
+
+    def due_profiles(self):
+        """
+        Các trang đã đến hạn crawl, priority cao trước, trễ hạn lâu trước
+
+        Returns:
+            list: Các dict profile trong CRAWL_PROFILES
+        """
+        now = datetime.now()
+        due = []
+
+        for profile in self.profiles:
+            with self._lock:
+                if profile['url'] in self._in_flight:
+                    continue
+                # Crawl lỗi chưa ghi watermark: không xếp lại ngay mỗi lần poll
+                retry = self._retry_after.get(profile['url'])
+                if retry and now < retry[1]:
+                    continue
+
+            watermark = self.db.get_watermark(profile['url'])
+            if watermark and watermark['last_crawled_at']:
+                last = datetime.fromisoformat(str(watermark['last_crawled_at']))
+                overdue = (now - last).total_seconds() - profile['refresh_minutes'] * 60
+            else:
+                overdue = float('inf')  # Chưa crawl lần nào
+
+            if overdue >= 0:
+                due.append((profile.get('priority', 0), overdue, profile))
+
+        due.sort(key=lambda item: (item[0], item[1]), reverse=True)
+        return [profile for _, _, profile in due]
+
+    def run(self, once=False):
+        """
+        Chạy scheduler
+
+        Args:
+            once: True thì crawl các trang đang đến hạn 1 lượt rồi dừng
+        """
+        print(f"\n🗓️  Scheduler: {len(self.profiles)} trang, {self.workers} worker")
+        self.db = Database(self.db_path)
+
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, args=(i,), name=f"crawl-worker-{i + 1}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+        try:
+            while not self._stop.is_set():
+                for profile in self.due_profiles():
+                    with self._lock:
+                        self._in_flight.add(profile['url'])
+                    self._jobs.put(profile)
+                    print(f"📋 Đến hạn crawl: {profile['url']} (priority {profile.get('priority', 0)})")
+
+                if once:
+                    self._jobs.join()
+                    break
+
+                self._stop.wait(self.poll_interval)
+
+        except KeyboardInterrupt:
+            print("\n⚠️  Dừng scheduler...")
+
+        finally:
+            self.stop()
+            self.db.close()
+
+        print(f"\n📊 Scheduler: {self.stats}")
+
+    def stop(self):
+        """Dừng các worker sau khi crawl xong trang đang chạy"""
+        self._stop.set()
+        for _ in self._threads:
+            self._jobs.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def _worker(self, index):
+        browser = None
+        db = self.db
+
+        try:
+            while True:
+                profile = self._jobs.get()
+                if profile is None:
+                    break
+
+                try:
+                    if browser is None:
+                        profile_path = BrowserManager.clone_profile(f"crawler_{index + 1}")
+                        browser = BrowserManager(headless=self.headless, profile_path=profile_path)
+                        browser.init_driver()
+
+                    crawler = ThreadsCrawler(browser, db=db)
+                    crawled, saved = crawl_and_save(
+                        crawler, db, profile['url'], self.crawl_limit,
+                        before_next=self.budget.acquire
+                    )
+
+                    with self._lock:
+                        self._retry_after.pop(profile['url'], None)
+                        self.stats['crawls'] += 1
+                        self.stats['crawled_posts'] += crawled
+                        self.stats['saved_posts'] += saved
+
+                    print(f"✅ [{index + 1}] {profile['url']}: {saved}/{crawled} bài mới")
+
+                except Exception as e:
+                    with self._lock:
+                        self.stats['failed'] += 1
+                        failures = self._retry_after.get(profile['url'], (0, None))[0] + 1
+                        delay = min(self.retry_minutes * 2 ** (failures - 1), profile['refresh_minutes'])
+                        self._retry_after[profile['url']] = (failures, datetime.now() + timedelta(minutes=delay))
+                    print(f"❌ [{index + 1}] Lỗi crawl {profile['url']}: {e} "
+                          f"(lỗi {failures} lần liên tiếp, thử lại sau {delay:g} phút)")
+
+                    # Driver có thể đã chết, lần sau khởi tạo lại
+                    if browser:
+                        try:
+                            browser.close()
+                        except Exception:
+                            pass
+                        browser = None
+
+                finally:
+                    with self._lock:
+                        self._in_flight.discard(profile['url'])
+                    self._jobs.task_done()
+
+        finally:
+            if browser:
+                browser.close()
+
+
+def run_scheduler():
+    """Chạy scheduler liên tục cho toàn bộ CRAWL_PROFILES"""
+
+    print("\n" + "="*60)
+    print("🗓️  CRAWL SCHEDULER")
+    print("="*60 + "\n")
+
+    scheduler = CrawlScheduler()
+    scheduler.run(once="--once" in sys.argv)
+
+
+if __name__ == "__main__":
+    run_scheduler()
@@ -0,0 +1,144 @@
+import hashlib
+import operator
+import re
+import zlib
+from array import array
+
+
+HASH_BITS = 32  # crc32 của shingle
+HASH_MASK = (1 << HASH_BITS) - 1
+
+URL_PATTERN = re.compile(r'(?:https?://|www\.)\S+|\b[\w-]+(?:\.[\w-]+)+/\S*')
+NON_WORD_PATTERN = re.compile(r'[^\w\s]+|_')
+
+
+def normalize_for_similarity(content):
+    """
+    Chuẩn hóa nội dung trước khi so sánh gần trùng
+
+    Bỏ link (link rút gọn s.shopee.vn/... mỗi lần đăng lại một khác), emoji,
+    dấu câu và ký tự # của hashtag, đưa về chữ thường và gộp khoảng trắng.
+    """
+    text = URL_PATTERN.sub(' ', content.lower())
+    text = NON_WORD_PATTERN.sub(' ', text)
+    return ' '.join(text.split())
+
+
+class MinHasher:
+    """
+    MinHash + LSH theo band để tìm bài gần trùng mà không phải so với mọi bài
+
+    Nội dung được cắt thành các shingle k ký tự; signature gồm num_perm giá trị
+    MinHash, tỉ lệ giá trị bằng nhau giữa 2 signature xấp xỉ độ giống Jaccard.
+    Signature chia thành `bands` band, mỗi band hash thành 1 bucket: 2 bài chung
+    ít nhất 1 bucket mới là ứng viên cần so signature.
+
+    Dùng one-permutation hashing: mỗi shingle chỉ hash 1 lần rồi chia vào num_perm
+    ngăn (lấy min mỗi ngăn), ngăn rỗng mượn giá trị ngăn kế bên (densification).
+    Chi phí O(số shingle) thay vì O(số shingle x num_perm) như MinHash thường.
+
+    Tham số phải giữ nguyên giữa các lần chạy (signature đã lưu phụ thuộc vào chúng).
+    """
+
+    def __init__(self, num_perm=64, bands=16, shingle_size=5):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) phải chia hết cho bands ({bands})")
+
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        # Khoảng cách giữa các ngăn khi mượn giá trị, để ngăn mượn khác ngăn gốc
+        self._rotation = (1 << HASH_BITS) // num_perm
+
+    def shingles(self, content):
+        """Tập hash 32-bit của các shingle k ký tự (rỗng nếu không còn chữ sau khi chuẩn hóa)"""
+        text = normalize_for_similarity(content)
+        if not text:
+            return set()
+
+        k = self.shingle_size
+        pieces = {text[i:i + k] for i in range(max(len(text) - k + 1, 1))}
+        return {zlib.crc32(piece.encode()) for piece in pieces}
+
+    def signature(self, content):
+        """
+        Signature MinHash của nội dung
+
+        Returns:
+            tuple: num_perm giá trị, hoặc None nếu nội dung không có chữ
+        """
+        hashes = self.shingles(content)
+        if not hashes:
+            return None
+
+        k = self.num_perm
+        bins = [None] * k
+        for h in hashes:
+            index, value = h % k, h // k
+            if bins[index] is None or value < bins[index]:
+                bins[index] = value
+
+        # Ngăn rỗng lấy giá trị của ngăn có dữ liệu gần nhất bên phải (vòng tròn)
+        signature = []
+        for index in range(k):
+            distance = 0
+            while bins[(index + distance) % k] is None:
+                distance += 1
+            value = bins[(index + distance) % k]
+            signature.append((value + distance * self._rotation) & HASH_MASK)
+        return tuple(signature)
+
+    def buckets(self, signature):
+        """Bucket LSH của từng band (số nguyên 64-bit có dấu, vừa kiểu INTEGER của SQLite)"""
+        data = array('Q', signature).tobytes()
+        size = self.rows * 8
+        return [
+            int.from_bytes(
+                hashlib.blake2b(data[band * size:(band + 1) * size], digest_size=8,
+                                salt=band.to_bytes(16, 'big')).digest(),
+                'big', signed=True,
+            )
+            for band in range(self.bands)
+        ]
+
+    @staticmethod
+    def similarity(signature1, signature2):
+        """Độ giống Jaccard ước lượng từ 2 signature"""
+        return sum(map(operator.eq, signature1, signature2)) / len(signature1)
+
+    @staticmethod
+    def to_bytes(signature):
+        return array('Q', signature).tobytes()
+
+    @staticmethod
+    def from_bytes(data):
+        values = array('Q')
+        values.frombytes(data)
+        return tuple(values)
+
+
+def test_minhash():
+    """Test nhanh: bài đăng lại khác emoji/hashtag/link rút gọn vẫn được nhận ra"""
+    hasher = MinHasher()
+
+    original = ("Áo thun nam cotton co giãn 4 chiều, mặc mát cả ngày 🔥🔥 "
+                "Giá chỉ 99k, freeship toàn quốc. Link mua: s.shopee.vn/AbC123xyz…")
+    repost = ("Áo thun nam cotton co giãn 4 chiều, mặc mát cả ngày ❤️ "
+              "Giá chỉ 99k, freeship toàn quốc! #aothun Link mua: s.shopee.vn/Zz9QwE1")
+    other = ("Nồi chiên không dầu 5 lít, nướng gà nguyên con không cần lật. "
+             "Đang sale 50% hôm nay: s.shopee.vn/AbC123xyz")
+
+    sig_original = hasher.signature(original)
+    sig_repost = hasher.signature(repost)
+    sig_other = hasher.signature(other)
+
+    print(f"Đăng lại:  độ giống {hasher.similarity(sig_original, sig_repost):.2f}, "
+          f"chung bucket: {bool(set(hasher.buckets(sig_original)) & set(hasher.buckets(sig_repost)))}")
+    print(f"Bài khác:  độ giống {hasher.similarity(sig_original, sig_other):.2f}, "
+          f"chung bucket: {bool(set(hasher.buckets(sig_original)) & set(hasher.buckets(sig_other)))}")
+    print(f"Chỉ có link/emoji: {hasher.signature('🔥 s.shopee.vn/AbC123 🔥')}")
+
+
+if __name__ == "__main__":
+    test_minhash()
@@ -0,0 +1,75 @@
+import re
+from urllib.parse import urlparse, parse_qsl, urlencode, urlunparse
+
+
+# Các query param chỉ dùng để tracking, không ảnh hưởng sản phẩm
+TRACKING_PARAMS = {
+    'sp_atk', 'xptdk', 'smtt', 'utm_source', 'utm_medium', 'utm_campaign',
+    'utm_content', 'utm_term', 'uls_trackid', 'mmp_pid', 'gads_t_sig',
+    'publish_id', 'is_from_login', 'is_from_signup', 'share_channel_code',
+}
+
+# Các dạng URL sản phẩm Shopee:
+#   https://shopee.vn/Ten-san-pham-i.<shop_id>.<item_id>
+#   https://shopee.vn/product/<shop_id>/<item_id>
+SHOPEE_PRODUCT_PATTERNS = [
+    re.compile(r'-i\.(\d+)\.(\d+)'),
+    re.compile(r'/product/(\d+)/(\d+)'),
+]
+
+
+def extract_shopee_ids(url):
+    """
+    Lấy (shop_id, item_id) từ link sản phẩm Shopee
+
+    Returns:
+        tuple: (shop_id, item_id) hoặc None nếu không phải link sản phẩm
+    """
+    if not url:
+        return None
+
+    parsed = urlparse(url.strip())
+    if 'shopee.vn' not in parsed.netloc.lower():
+        return None
+
+    for pattern in SHOPEE_PRODUCT_PATTERNS:
+        match = pattern.search(parsed.path)
+        if match:
+            return match.group(1), match.group(2)
+
+    return None
+
+
+def canonicalize_shopee_url(url):
+    """
+    Chuẩn hóa link Shopee để dùng làm key (cache, chống trùng)
+
+    - Link sản phẩm -> https://shopee.vn/product/<shop_id>/<item_id>
+    - Link khác (link rút gọn, shop...) -> bỏ tracking params, sort query
+
+    Args:
+        url: Link Shopee gốc
+
+    Returns:
+        str: Link đã chuẩn hóa
+    """
+    url = (url or '').strip()
+
+    ids = extract_shopee_ids(url)
+    if ids:
+        return f"https://shopee.vn/product/{ids[0]}/{ids[1]}"
+
+    parsed = urlparse(url)
+    query = [
+        (key, value) for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith('utm_')
+    ]
+
+    return urlunparse((
+        (parsed.scheme or 'https').lower(),
+        parsed.netloc.lower(),
+        parsed.path.rstrip('/') or '/',
+        '',
+        urlencode(sorted(query)),
+        ''
+    ))